@@ -0,0 +1,48 @@
+"""
+Every entry of ASSUMPTIONS, checked on all predictors with its viz
+"""
+from .common import ROWS, COLUMNS, GROUPS, frame, payloadBytes, predictors, require
+
+ASSUMPTION_NAMES = ["outlier", "levene", "normality", "multicollinearity", "linearity"]
+
+
+def assumptionInputs(assumptionName: str, rows: int, columns: int):
+    data = frame(rows, columns)
+    X = data[predictors(columns)]
+    if assumptionName == "levene":
+        groups = data["group"]
+        return (X[groups == GROUPS[0]], X[groups == GROUPS[1]]), {"groups": GROUPS[:2]}
+    if assumptionName == "multicollinearity":
+        return (X, X), {}
+    if assumptionName == "linearity":
+        return (X, data["y"]), {}
+    return (X,), {}
+
+
+class CheckAssumption:
+    params = [ROWS, COLUMNS, ASSUMPTION_NAMES]
+    param_names = ["rows", "columns", "assumption"]
+    number = 1
+    timeout = 600
+
+    def setup(self, rows, columns, assumptionName):
+        require(rows, columns, pairs=assumptionName in ["multicollinearity", "levene"])
+        from guidedstats.assumptions import AssumptionWrapper
+        self.assumption = AssumptionWrapper()
+        self.assumption.setAssumption(assumptionName)
+        self.assumption.cache = None
+        self.inputs, self.kwargs = assumptionInputs(assumptionName, rows, columns)
+
+    def check(self):
+        return self.assumption.checkAssumption(*self.inputs, **self.kwargs)
+
+    def time_check(self, rows, columns, assumptionName):
+        self.check()
+
+    def peakmem_check(self, rows, columns, assumptionName):
+        self.check()
+
+    def track_payloadBytes(self, rows, columns, assumptionName):
+        assumptionResults, vizs = self.check()
+        return payloadBytes({"assumptionResults": assumptionResults, "viz": vizs})
+    track_payloadBytes.unit = "bytes"
@@ -0,0 +1,24 @@
+"""
+Ranking the candidate predictors of a variable selection step, GuidedStep.compare
+"""
+from .common import ROWS, COLUMNS, frame, predictors, require
+
+
+class Compare:
+    params = [ROWS, COLUMNS, ["pearson", "spearman"]]
+    param_names = ["rows", "columns", "metric"]
+    number = 1
+    timeout = 600
+
+    def setup(self, rows, columns, metric):
+        require(rows, columns)
+        from guidedstats.step import GuidedStep
+        self.data = frame(rows, columns)
+        self.step = GuidedStep(metricName=metric)
+        self.step.metric.cache = None
+
+    def time_compare(self, rows, columns, metric):
+        self.step.compare(self.data, predictors(columns), 4, "y")
+
+    def peakmem_compare(self, rows, columns, metric):
+        self.step.compare(self.data, predictors(columns), 4, "y")
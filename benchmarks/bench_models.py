@@ -0,0 +1,57 @@
+"""
+Fitting every model of models, and predicting with the linear ones
+"""
+from .common import ROWS, COLUMNS, GROUPS, MAX_CELLS, frame, predictors, require
+
+MODEL_NAMES = ["Simple Linear Regression", "Ridge Regression", "Lasso Regression", "T Test"]
+# the lasso is fitted by coordinate descent, it gets a smaller budget
+MAX_CELLS_LASSO = MAX_CELLS // 50
+
+
+class FitModel:
+    params = [ROWS, COLUMNS, MODEL_NAMES]
+    param_names = ["rows", "columns", "model"]
+    number = 1
+    timeout = 900
+
+    def setup(self, rows, columns, modelName):
+        if modelName == "T Test" and columns != COLUMNS[0]:
+            raise NotImplementedError("the t test compares a single column")
+        require(rows, columns, maxCells=MAX_CELLS_LASSO if modelName == "Lasso Regression" else MAX_CELLS)
+        from guidedstats.model import ModelWrapper
+        data = frame(rows, columns)
+        if modelName == "T Test":
+            groups = data["group"]
+            self.inputs = (data.loc[groups == GROUPS[0], ["y"]], data.loc[groups == GROUPS[1], ["y"]])
+        else:
+            self.inputs = (data[predictors(columns)], data[["y"]])
+        self.model = ModelWrapper()
+        self.model.setModel(modelName)
+
+    def time_fit(self, rows, columns, modelName):
+        self.model.fit(*self.inputs)
+
+    def peakmem_fit(self, rows, columns, modelName):
+        self.model.fit(*self.inputs)
+
+
+class Predict:
+    params = [ROWS, COLUMNS, MODEL_NAMES[:3]]
+    param_names = ["rows", "columns", "model"]
+    number = 1
+    timeout = 900
+
+    def setup(self, rows, columns, modelName):
+        require(rows, columns, maxCells=MAX_CELLS_LASSO if modelName == "Lasso Regression" else MAX_CELLS)
+        from guidedstats.model import ModelWrapper
+        data = frame(rows, columns)
+        self.X = data[predictors(columns)]
+        self.model = ModelWrapper()
+        self.model.setModel(modelName)
+        self.model.fit(self.X, data[["y"]])
+
+    def time_predict(self, rows, columns, modelName):
+        self.model.predict(self.X)
+
+    def peakmem_predict(self, rows, columns, modelName):
+        self.model.predict(self.X)
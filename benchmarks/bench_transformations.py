@@ -0,0 +1,30 @@
+"""
+Every entry of TRANSFORMATIONS applied to all predictors
+"""
+from .common import ROWS, COLUMNS, frame, predictors, require
+
+TRANSFORMATION_NAMES = ["Logarithmic Transform", "Clip Extreme Values", "Delete Outliers"]
+
+
+class Transform:
+    params = [ROWS, COLUMNS, TRANSFORMATION_NAMES]
+    param_names = ["rows", "columns", "transformation"]
+    number = 1
+    timeout = 600
+
+    def setup(self, rows, columns, transformationName):
+        require(rows, columns)
+        from guidedstats.transformations import TRANSFORMATIONS
+        self.func = TRANSFORMATIONS[transformationName]["func"]
+        self.columns = predictors(columns)
+        self.data = frame(rows, columns)
+        if transformationName == "Logarithmic Transform":
+            # the logarithm needs positive values
+            self.data = self.data.copy()
+            self.data[self.columns] = self.data[self.columns].abs() + 1
+
+    def time_transform(self, rows, columns, transformationName):
+        self.func(self.data, self.columns)
+
+    def peakmem_transform(self, rows, columns, transformationName):
+        self.func(self.data, self.columns)
@@ -0,0 +1,63 @@
+"""
+Every builder of VIZ on one column (or one pair of columns) of the synthetic data
+"""
+import numpy as np
+
+from .common import ROWS, COLUMNS, GROUPS, frame, payloadBytes, predictors, require
+
+VIZ_NAMES = ["boxplot", "multiBoxplot", "density", "heatmap", "residual", "residualGroups",
+             "ttest", "regression", "regularizationPath"]
+
+
+def vizInputs(vizName: str, rows: int, columns: int):
+    data = frame(rows, columns)
+    x, y = data["x0"], data["y"]
+    y_hat = data[predictors(min(columns, 5))].to_numpy() @ np.array([3.0, -2.0, 1.0, 0.5, 0.25])[:min(columns, 5)]
+    groups = data["group"]
+    if vizName == "multiBoxplot":
+        return (y[groups == GROUPS[0]].copy(), y[groups == GROUPS[1]].copy()), {"groups": GROUPS[:2]}
+    if vizName == "heatmap":
+        return (x, data[predictors(columns)]), {}
+    if vizName == "residual":
+        return (y_hat, y.to_numpy()), {}
+    if vizName == "residualGroups":
+        split = int(rows * 0.8)
+        return ({"Train": (y.to_numpy()[:split], y_hat[:split]), "Test": (y.to_numpy()[split:], y_hat[split:])},), \
+            {"stratify": True}
+    if vizName == "ttest":
+        return (y[groups == GROUPS[0]], y[groups == GROUPS[1]]), {"groups": GROUPS[:2]}
+    if vizName == "regression":
+        return (x, y), {}
+    if vizName == "regularizationPath":
+        # a path of 30 alphas, its size depends on the columns only
+        alphas = np.logspace(2, -4, 30)
+        coefficients = np.random.default_rng(0).standard_normal((30, columns + 1))
+        return (alphas, coefficients, ["const"] + predictors(columns), np.linspace(2, 1, 30), np.full(30, 0.1)), \
+            {"bestAlpha": float(alphas[-1])}
+    return (x,), {}
+
+
+class BuildViz:
+    params = [ROWS, COLUMNS, VIZ_NAMES]
+    param_names = ["rows", "columns", "viz"]
+    number = 1
+    timeout = 600
+
+    def setup(self, rows, columns, vizName):
+        # only the heatmap and the regularization path grow with the number of columns
+        if vizName not in ["heatmap", "regularizationPath"] and columns != COLUMNS[0]:
+            raise NotImplementedError("{} is built from a single column".format(vizName))
+        require(rows, columns, pairs=vizName == "heatmap")
+        from guidedstats.viz import VIZ
+        self.builder = VIZ[vizName]
+        self.inputs, self.kwargs = vizInputs(vizName, rows, columns)
+
+    def time_build(self, rows, columns, vizName):
+        self.builder(*self.inputs, **self.kwargs)
+
+    def peakmem_build(self, rows, columns, vizName):
+        self.builder(*self.inputs, **self.kwargs)
+
+    def track_payloadBytes(self, rows, columns, vizName):
+        return payloadBytes(self.builder(*self.inputs, **self.kwargs))
+    track_payloadBytes.unit = "bytes"
@@ -0,0 +1,55 @@
+"""
+Headless runs of the built-in workflows (_regressionConfig and _ttestConfig), and the
+size and cost of serializing their workflowInfo for the frontend
+"""
+from .common import ROWS, COLUMNS, frame, payloadBytes, regressionSelections, require, ttestSelections
+
+WORKFLOWS = ["Linear Regression", "T Test"]
+
+
+def selectionsOf(workflowName: str, columns: int):
+    return regressionSelections(columns) if workflowName == "Linear Regression" else ttestSelections()
+
+
+class HeadlessRun:
+    params = [ROWS, COLUMNS, WORKFLOWS]
+    param_names = ["rows", "columns", "workflow"]
+    number = 1
+    timeout = 1800
+
+    def setup(self, rows, columns, workflowName):
+        require(rows, columns)
+        self.data = frame(rows, columns)
+        self.selections = selectionsOf(workflowName, columns)
+
+    def run(self, workflowName):
+        from guidedstats.cache import RESULT_CACHE
+        from guidedstats.runner import runWorkflow
+        # a cached run would only measure lookups
+        RESULT_CACHE.clear()
+        return runWorkflow(self.data, workflowName, self.selections, exportCode=False)
+
+    def time_run(self, rows, columns, workflowName):
+        self.run(workflowName)
+
+    def peakmem_run(self, rows, columns, workflowName):
+        self.run(workflowName)
+
+
+class WorkflowInfo:
+    params = [ROWS, COLUMNS, WORKFLOWS]
+    param_names = ["rows", "columns", "workflow"]
+    number = 1
+    timeout = 1800
+
+    def setup(self, rows, columns, workflowName):
+        require(rows, columns)
+        from guidedstats.runner import executeWorkflow
+        self.workflow = executeWorkflow(frame(rows, columns), workflowName, selectionsOf(workflowName, columns))
+
+    def time_updateWorkflowInfo(self, rows, columns, workflowName):
+        self.workflow.updateWorkflowInfo(None)
+
+    def track_workflowInfoBytes(self, rows, columns, workflowName):
+        return payloadBytes(self.workflow.workflowInfo)
+    track_workflowInfoBytes.unit = "bytes"
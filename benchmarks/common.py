@@ -0,0 +1,65 @@
+"""
+Synthetic datasets and helpers shared by the benchmarks
+"""
+import functools
+import json
+
+import numpy as np
+import pandas as pd
+
+ROWS = [1000, 100000, 10000000]
+COLUMNS = [5, 50, 5000]
+# frames above this many cells (400 MB of float64) are skipped
+MAX_CELLS = 50000000
+# checks building a columns x columns matrix are skipped above this many pairs
+MAX_PAIRS = 1000000
+GROUPS = ["a", "b", "c"]
+
+
+def require(rows: int, columns: int, maxCells: int = MAX_CELLS, pairs: bool = False):
+    """
+    Skip a parameter combination (asv skips benchmarks whose setup raises NotImplementedError)
+    """
+    if rows * columns > maxCells or (pairs and columns * columns > MAX_PAIRS):
+        raise NotImplementedError("{} rows x {} columns is above the benchmark budget".format(rows, columns))
+
+
+@functools.lru_cache(maxsize=2)
+def frame(rows: int, columns: int, seed: int = 0):
+    """
+    columns normal predictors x0..., a response y linear in the first five with a few
+    outliers, and a categorical column group. Cached, benchmarks must not modify it
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((rows, columns))
+    coefficients = np.zeros(columns)
+    coefficients[:5] = [3.0, -2.0, 1.0, 0.5, 0.25][:columns]
+    y = X @ coefficients + rng.standard_normal(rows)
+    outliers = rng.choice(rows, max(1, rows // 1000), replace=False)
+    y[outliers] += 10 * rng.standard_normal(len(outliers))
+    data = pd.DataFrame(X, columns=predictors(columns))
+    data["y"] = y
+    data["group"] = pd.Series(rng.choice(GROUPS, rows)).astype("object")
+    return data
+
+
+def predictors(columns: int):
+    return ["x{}".format(i) for i in range(columns)]
+
+
+def payloadBytes(value):
+    """
+    Bytes sent to the frontend for value: its JSON state plus its binary buffers
+    """
+    from ipywidgets.widgets.widget import _remove_buffers
+    from guidedstats.utils import encodeBuffers
+    state, _, buffers = _remove_buffers(encodeBuffers(value))
+    return len(json.dumps(state)) + sum(len(buffer) for buffer in buffers)
+
+
+def regressionSelections(columns: int):
+    return {"dependent": "y", "independent": predictors(min(columns, 3)), "trainSize": 0.8}
+
+
+def ttestSelections():
+    return {"dependent": "y", "group": "group", "groups": GROUPS[:2]}
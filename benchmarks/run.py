@@ -0,0 +1,223 @@
+"""
+Run the benchmarks without asv. The suites follow the asv conventions: classes or functions
+whose methods start with time_ (wall time, best of --repeat runs), peakmem_ (peak traced
+allocation) or track_ (the returned value), parametrized by params/param_names, and skipped
+when setup raises NotImplementedError.
+
+    python -m benchmarks.run --quick                    # smallest sizes, working tree
+    python -m benchmarks.run -b Compare -b BuildViz     # only the matching benchmarks
+    python -m benchmarks.run --commits main HEAD        # run two commits and compare them
+    python -m benchmarks.run --compare old.json new.json
+
+Results are written to benchmarks/results/<commit>.json
+"""
+import argparse
+import importlib
+import inspect
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+RESULTS = os.path.join(HERE, "results")
+MODULES = ["bench_compare", "bench_assumptions", "bench_viz", "bench_transformations", "bench_models",
+           "bench_workflow", "startup"]
+KINDS = {"time_": "seconds", "peakmem_": "bytes", "track_": None}
+# sizes run by --quick
+QUICK_ROWS = 100000
+QUICK_COLUMNS = 50
+# ratios beyond this factor are flagged by --compare
+FACTOR = 1.1
+
+
+def discover(patterns: list = None):
+    """
+    (name, owner, method name, params, param names) of every benchmark matching one of patterns
+    """
+    benchmarks = []
+    for moduleName in MODULES:
+        module = importlib.import_module("benchmarks." + moduleName)
+        owners = [(name, obj) for name, obj in vars(module).items()
+                  if getattr(obj, "__module__", None) == module.__name__ and (inspect.isclass(obj) or inspect.isfunction(obj))]
+        for ownerName, owner in owners:
+            methods = [name for name in dir(owner) if name.startswith(tuple(KINDS))] if inspect.isclass(owner) \
+                else ([ownerName] if ownerName.startswith(tuple(KINDS)) else [])
+            for method in methods:
+                name = "{}.{}".format(moduleName, ownerName if method == ownerName else ownerName + "." + method)
+                if patterns and not any(re.search(pattern, name) for pattern in patterns):
+                    continue
+                params = getattr(owner, "params", [])
+                benchmarks.append((name, owner, method, params, getattr(owner, "param_names", [])))
+    return benchmarks
+
+
+def measure(call, kind: str, repeat: int):
+    if kind == "time_":
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            call()
+            best = min(best, time.perf_counter() - start)
+        return best
+    if kind == "peakmem_":
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            call()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return call()
+
+
+def runBenchmark(owner, method: str, params: tuple, repeat: int):
+    """
+    The value of one benchmark for one combination of params, None if it is skipped
+    """
+    instance = owner() if inspect.isclass(owner) else None
+    func = getattr(instance, method) if instance is not None else owner
+    kind = next(prefix for prefix in KINDS if method.startswith(prefix))
+    try:
+        if instance is not None and hasattr(instance, "setup"):
+            instance.setup(*params)
+    except NotImplementedError:
+        return None, None
+    try:
+        value = measure(lambda: func(*params), kind, repeat)
+    finally:
+        if instance is not None and hasattr(instance, "teardown"):
+            instance.teardown(*params)
+    return value, KINDS[kind] or getattr(func, "unit", "")
+
+
+def tryBenchmark(owner, method: str, params: tuple, repeat: int):
+    """
+    runBenchmark, a failure (e.g. an API missing at an older commit) is reported and skipped
+    """
+    try:
+        return runBenchmark(owner, method, params, repeat)
+    except Exception as e:
+        print("  failed: {}: {}".format(type(e).__name__, e), file=sys.stderr, flush=True)
+        return None, None
+
+
+def quickParams(params: list, paramNames: list):
+    return [[value for value in values if name not in ["rows", "columns"] or
+             value <= (QUICK_ROWS if name == "rows" else QUICK_COLUMNS)]
+            for name, values in zip(paramNames, params)]
+
+
+def runAll(patterns: list = None, quick: bool = False, repeat: int = 3, verbose: bool = True):
+    results = {}
+    for name, owner, method, params, paramNames in discover(patterns):
+        if quick:
+            params = quickParams(params, paramNames)
+        for combination in itertools.product(*params):
+            key = name + ("({})".format(", ".join(map(str, combination))) if combination else "")
+            value, unit = tryBenchmark(owner, method, combination, repeat)
+            if value is None:
+                continue
+            results[key] = {"value": value, "unit": unit}
+            if verbose:
+                print("{:<90} {}".format(key, formatValue(value, unit)), flush=True)
+    return results
+
+
+def formatValue(value, unit: str):
+    if unit == "seconds":
+        return "{:.4g} s".format(value)
+    if unit == "bytes":
+        return "{:.4g} MB".format(value / 2 ** 20)
+    return "{:.4g} {}".format(value, unit)
+
+
+def commitOf(source: str):
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=source, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return "worktree"
+
+
+def save(results: dict, commit: str, path: str = None):
+    path = path or os.path.join(RESULTS, "{}.json".format(commit))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"commit": commit, "date": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                   "machine": platform.machine(), "cpus": os.cpu_count(), "results": results}, f, indent=1)
+    return path
+
+
+def compare(old: dict, new: dict, factor: float = FACTOR):
+    """
+    Print the ratio new / old of every benchmark in both results, flagging changes beyond factor
+    """
+    print("{:<90} {:>12} {:>12} {:>8}".format("benchmark", old["commit"], new["commit"], "ratio"))
+    for key in sorted(set(old["results"]) & set(new["results"])):
+        before, after = old["results"][key], new["results"][key]
+        ratio = after["value"] / before["value"] if before["value"] else float("nan")
+        flag = "+" if ratio > factor else "-" if ratio < 1 / factor else " "
+        print("{} {:<88} {:>12} {:>12} {:>8.3f}".format(flag, key, formatValue(before["value"], before["unit"]),
+                                                        formatValue(after["value"], after["unit"]), ratio))
+
+
+def runCommit(commit: str, arguments: list):
+    """
+    Benchmark guidedstats as of commit, checked out in a temporary worktree. The
+    benchmarks themselves are those of the current tree
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        worktree = os.path.join(directory, "guidedstats")
+        subprocess.run(["git", "worktree", "add", "--detach", worktree, commit], cwd=REPO, check=True,
+                       capture_output=True)
+        try:
+            output = os.path.join(RESULTS, "{}.json".format(commitOf(worktree)))
+            subprocess.run([sys.executable, "-m", "benchmarks.run", "--source", worktree, "--output", output]
+                           + arguments, cwd=REPO, check=True)
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", worktree], cwd=REPO, check=True)
+    with open(output) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Run the GuidedStats benchmarks")
+    parser.add_argument("-b", "--bench", action="append", dest="patterns",
+                        help="regular expression selecting benchmarks by name, can be repeated")
+    parser.add_argument("--quick", action="store_true",
+                        help="only up to {} rows and {} columns".format(QUICK_ROWS, QUICK_COLUMNS))
+    parser.add_argument("--repeat", type=int, default=3, help="runs of every time_ benchmark, the best is kept")
+    parser.add_argument("--commits", nargs=2, metavar=("OLD", "NEW"), help="benchmark two commits and compare them")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--factor", type=float, default=FACTOR)
+    parser.add_argument("--source", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.compare is not None:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            compare(json.load(old), json.load(new), args.factor)
+        return
+    forwarded = sum([["-b", pattern] for pattern in args.patterns or []], []) + ["--repeat", str(args.repeat)] \
+        + (["--quick"] if args.quick else [])
+    if args.commits is not None:
+        old, new = [runCommit(commit, forwarded) for commit in args.commits]
+        compare(old, new, args.factor)
+        return
+    source = args.source or REPO
+    # guidedstats is imported from source, the benchmarks from this tree
+    sys.path.insert(0, source)
+    results = runAll(args.patterns, args.quick, args.repeat)
+    print("results written to", save(results, commitOf(source), args.output))
+
+
+if __name__ == "__main__":
+    main()
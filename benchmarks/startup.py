@@ -0,0 +1,124 @@
+"""
+Startup cost of GuidedStats: import time and resident memory of `import guidedstats`,
+of importing the widget and of constructing GuidedStats(df) with a workflow selected.
+Every measurement runs in a fresh interpreter, so modules imported by other benchmarks
+are not counted. The track_* functions follow the asv conventions, run the file directly
+for a summary: python benchmarks/startup.py
+"""
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEATS = 3
+# modules the widget should only import when a metric, model or exporter needs them
+HEAVY_MODULES = ["scipy", "statsmodels", "matplotlib", "altair", "stargazer", "varname"]
+
+PRELUDE = """
+import json, resource, sys, time
+def residentMB():
+    # current resident set size on Linux, the peak elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+def measure(start, rss):
+    return {"seconds": time.perf_counter() - start, "rssMB": residentMB() - rss,
+            "heavy": [m for m in %r if m in sys.modules]}
+""" % HEAVY_MODULES
+
+SCRIPTS = {
+    "import": """
+rss = residentMB()
+start = time.perf_counter()
+import guidedstats
+result = measure(start, rss)
+""",
+    "importWidget": """
+rss = residentMB()
+start = time.perf_counter()
+from guidedstats import GuidedStats
+result = measure(start, rss)
+""",
+    # the dataset and IPython are loaded first, only what GuidedStats(df) adds is measured
+    "construct": """
+import numpy as np, pandas as pd
+from IPython.core.interactiveshell import InteractiveShell
+shell = InteractiveShell.instance()
+rng = np.random.default_rng(0)
+df = pd.DataFrame(rng.normal(size=(100000, 10)), columns=["x{}".format(i) for i in range(10)])
+shell.user_ns["df"] = df
+rss = residentMB()
+start = time.perf_counter()
+from guidedstats import GuidedStats
+gs = GuidedStats(df)
+shell.user_ns["gs"] = gs
+gs.selectedWorkflow = "Linear Regression"
+result = measure(start, rss)
+""",
+}
+
+
+def source():
+    """
+    The directory guidedstats is imported from, found without importing it
+    """
+    spec = importlib.util.find_spec("guidedstats")
+    if spec is None:
+        return REPO
+    return os.path.dirname(list(spec.submodule_search_locations)[0])
+
+
+def run(name: str):
+    """
+    Run SCRIPTS[name] in a fresh interpreter, return {"seconds", "rssMB", "heavy"}
+    """
+    code = PRELUDE + SCRIPTS[name] + "\nprint(json.dumps(result))\n"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([source(), os.environ.get("PYTHONPATH", "")]))
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True,
+                            text=True, env=env, cwd=source()).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def best(name: str):
+    """
+    The fastest of REPEATS runs, its memory and heavy modules are those of the same run
+    """
+    return min((run(name) for _ in range(REPEATS)), key=lambda result: result["seconds"])
+
+
+def track_importSeconds():
+    return best("import")["seconds"]
+
+
+def track_importWidgetSeconds():
+    return best("importWidget")["seconds"]
+
+
+def track_constructSeconds():
+    return best("construct")["seconds"]
+
+
+def track_constructMemory():
+    return best("construct")["rssMB"]
+
+
+def track_heavyModulesAfterConstruct():
+    return len(run("construct")["heavy"])
+
+
+track_importSeconds.unit = "seconds"
+track_importWidgetSeconds.unit = "seconds"
+track_constructSeconds.unit = "seconds"
+track_constructMemory.unit = "MB"
+track_heavyModulesAfterConstruct.unit = "modules"
+
+
+if __name__ == "__main__":
+    for name in SCRIPTS:
+        result = best(name)
+        print("{:<14} {:8.3f} s {:8.1f} MB  heavy modules: {}".format(
+            name, result["seconds"], result["rssMB"], ", ".join(result["heavy"]) or "none"))
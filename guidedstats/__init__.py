@@ -4,9 +4,17 @@
 # Copyright (c) Yuqi(Adam) Zhang.
 # Distributed under the terms of the Modified BSD License.
 
-from .visualizer import GuidedStats
+from .source import ChunkedFrame
 from ._version import __version__, version_info
 
+
+def __getattr__(name):
+    # the widget pulls in ipywidgets and the steps, it is only imported once it is used
+    if name == "GuidedStats":
+        from .visualizer import GuidedStats
+        return GuidedStats
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
 def _jupyter_labextension_paths():
     """Called by Jupyter Lab Server to detect if it is a valid labextension and
     to install the widget
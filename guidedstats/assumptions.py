@@ -1,10 +1,28 @@
 from typing import Iterable
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy import stats
 import pandas as pd
-from .metrics import METRICS
+from .metrics import (METRICS, BATCH_ASSUMPTION_METRICS, vifFromCorrelation, normalityMoments, dagostinoK2,
+                      jarqueBera, andersonDarling, shapiroWilk, normalityTest)
+from .utils import QUANTITATIVE_DTYPES, iqrBounds, outlierMask
 from .viz import VIZ
+from .cache import RESULT_CACHE, resultKey
+from .executor import checkpoint
+
+def sharedCorrelation(X: pd.DataFrame, design_matrix: pd.DataFrame = None, *args, **kwargs):
+    """
+    Correlation matrix of the design matrix and all VIFs derived from it,
+    shared by the heatmap viz and the VIF metric of every column
+    """
+    if design_matrix is None:
+        design_matrix = X
+    profile = kwargs.get("profile", None)
+    corr = profile.getCorrelation(design_matrix) if profile is not None else None
+    if corr is None:
+        corr = design_matrix.corr(numeric_only=True)
+    columns = [col for col in corr.index if design_matrix[col].dtype in QUANTITATIVE_DTYPES]
+    vifs = vifFromCorrelation(corr.loc[columns, columns]) if len(columns) > 1 else None
+    return {"corr": corr, "vifs": vifs}
+
 
 ASSUMPTIONS = {
     "outlier": {
@@ -12,6 +30,8 @@ ASSUMPTIONS = {
         "isSingleColumn": True,
         "vis_type": "boxplot",
         "metric_func": METRICS["outlier"],
+        "batch_func": BATCH_ASSUMPTION_METRICS["outlier"],
+        "helper_funcs": [iqrBounds, outlierMask],
         "prompt": '{stats} outlier(s) fall outside of the "interquartile range" (IQR)',
         "suggestions": [
             {
@@ -33,6 +53,7 @@ ASSUMPTIONS = {
         "isSingleColumn": True,
         "vis_type": "multiBoxplot",
         "metric_func": METRICS["levene"],
+        "batch_func": BATCH_ASSUMPTION_METRICS["levene"],
         "prompt": "The p-value of Levene Test is {pvalue}, which {rejectIndicator} the null hypothesis that the variances are equal",
         "suggestions": [
             {
@@ -47,7 +68,9 @@ ASSUMPTIONS = {
         "isSingleColumn": True,
         "vis_type": "density",
         "metric_func": METRICS["sharpiro"],
-        "prompt": "The p-value of Shapiro-Wilk Test is {pvalue}(n = {count}), which {rejectIndicator} the null hypothesis that the data is normally distributed",
+        "batch_func": BATCH_ASSUMPTION_METRICS["sharpiro"],
+        "helper_funcs": [normalityMoments, dagostinoK2, jarqueBera, andersonDarling, shapiroWilk, normalityTest],
+        "prompt": "The p-value of {method} is {pvalue}(n = {count}), which {rejectIndicator} the null hypothesis that the data is normally distributed",
         "suggestions": [
             {
                 "message": "If the assumption of normality is heavily violated, consider using a non-parametric test like the Mann-Whitney U test.",
@@ -64,6 +87,9 @@ ASSUMPTIONS = {
         "isSingleColumn": True,
         "vis_type": "heatmap",
         "metric_func": METRICS["VIF"],
+        "batch_func": BATCH_ASSUMPTION_METRICS["VIF"],
+        "helper_funcs": [vifFromCorrelation],
+        "shared_func": sharedCorrelation,
         # A VIF of 1 means that there is no correlation among the jth predictor and the remaining predictor variables, and hence the variance of bj is not inflated at all. The general rule of thumb is that VIFs exceeding 4 warrant further investigation, while VIFs exceeding 10 are signs of serious multicollinearity requiring correction.
         "prompt": "The VIF of the predictor is {stats}. {annotation}",
         "suggestions": [
@@ -94,12 +120,35 @@ ASSUMPTIONS = {
 }
 
 
+def columnOutputs(outputs: dict, j: int):
+    """
+    Slice the j-th column out of the arrays returned by a column-wise metric
+    """
+    column = {}
+    for key, value in outputs.items():
+        if isinstance(value, dict):
+            column[key] = columnOutputs(value, j)
+        elif isinstance(value, np.ndarray):
+            item = value[j]
+            if isinstance(item, np.ndarray):
+                column[key] = tuple(item.tolist())
+            elif isinstance(item, np.generic):
+                column[key] = item.item()
+            else:
+                column[key] = item
+        else:
+            column[key] = value
+    return column
+
+
 class AssumptionWrapper(object):
     def __init__(self):
         self._assumption = None
         self._assumptionName = None
         self.selfDefinedAssumptions = {}
         self.allExtraStats = []
+        # set to None to disable caching
+        self.cache = RESULT_CACHE
 
     def addAssumption(self, assumptionName: str, assumption: dict):
         """
@@ -111,6 +160,9 @@ class AssumptionWrapper(object):
                 "vis_type": str | None,
                 "metric_func": list[function] | None,
                 "prompt": str,
+                "helper_funcs": list[function] (optional, exported along with metric_func),
+                "shared_func": function (optional, computes statistics once for all columns),
+                "batch_func": function (optional, column-wise form of metric_func returning arrays),
             }       
         """
         # TBC, should check the assumption type
@@ -125,25 +177,58 @@ class AssumptionWrapper(object):
             raise KeyError("The assumption does not exist")
 
     def checkAssumption(self, X: pd.DataFrame, *referenceXs: pd.DataFrame, **kwargs):
+        key = None
+        if self.cache is not None and self._assumptionName not in self.selfDefinedAssumptions:
+            # the profile only speeds up the check, results do not depend on it
+            key = resultKey("assumption", self._assumptionName, X, *referenceXs,
+                            **{name: value for name, value in kwargs.items() if name != "profile"})
+        if key is None:
+            return self._checkAssumption(X, *referenceXs, **kwargs)
+
+        def check():
+            assumptionResults, vizs = self._checkAssumption(X, *referenceXs, **kwargs)
+            return assumptionResults, vizs, self.allExtraStats
+        assumptionResults, vizs, self.allExtraStats = self.cache.getOrCompute(key, check)
+        return assumptionResults, vizs
+
+    def _checkAssumption(self, X: pd.DataFrame, *referenceXs: pd.DataFrame, **kwargs):
         self.allExtraStats = []
         assumptionResults = []
         vizStats = []
+        if self._assumption.get("shared_func", None) is not None:
+            # statistics computed once and shared by the viz and the metric of every column
+            kwargs.update(self._assumption["shared_func"](X, *referenceXs, **kwargs))
         if self._assumption["isSingleColumn"]:
-            for col in X.columns:
-                previousInputs = kwargs.get("previousInputs", None)
-                if previousInputs is not None:
-                    previousX = list(previousInputs.values())[0][col]
+            previousInputs = kwargs.get("previousInputs", None)
+            previous = list(previousInputs.values())[0] if previousInputs is not None else None
+            batchOutputs = None
+            if self._assumption.get("batch_func", None) is not None:
+                # every column is checked in a single call, per-column results are sliced from the arrays
+                previousX = previous[list(X.columns)] if previous is not None else None
+                batchOutputs = self._assumption["batch_func"](
+                    X, *referenceXs, previousX=previousX, **kwargs)
+                vizKwargs = batchOutputs.pop("vizKwargs", {})
+            for j, col in enumerate(X.columns):
+                checkpoint(j / len(X.columns), "Checking {}".format(col))
+                previousX = previous[col] if previous is not None else None
+                columnVizKwargs = {}
+                if batchOutputs is not None:
+                    outputs = columnOutputs(batchOutputs, j)
+                    columnVizKwargs = columnOutputs(vizKwargs, j)
+                elif self._assumption["metric_func"] is not None:
+                    outputs = self._assumption["metric_func"](
+                        X[[col]], *referenceXs, previousX=previousX, **kwargs)
+                    # the viz reuses what the metric has computed
+                    columnVizKwargs = outputs.pop("vizKwargs", {})
                 else:
-                    previousX = None
+                    outputs = None
+
                 if self._assumption["vis_type"] is not None:
                     stats = VIZ[self._assumption["vis_type"]](
-                        X[col], *referenceXs, previousX=previousX, **kwargs)
+                        X[col], *referenceXs, previousX=previousX, **columnVizKwargs, **kwargs)
                     vizStats.append(stats)
 
-                if self._assumption["metric_func"] is not None:
-                    outputs = self._assumption["metric_func"](
-                        X[[col]], *referenceXs, previousX=previousX, **kwargs)
-
+                if outputs is not None:
                     extraStats = outputs.pop("extraStats", None)
                     if extraStats is not None:
                         self.allExtraStats.append(extraStats)
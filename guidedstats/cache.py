@@ -0,0 +1,218 @@
+"""
+This file contains the content-addressed cache of metric and assumption results,
+results are keyed by a fingerprint of the data they were computed on
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class Uncacheable(Exception):
+    pass
+
+
+def _updateArray(hasher, array: np.ndarray):
+    if array.dtype == object:
+        # python objects have no stable buffer, hash their values instead
+        array = pd.util.hash_array(array.reshape(-1))
+    hasher.update(str(array.dtype).encode())
+    hasher.update(str(array.shape).encode())
+    hasher.update(np.ascontiguousarray(array).view(np.uint8).reshape(-1))
+
+
+def _updateIndex(hasher, index: pd.Index):
+    if isinstance(index, pd.RangeIndex):
+        hasher.update(repr((index.start, index.stop, index.step)).encode())
+    else:
+        _updateArray(hasher, np.asarray(index))
+
+
+def _update(hasher, value):
+    hasher.update(type(value).__name__.encode())
+    if value is None or isinstance(value, (bool, int, float, str, np.generic)):
+        hasher.update(repr(value).encode())
+    elif isinstance(value, pd.DataFrame):
+        hasher.update(repr(list(value.columns)).encode())
+        _updateIndex(hasher, value.index)
+        for col in range(value.shape[1]):
+            _updateArray(hasher, np.asarray(value.iloc[:, col]))
+    elif isinstance(value, pd.Series):
+        hasher.update(repr(value.name).encode())
+        _updateIndex(hasher, value.index)
+        _updateArray(hasher, np.asarray(value))
+    elif isinstance(value, np.ndarray):
+        _updateArray(hasher, value)
+    elif isinstance(value, pd.Index):
+        _updateIndex(hasher, value)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _update(hasher, key)
+            _update(hasher, item)
+    elif isinstance(value, (list, tuple)):
+        hasher.update(str(len(value)).encode())
+        for item in value:
+            _update(hasher, item)
+    else:
+        raise Uncacheable(type(value).__name__)
+
+
+def fingerprint(*values):
+    """
+    Fast digest of values: the buffers, dtypes and shapes of arrays, the names and
+    index of pandas objects and the repr of scalars. Raise Uncacheable for other objects
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    for value in values:
+        _update(hasher, value)
+    return hasher.hexdigest()
+
+
+def sameContent(old, new):
+    """
+    Whether old and new hold the same data, values that cannot be fingerprinted are only the same if identical
+    """
+    if old is new:
+        return True
+    try:
+        return fingerprint(old) == fingerprint(new)
+    except Uncacheable:
+        return False
+
+
+def sizeOf(value):
+    """
+    Approximate number of bytes held by a cached result
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=False)))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sizeOf(key) + sizeOf(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sizeOf(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def structuralCopy(value):
+    """
+    Copy the dicts and lists of value, the leaves (scalars, arrays) are shared
+    """
+    if isinstance(value, dict):
+        return {key: structuralCopy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [structuralCopy(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(structuralCopy(item) for item in value)
+    return value
+
+
+class ResultCache(object):
+    """
+    LRU cache of results within a memory budget of maxBytes. Shared by the kernel thread and
+    the background jobs of the steps, the entries and counters are guarded by a lock
+    """
+
+    def __init__(self, maxBytes: int = DEFAULT_MAX_BYTES):
+        self.maxBytes = maxBytes
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+        # entries are never modified once stored, so they are copied outside of the lock
+        return structuralCopy(entry[0])
+
+    def put(self, key, value):
+        size = sizeOf(value)
+        value = structuralCopy(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if size > self.maxBytes:
+                return
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            self.evict()
+
+    def evict(self):
+        with self._lock:
+            while self.nbytes > self.maxBytes and len(self._entries) > 0:
+                _, (_, size) = self._entries.popitem(last=False)
+                self.nbytes -= size
+                self.evictions += 1
+
+    def resize(self, maxBytes: int):
+        with self._lock:
+            self.maxBytes = maxBytes
+            self.evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def getOrCompute(self, key, func, *args, **kwargs):
+        """
+        Return the cached result of key, or compute, store and return func(*args, **kwargs).
+        func runs outside of the lock, two threads missing the same key both compute it
+        """
+        if key is None:
+            return func(*args, **kwargs)
+        missing = object()
+        # get counts the miss
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        value = func(*args, **kwargs)
+        self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "nbytes": self.nbytes, "maxBytes": self.maxBytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+def resultKey(kind: str, name: str, *values, **kwargs):
+    """
+    Key of a result computed by the metric or assumption name on values, None if it cannot be cached
+    """
+    try:
+        return (kind, name, fingerprint(values, sorted(kwargs.items())))
+    except Uncacheable:
+        return None
+
+
+RESULT_CACHE = ResultCache()
@@ -1,3 +1,10 @@
+# alphaSearch="cv" picks alpha by k-fold cross validation over the regularization path
+ALPHA_SEARCH_PARAMETERS = [
+    {"name": "alphaSearch", "displayName": "Alpha Search", "options": [
+        {"name": "none"}, {"name": "cv"}], "default": "none", "value": "none"},
+    {"name": "folds", "displayName": "CV Folds", "default": 5, "value": 5},
+]
+
 _regressionConfig = [
     {"id": 0,
      "stepType": "LoadDatasetStep",  # for workflow
@@ -117,8 +124,8 @@ _regressionConfig = [
       "inputNames": ["XTrain", "yTrain"],
       "modelCandidates": [{"name": "Simple Linear Regression", "isDefault": True},
                           {"name": "Ridge Regression",
-                              "parameters": [{"name": "alpha"}]},
-                          {"name": "Lasso Regression", "parameters": [{"name": "alpha"}]}],
+                              "parameters": [{"name": "alpha"}, *ALPHA_SEARCH_PARAMETERS]},
+                          {"name": "Lasso Regression", "parameters": [{"name": "alpha"}, *ALPHA_SEARCH_PARAMETERS]}],
       }},
     {"id": 8,
      "stepType": "EvaluationStep",
@@ -131,7 +138,7 @@ _regressionConfig = [
                      "Consider more advanced regression techniques like Logistic Regression for binary outcomes, or fixed/random effects models for panel data."],
      "stepConfig":
      {"stepName": "Evaluate the model",
-      "inputNames": ["model", "results", "XTest", "yTest", "XTrain", "yTrain"],
+      "inputNames": ["model", "results", "XTest", "yTest", "XTrain", "yTrain", "folds"],
       "visType": "residual",
       "evaluationMetricNames": ["mse", "r2", "adjusted_r2"],
       }},
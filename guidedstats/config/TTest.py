@@ -69,12 +69,14 @@ _ttestConfig = [
         "stepExplanation": "Two independent samples t-Test requires the two groups have normal distributions. \
             In practice, the method is robust to violations of the normal population assumption. \
                 This is especially true when both n1 and n2 are at least about 30, by the Central Limit Theorem.\
-                    The Shapiro-Wilk test tests whether a random sample comes from a normal distribution.",
+                    The Shapiro-Wilk test tests whether a random sample comes from a normal distribution, \
+                        groups of more than 5000 samples are tested with D'Agostino's K-squared test.",
         "stepConfig":
         {"stepName": "Check Normality of the First Group",
          "inputNames": ["Y1"],
          "outputNames": ["Y1"],
          "assumptionName": "normality",
+         "assumptionOptions": {"normalityTest": "auto"},
          "isRelaxed": True,
          "succeedPreviousStepOutput": False,
          }
@@ -85,12 +87,14 @@ _ttestConfig = [
         "stepExplanation": "Two independent samples t-Test requires the two groups have normal distributions. \
             In practice, the method is robust to violations of the normal population assumption. \
                 This is especially true when both n1 and n2 are at least about 30, by the Central Limit Theorem.\
-                    The Shapiro-Wilk test tests whether a random sample comes from a normal distribution.",
+                    The Shapiro-Wilk test tests whether a random sample comes from a normal distribution, \
+                        groups of more than 5000 samples are tested with D'Agostino's K-squared test.",
         "stepConfig":
         {"stepName": "Check Normality of the Second Group",
          "inputNames": ["Y2"],
          "outputNames": ["Y2"],
          "assumptionName": "normality",
+         "assumptionOptions": {"normalityTest": "auto"},
          "isRelaxed": True,
          "succeedPreviousStepOutput": False,
          }
@@ -0,0 +1,200 @@
+"""
+This file contains the executor of step computations. Inline jobs run inside the
+observer that submits them, as before. Background jobs run on a thread or process
+pool; their result is applied on the kernel's event loop once they are done, unless
+a newer job of the same step has superseded them
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# minimum seconds between two progress updates sent to the frontend
+PROGRESS_INTERVAL = 0.2
+
+_local = threading.local()
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Job(object):
+    """
+    One run of a step computation. Config changes the step makes while the job runs
+    are staged in staged and applied with the result
+    """
+
+    def __init__(self, stepId: int, runId: int, label: str = ""):
+        self.stepId = stepId
+        self.runId = runId
+        self.label = label
+        self.fraction = None
+        self.cancelled = False
+        self.future = None
+        self.staged = {}
+        self.onProgress = None
+        self._published = 0.0
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def report(self, fraction: float = None, label: str = None):
+        if fraction is not None:
+            self.fraction = float(fraction)
+        if label is not None:
+            self.label = label
+        now = time.monotonic()
+        if self.onProgress is not None and now - self._published >= PROGRESS_INTERVAL:
+            self._published = now
+            self.onProgress(self)
+
+
+def currentJob():
+    """
+    The job running in this thread, None outside of jobs
+    """
+    return getattr(_local, "job", None)
+
+
+def checkpoint(fraction: float = None, label: str = None):
+    """
+    Report the progress of the running job, raise Cancelled if it has been cancelled.
+    Does nothing outside of jobs, so computations can call it unconditionally
+    """
+    job = currentJob()
+    if job is None:
+        return
+    if job.cancelled:
+        raise Cancelled()
+    job.report(fraction, label)
+
+
+def runJob(job: Job, func, args: tuple, kwargs: dict):
+    previous = currentJob()
+    _local.job = job
+    try:
+        if job.cancelled:
+            raise Cancelled()
+        return func(*args, **kwargs)
+    finally:
+        _local.job = previous
+
+
+class StepExecutor(object):
+    """
+    mode is "inline", "thread" or "process". Jobs that cannot be pickled (picklable=False)
+    run on the thread pool in process mode
+    """
+
+    def __init__(self, mode: str = "inline", workers: int = 1):
+        if mode not in ["inline", "thread", "process"]:
+            raise ValueError("Unknown executor mode {}".format(mode))
+        self.mode = mode
+        self.workers = workers
+        self.jobs = {}
+        self.runs = 0
+        self._threads = None
+        self._processes = None
+
+    def pool(self, picklable: bool):
+        if self.mode == "process" and picklable:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(max_workers=self.workers)
+            return self._processes
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="guidedstats")
+        return self._threads
+
+    def isRunning(self, step):
+        return step.stepId in self.jobs
+
+    def cancel(self, step):
+        job = self.jobs.pop(step.stepId, None)
+        if job is not None:
+            job.cancel()
+            self.publish(step, job, running=False, cancelled=True)
+
+    def submit(self, step, func, *args, apply=None, label: str = "", picklable: bool = False, **kwargs):
+        """
+        Run func(*args, **kwargs) for step and call apply(result) with its result, a running
+        job of the same step is cancelled and its result will be discarded
+        """
+        self.cancel(step)
+        self.runs += 1
+        job = Job(step.stepId, self.runs, label)
+        self.jobs[step.stepId] = job
+        self.publish(step, job, running=True)
+        if self.mode == "inline":
+            try:
+                result = runJob(job, func, args, kwargs)
+            except Exception as e:
+                self.finish(step, job, apply, error=e)
+                raise
+            self.finish(step, job, apply, result=result)
+            return job
+
+        loop = None
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+
+        def inLoop(callback, *callbackArgs):
+            # traits are only changed on the kernel's event loop, if there is one
+            if loop is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(callback, *callbackArgs)
+            else:
+                callback(*callbackArgs)
+
+        job.onProgress = lambda job: inLoop(self.publish, step, job, True)
+        if self.mode == "process" and picklable:
+            # progress and cancellation checkpoints are not reported from other processes
+            job.future = self.pool(True).submit(func, *args, **kwargs)
+        else:
+            job.future = self.pool(False).submit(runJob, job, func, args, kwargs)
+
+        def done(future):
+            if future.cancelled():
+                return
+            error = future.exception()
+            inLoop(self.finish, step, job, apply, None if error is not None else future.result(), error)
+
+        job.future.add_done_callback(done)
+        return job
+
+    def finish(self, step, job: Job, apply, result=None, error: Exception = None):
+        if self.jobs.get(step.stepId) is not job:
+            # superseded or cancelled, the result is stale
+            return
+        del self.jobs[step.stepId]
+        if isinstance(error, Cancelled):
+            self.publish(step, job, running=False, cancelled=True)
+            return
+        if error is not None:
+            self.publish(step, job, running=False, error="{}: {}".format(type(error).__name__, error))
+            return
+        with step.transaction():
+            for key, value in job.staged.items():
+                step.changeConfig(key, value)
+            self.publish(step, job, running=False)
+            if apply is not None:
+                apply(result)
+
+    def publish(self, step, job: Job, running: bool, cancelled: bool = False, error: str = None):
+        progress = {"running": running, "runId": job.runId, "label": job.label,
+                    "fraction": job.fraction if running else None}
+        if cancelled:
+            progress["cancelled"] = True
+        if error is not None:
+            progress["error"] = error
+        step.progress = progress
+
+    def shutdown(self):
+        for pool in [self._threads, self._processes]:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = None
+        self._processes = None
@@ -1,10 +1,9 @@
-from stargazer.stargazer import Stargazer
-import altair as alt
 import textwrap
 from .model import Results
 
 
 def exportTable(fittedModels: list, format="html"):
+    from stargazer.stargazer import Stargazer
     stargazer = Stargazer(fittedModels)
     if format == "html":
         table = stargazer.render_html()
@@ -13,8 +12,25 @@ def exportTable(fittedModels: list, format="html"):
     return table
 
 
+def vizStatsFrame(vizStats):
+    """
+    DataFrame of a viz payload, either a list of records or columnar (see columnarVizStats)
+    """
+    import pandas as pd
+    if isinstance(vizStats, dict) and "columns" in vizStats:
+        data = {}
+        for name, column in vizStats["columns"].items():
+            if isinstance(column, dict):
+                data[name] = pd.Categorical.from_codes(column["codes"].astype(int), column["categories"])
+            else:
+                data[name] = column
+        return pd.DataFrame(data)
+    return pd.DataFrame(vizStats)
+
+
 def exportBoxplot(vizStats):
     import pandas as pd
+    import altair as alt
     
     data = pd.DataFrame([vizStats])
     data = data.explode('outliers')
@@ -43,16 +59,26 @@ def exportBoxplot(vizStats):
 
 
 def exportScatterplot(vizStats):
-    data = vizStats
+    import altair as alt
+    data = vizStatsFrame(vizStats)
+    encoding = {"size": "count:Q"} if "count" in data.columns else {}
     chart = alt.Chart(data).mark_point().encode(
         x=alt.X('x', axis=alt.Axis(labels=False)),
-        y='y'
+        y='y',
+        **encoding
     )
     return chart
 
 
 def exportDensityPlot(vizStats):
-    data = vizStats
+    import altair as alt
+    data = vizStatsFrame(vizStats)
+    if "density" in data.columns:
+        # density already estimated on a grid
+        return alt.Chart(data).mark_area(opacity=0.3).encode(
+            alt.X('value:Q'),
+            alt.Y('density:Q')
+        )
     chart = alt.Chart(data).transform_density(
         'value',
         groupby=['group'],
@@ -69,7 +95,15 @@ def exportDensityPlot(vizStats):
 
 
 def exportTTestPlot(vizStats):
-    data = vizStats
+    import altair as alt
+    data = vizStatsFrame(vizStats)
+    if "median" in data.columns:
+        # box statistics already computed per group
+        base = alt.Chart(data).encode(y=alt.Y('group:N', title=None))
+        rule = base.mark_rule().encode(x='lower:Q', x2='upper:Q')
+        bar = base.mark_bar(size=14).encode(x='q1:Q', x2='q3:Q', color=alt.Color('group:N', legend=None))
+        median_tick = base.mark_tick(color='white', size=14).encode(x='median:Q')
+        return alt.layer(rule, bar, median_tick)
     chart = alt.Chart(data).mark_boxplot().encode(
         x=alt.X('group:N'),
         y='value'
@@ -77,7 +111,8 @@ def exportTTestPlot(vizStats):
     return chart
 
 def exportHeatMapPlot(vizStats):
-    data = vizStats
+    import altair as alt
+    data = vizStatsFrame(vizStats)
     chart = alt.Chart(data).mark_rect().encode(
         x=alt.X('variable1:N'),
         y='variable2',
@@ -0,0 +1,91 @@
+"""
+This file contains the dependency graph of the steps of a workflow. It is built
+from the inputNames/previousSteps and outputNames of the steps when they are
+constructed, and refined with the keys the steps actually store
+"""
+import bisect
+
+
+def stepInputs(step):
+    """
+    Return (succeeds, keys): whether step reads every output of the previous step,
+    and the keys it looks up in the outputs of the steps before it
+    """
+    succeeds = bool(step.succeedPreviousStepOutput)
+    keys = [] if succeeds else list(step.previousSteps or [])
+    return succeeds, keys + [key for key in getattr(step, "implicitInputs", []) if key not in keys]
+
+
+class StepGraph(object):
+    """
+    A step reads a key from the closest preceding step that outputs it, the step
+    order of the workflow is a topological order of the graph
+    """
+
+    def __init__(self, steps: list):
+        self.stepIds = []
+        self.positions = {}
+        self.inputs = {}
+        # key -> sorted positions of the steps declaring it in outputNames / having stored it
+        self.declared = {}
+        self.stored = {}
+        for step in steps:
+            self.addStep(step)
+
+    def addStep(self, step):
+        position = len(self.stepIds)
+        self.stepIds.append(step.stepId)
+        self.positions[step.stepId] = position
+        self.inputs[step.stepId] = stepInputs(step)
+        for key in step.outputNames or []:
+            self._insert(self.declared, key, position)
+
+    @staticmethod
+    def _insert(producers: dict, key, position: int):
+        positions = producers.setdefault(key, [])
+        i = bisect.bisect_left(positions, position)
+        if i == len(positions) or positions[i] != position:
+            positions.insert(i, position)
+
+    def record(self, stepId, keys):
+        """
+        Record the keys stored in the outputs of stepId
+        """
+        for key in keys:
+            self._insert(self.stored, key, self.positions[stepId])
+
+    def producer(self, stepId, key, declared: bool = False):
+        """
+        The step whose output key is read by stepId, None if no step before it outputs key
+        """
+        positions = (self.declared if declared else self.stored).get(key, [])
+        i = bisect.bisect_left(positions, self.positions[stepId])
+        return self.stepIds[positions[i - 1]] if i > 0 else None
+
+    def latest(self, key):
+        positions = self.stored.get(key, [])
+        return self.stepIds[positions[-1]] if len(positions) > 0 else None
+
+    def dependencies(self, stepId, declared: bool = False):
+        """
+        {key: producing stepId} of the keys stepId looks up
+        """
+        _, keys = self.inputs[stepId]
+        return {key: self.producer(stepId, key, declared) for key in keys}
+
+    def consumers(self, stepId, keys):
+        """
+        The steps after stepId that read one of its output keys, in topological order
+        """
+        keys = set(keys)
+        if len(keys) == 0:
+            return []
+        position = self.positions[stepId]
+        consumers = []
+        for consumer in self.stepIds[position + 1:]:
+            succeeds, inputs = self.inputs[consumer]
+            if succeeds and self.positions[consumer] == position + 1:
+                consumers.append(consumer)
+            elif any(key in keys and self.producer(consumer, key) == stepId for key in inputs):
+                consumers.append(consumer)
+        return consumers
@@ -0,0 +1,164 @@
+"""
+This file contains the copy-on-write lineage of the dataset across steps
+"""
+import sys
+import numpy as np
+import pandas as pd
+
+
+class DatasetView(object):
+    """
+    Immutable view of a dataset. A view records only what its step changed
+    relative to its parent: the replaced columns and the rows kept. Unchanged
+    columns share their buffers with the parent, so a full copy is only made
+    when a step actually filters rows.
+    """
+
+    def __init__(self, frame: pd.DataFrame, parent=None, stepId: int = None, replacedColumns: list = None, rowMask: np.ndarray = None):
+        self._frame = frame
+        self.parent = parent
+        self.stepId = stepId
+        self.replacedColumns = list(replacedColumns) if replacedColumns is not None else []
+        self.rowMask = rowMask
+
+    @property
+    def frame(self):
+        return self._frame
+
+    @property
+    def columns(self):
+        return self._frame.columns
+
+    def replaceColumns(self, columns: dict, stepId: int = None):
+        """
+        Return a child view in which the given columns are replaced, other columns are shared
+        """
+        frame = replaceColumns(self._frame, columns)
+        return DatasetView(frame, parent=self, stepId=stepId, replacedColumns=list(columns.keys()))
+
+    def filterRows(self, mask, stepId: int = None):
+        """
+        Return a child view keeping the rows where mask is True
+        """
+        mask = np.asarray(mask, dtype=bool)
+        return DatasetView(self._frame[mask], parent=self, stepId=stepId, rowMask=mask)
+
+    def derive(self, frame: pd.DataFrame, stepId: int = None):
+        """
+        Record a DataFrame produced from this view by an arbitrary transformation as a child view
+        """
+        if frame is self._frame:
+            return DatasetView(frame, parent=self, stepId=stepId)
+        if not frame.index.equals(self._frame.index):
+            rowMask = self._frame.index.isin(frame.index)
+            return DatasetView(frame, parent=self, stepId=stepId, rowMask=rowMask)
+        parentColumns = set(self._frame.columns)
+        replacedColumns = [col for col in frame.columns if col not in parentColumns or not
+                           np.may_share_memory(frame[col].to_numpy(), self._frame[col].to_numpy())]
+        return DatasetView(frame, parent=self, stepId=stepId, replacedColumns=replacedColumns)
+
+    def lineage(self):
+        """
+        Return the records of every view from the root to this one
+        """
+        records = []
+        view = self
+        while view is not None:
+            records.append({
+                "stepId": view.stepId,
+                "replacedColumns": view.replacedColumns,
+                "rowsKept": int(view.rowMask.sum()) if view.rowMask is not None else len(view.frame),
+                "ownedBytes": view.ownedBytes(),
+            })
+            view = view.parent
+        return records[::-1]
+
+    def ownedBytes(self):
+        """
+        Bytes held by this view that are not shared with its parent
+        """
+        shared = MemoryIndex()
+        if self.parent is not None:
+            shared.add(self.parent.frame)
+        return ownedBytes(self._frame, shared)
+
+
+def replaceColumns(frame: pd.DataFrame, columns: dict):
+    """
+    Return a DataFrame with the given columns replaced, the other columns share their buffers with frame
+    """
+    data = {col: columns[col] if col in columns else frame[col]
+            for col in frame.columns}
+    for col in columns:
+        if col not in data:
+            data[col] = columns[col]
+    # copy=False keeps one block per column instead of consolidating (and copying) them
+    return pd.DataFrame(data, index=frame.index, copy=False)
+
+
+class MemoryIndex(object):
+    """
+    Byte ranges of the numpy buffers that have been seen so far
+    """
+
+    def __init__(self):
+        self._ranges = []
+        self._starts = None
+        self._maxEnds = None
+
+    def add(self, value):
+        for array in iterArrays(value):
+            self._ranges.append(np.byte_bounds(array))
+        self._starts = None
+
+    def overlaps(self, array: np.ndarray):
+        if len(self._ranges) == 0:
+            return False
+        if self._starts is None:
+            ranges = np.array(sorted(self._ranges))
+            self._starts = ranges[:, 0]
+            self._maxEnds = np.maximum.accumulate(ranges[:, 1])
+        start, end = np.byte_bounds(array)
+        # any range starting before end and ending after start
+        idx = np.searchsorted(self._starts, end, side="left")
+        return idx > 0 and self._maxEnds[idx - 1] > start
+
+
+def iterArrays(value):
+    """
+    Yield the numpy buffers held by value
+    """
+    if isinstance(value, DatasetView):
+        value = value.frame
+    if isinstance(value, pd.DataFrame):
+        for col in range(value.shape[1]):
+            array = value.iloc[:, col].to_numpy()
+            if isinstance(array, np.ndarray) and array.size > 0:
+                yield array
+    elif isinstance(value, (pd.Series, pd.Index)):
+        array = value.to_numpy()
+        if isinstance(array, np.ndarray) and array.size > 0:
+            yield array
+    elif isinstance(value, np.ndarray):
+        if value.size > 0:
+            yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from iterArrays(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            if isinstance(item, (pd.DataFrame, pd.Series, np.ndarray, dict, list, tuple, DatasetView)):
+                yield from iterArrays(item)
+
+
+def ownedBytes(value, shared: MemoryIndex = None):
+    """
+    Bytes of the numpy buffers held by value that do not overlap the shared buffers
+    """
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return sys.getsizeof(value)
+    total = 0
+    for array in iterArrays(value):
+        if shared is None or not shared.overlaps(array):
+            total += array.nbytes
+    return total
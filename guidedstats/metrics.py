@@ -4,7 +4,9 @@ This file contains selectable metrics for ranking
 from typing import Callable
 import pandas as pd
 
-from .utils import QUANTITATIVE_DTYPES
+from .utils import QUANTITATIVE_DTYPES, iqrBounds, outlierMask
+from .cache import RESULT_CACHE, resultKey
+from .sketch import columnQuantiles
 
 """
 A Metric should allow user to define their own metrics,
@@ -41,6 +43,69 @@ def pearson(X, Y, *args, **kwargs):
     }
 
 
+def spearman(X, Y, *args, **kwargs):
+    import scipy.stats as spstats
+    import numpy as np
+    stats, pvalue = spstats.spearmanr(X, np.array(Y).reshape((-1)))
+    return {
+        "stats": stats,
+        "pvalue": pvalue,
+    }
+
+
+"""
+A metric can also declare a vectorized (batch) form, which scores every
+candidate column against the reference column in a single call
+
+format of a batch metric function:
+def batchMetric(X: np.ndarray, Y: Iterable, *args, **kwargs):
+    # X is a 2-D array of shape (n_samples, n_columns)
+    # Y is the reference column
+    # return a dictionary of arrays with one entry per column of X
+    return {
+        "stats": stats,
+        "pvalue": pvalue,
+    }
+"""
+
+def batchPearson(X, Y, *args, **kwargs):
+    import scipy.stats as spstats
+    import numpy as np
+    X = np.asarray(X, dtype=float)
+    Y = np.asarray(Y, dtype=float).reshape((-1))
+    n = X.shape[0]
+    # center once, then correlate all columns with a single matrix-vector product
+    Xc = X - X.mean(axis=0)
+    Yc = Y - Y.mean()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats = (Yc @ Xc) / np.sqrt(np.einsum("ij,ij->j", Xc, Xc) * (Yc @ Yc))
+    stats = np.clip(stats, -1.0, 1.0)
+    del Xc
+    # same null distribution as scipy.stats.pearsonr
+    ab = n / 2 - 1
+    pvalue = 2 * spstats.beta(ab, ab, loc=-1, scale=2).sf(np.abs(stats))
+    return {
+        "stats": stats,
+        "pvalue": pvalue,
+    }
+
+
+def batchSpearman(X, Y, *args, **kwargs):
+    import scipy.stats as spstats
+    import numpy as np
+    n = np.asarray(X).shape[0]
+    stats = batchPearson(spstats.rankdata(X, axis=0),
+                         spstats.rankdata(np.asarray(Y).reshape((-1))))["stats"]
+    # same t approximation as scipy.stats.spearmanr
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = stats * np.sqrt((n - 2) / ((stats + 1.0) * (1.0 - stats)))
+    pvalue = 2 * spstats.t.sf(np.abs(t), n - 2)
+    return {
+        "stats": stats,
+        "pvalue": pvalue,
+    }
+
+
 def skewness(X, Y = None, *args, **kwargs):
     import scipy.stats as spstats
     stats, pvalue = spstats.skew(X)
@@ -60,32 +125,36 @@ def kurtosis(X, Y = None, *args, **kwargs):
 
 def outlier(X, Y = None, *args, **kwargs):
     import numpy as np
-    X = X.to_numpy().reshape((-1))
     previousX = kwargs.get("previousX", None)
-    if previousX is not None:
-        previousX = previousX.to_numpy().reshape((-1))
-        Q1 = np.percentile(previousX, 25)
-        Q3 = np.percentile(previousX, 75)
-        IQR = Q3 - Q1
-    else:
-        Q1 = np.percentile(X, 25)
-        Q3 = np.percentile(X, 75)
-        IQR = Q3 - Q1
+    profile = kwargs.get("profile", None)
+    # reuse the quantiles of the dataset profile if X is an unmodified column
+    quantiles = None
+    if profile is not None:
+        quantiles = profile.getQuantiles(previousX if previousX is not None else X)
+    X = X.to_numpy(dtype=float).reshape((-1))
+    if quantiles is None:
+        reference = previousX.to_numpy(dtype=float).reshape((-1)) if previousX is not None else X
+        quantileError = kwargs.get("quantileError", None)
+        if quantileError is None:
+            quantiles = tuple(np.percentile(reference, [25, 50, 75]))
+        else:
+            # approximate quantiles from a sketch
+            quantiles = tuple(columnQuantiles(reference, [0.25, 0.5, 0.75], quantileError))
+    Q1, _, Q3 = quantiles
 
     # Define the outlier thresholds
-    lower_threshold = Q1 - 1.5 * IQR
-    upper_threshold = Q3 + 1.5 * IQR
+    lower_threshold, upper_threshold = iqrBounds(Q1, Q3)
 
-    count = 0
-    for item in X:
-        if item < lower_threshold or item > upper_threshold:
-            count += 1
+    count = int(np.count_nonzero(outlierMask(X, lower_threshold, upper_threshold)))
     return {
         "stats": count,
         "count": count,
         "extraStats":{
             "lower_threshold": lower_threshold,
             "upper_threshold": upper_threshold,
+        },
+        "vizKwargs": {
+            "quantiles": quantiles,
         }
     }
 
@@ -115,20 +184,163 @@ def levene(Y1, Y2, *args, **kwargs):
     }
 
 
-def sharpiro(X, Y = None, *args, **kwargs):
+"""
+Normality tests of every column of a 2-D array. The moment tests (D'Agostino K^2,
+Jarque-Bera) only need the count, skewness and kurtosis of a column, which are
+computed in one pass or taken from the dataset profile. Shapiro-Wilk is exact up
+to 5000 rows and run on a seeded subsample above, where scipy's p-value is not accurate
+"""
+
+def normalityMoments(values):
+    """
+    Count, skewness and excess kurtosis (biased, as scipy.stats) of every column, nan are ignored
+    """
+    import numpy as np
+    with np.errstate(divide="ignore", invalid="ignore"):
+        n = np.sum(~np.isnan(values), axis=0)
+        centered = values - np.nanmean(values, axis=0)
+        squared = centered * centered
+        m2 = np.nansum(squared, axis=0) / n
+        m3 = np.nansum(squared * centered, axis=0) / n
+        m4 = np.nansum(squared * squared, axis=0) / n
+        return n, m3 / m2 ** 1.5, m4 / m2 ** 2 - 3.0
+
+
+def dagostinoK2(n, skew, kurtosis):
+    """
+    D'Agostino-Pearson K^2 from moments, same statistic as scipy.stats.normaltest
+    """
+    import numpy as np
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # skewness test
+        y = skew * np.sqrt(((n + 1) * (n + 3)) / (6.0 * (n - 2)))
+        beta2 = (3.0 * (n * n + 27 * n - 70) * (n + 1) * (n + 3)) / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9))
+        W2 = -1 + np.sqrt(2 * (beta2 - 1))
+        delta = 1 / np.sqrt(0.5 * np.log(W2))
+        alpha = np.sqrt(2.0 / (W2 - 1))
+        y = np.where(y == 0, 1, y)
+        zSkew = delta * np.log(y / alpha + np.sqrt((y / alpha) ** 2 + 1))
+        # kurtosis test
+        E = 3.0 * (n - 1) / (n + 1)
+        varb2 = 24.0 * n * (n - 2) * (n - 3) / ((n + 1) * (n + 1.0) * (n + 3) * (n + 5))
+        x = (kurtosis + 3.0 - E) / np.sqrt(varb2)
+        sqrtbeta1 = 6.0 * (n * n - 5 * n + 2) / ((n + 7) * (n + 9)) * \
+            np.sqrt((6.0 * (n + 3) * (n + 5)) / (n * (n - 2) * (n - 3)))
+        A = 6.0 + 8.0 / sqrtbeta1 * (2.0 / sqrtbeta1 + np.sqrt(1 + 4.0 / (sqrtbeta1 ** 2)))
+        term1 = 1 - 2 / (9.0 * A)
+        denom = 1 + x * np.sqrt(2 / (A - 4.0))
+        term2 = np.sign(denom) * np.where(denom == 0.0, np.nan, ((1 - 2.0 / A) / np.abs(denom)) ** (1 / 3.0))
+        zKurtosis = (term1 - term2) / np.sqrt(2 / (9.0 * A))
+    stats = zSkew ** 2 + zKurtosis ** 2
+    # survival function of a chi-squared distribution with 2 degrees of freedom
+    return stats, np.exp(-stats / 2)
+
+
+def jarqueBera(n, skew, kurtosis):
+    """
+    Jarque-Bera statistic from moments, same as scipy.stats.jarque_bera
+    """
+    import numpy as np
+    stats = np.asarray(n, dtype=float) / 6.0 * (skew ** 2 + kurtosis ** 2 / 4.0)
+    return stats, np.exp(-stats / 2)
+
+
+def andersonDarling(values):
+    """
+    Anderson-Darling statistic of every column against a normal distribution with
+    estimated mean and variance, p-values of Stephens' approximation
+    """
+    import numpy as np
     import scipy.stats as spstats
-    stats, p = spstats.shapiro(X)
-    stats, p = round(stats, 6), round(p, 6)
-    count = X.shape[0]
-    if p < 0.05:
-        phrase = "does reject"
+    stats = np.full(values.shape[1], np.nan)
+    p = np.full(values.shape[1], np.nan)
+    for j in range(values.shape[1]):
+        x = np.sort(values[:, j][~np.isnan(values[:, j])])
+        n = len(x)
+        if n < 8:
+            continue
+        z = (x - x.mean()) / x.std(ddof=1)
+        i = np.arange(1, n + 1)
+        stats[j] = -n - np.sum((2 * i - 1) / n * (spstats.norm.logcdf(z) + spstats.norm.logsf(z[::-1])))
+        a = stats[j] * (1 + 0.75 / n + 2.25 / n ** 2)
+        if a > 10:
+            # the p-value is below 1e-23 here, and the quadratic in the exponent below rises again past a = 153
+            p[j] = 0.0
+        elif a >= 0.6:
+            p[j] = np.exp(1.2937 - 5.709 * a + 0.0186 * a ** 2)
+        elif a >= 0.34:
+            p[j] = np.exp(0.9177 - 4.279 * a - 1.38 * a ** 2)
+        elif a >= 0.2:
+            p[j] = 1 - np.exp(-8.318 + 42.796 * a - 59.938 * a ** 2)
+        else:
+            p[j] = 1 - np.exp(-13.436 + 101.14 * a - 223.73 * a ** 2)
+    return stats, np.clip(p, 0, 1)
+
+
+def shapiroWilk(values, maxSamples: int = None, seed: int = 0):
+    """
+    Shapiro-Wilk test of every column, on a seeded subsample of maxSamples rows if the column is longer
+    """
+    import numpy as np
+    import scipy.stats as spstats
+    stats = np.full(values.shape[1], np.nan)
+    p = np.full(values.shape[1], np.nan)
+    for j in range(values.shape[1]):
+        x = values[:, j][~np.isnan(values[:, j])]
+        if maxSamples is not None and len(x) > maxSamples:
+            x = x[np.sort(np.random.default_rng(seed).choice(len(x), maxSamples, replace=False))]
+        if len(x) >= 3:
+            stats[j], p[j] = spstats.shapiro(x)
+    return stats, p
+
+
+def normalityTest(values, method: str = "auto", moments: tuple = None, maxShapiro: int = 5000, seed: int = 0):
+    """
+    Test the normality of every column of values with method: "shapiro", "shapiro_subsample",
+    "dagostino", "jarque_bera" or "anderson". "auto" runs Shapiro-Wilk up to maxShapiro rows
+    and D'Agostino K^2 above. moments are the (count, skew, kurtosis) of the columns if known
+    """
+    import numpy as np
+    names = {"shapiro": "Shapiro-Wilk Test", "shapiro_subsample": "Shapiro-Wilk Test on a subsample",
+             "dagostino": "D'Agostino K² Test", "jarque_bera": "Jarque-Bera Test", "anderson": "Anderson-Darling Test"}
+    if method == "auto":
+        method = "shapiro" if values.shape[0] <= maxShapiro else "dagostino"
+    if method in ["dagostino", "jarque_bera"]:
+        if moments is None:
+            moments = normalityMoments(values)
+        count = np.asarray(moments[0])
+        stats, p = (dagostinoK2 if method == "dagostino" else jarqueBera)(*moments)
+    elif method == "anderson":
+        count = np.sum(~np.isnan(values), axis=0)
+        stats, p = andersonDarling(values)
+    elif method in ["shapiro", "shapiro_subsample"]:
+        count = np.sum(~np.isnan(values), axis=0)
+        stats, p = shapiroWilk(values, maxShapiro if method == "shapiro_subsample" else None, seed)
+        if method == "shapiro_subsample":
+            count = np.minimum(count, maxShapiro)
     else:
-        phrase = "does not reject"
+        raise ValueError("Unknown normality test {}".format(method))
+    stats, p = np.round(np.asarray(stats, dtype=float), 6), np.round(np.asarray(p, dtype=float), 6)
     return {
         "stats": stats,
         "count": count,
         "pvalue": p,
-        "rejectIndicator": phrase,
+        "rejectIndicator": np.where(p < 0.05, "does reject", "does not reject"),
+        "method": np.repeat(names[method], len(stats)),
+    }
+
+
+def sharpiro(X, Y = None, *args, **kwargs):
+    import numpy as np
+    values = np.asarray(X, dtype=float).reshape((X.shape[0], -1))[:, :1]
+    outputs = normalityTest(values, kwargs.get("normalityTest", "auto"))
+    return {
+        "stats": float(outputs["stats"][0]),
+        "count": int(outputs["count"][0]),
+        "pvalue": float(outputs["pvalue"][0]),
+        "rejectIndicator": str(outputs["rejectIndicator"][0]),
+        "method": str(outputs["method"][0]),
     }
 
 
@@ -160,20 +372,44 @@ def adjusted_r2(y_true, y_pred, *args, **kwargs):
     }
 
 
+def vifFromCorrelation(corr: pd.DataFrame):
+    import numpy as np
+    # VIF_j is the j-th diagonal entry of the inverted correlation matrix
+    R = corr.to_numpy(dtype=float)
+    # a constant predictor has no correlations, it is collinear with the intercept: its VIF is infinite
+    varying = np.isfinite(np.diag(R))
+    vifs = np.full(len(R), np.inf)
+    R = R[np.ix_(varying, varying)]
+    if len(R) == 0:
+        pass
+    elif np.linalg.cond(R) < 1 / np.finfo(float).eps:
+        vifs[varying] = np.diag(np.linalg.inv(R))
+    else:
+        # singular, e.g. perfectly collinear predictors: the predictors in an exact linear relation
+        # (those the null space of R reaches) have an R^2 of 1 and an infinite VIF, the VIF of the
+        # others is still the diagonal entry of the pseudo-inverse
+        inverse = np.linalg.pinv(R, hermitian=True)
+        nullity = np.diag(np.eye(len(R)) - inverse @ R)
+        vifs[varying] = np.where(nullity > 1e-8, np.inf, np.diag(inverse))
+    return pd.Series(vifs, index=corr.index)
+
+
 def VIF(exog: pd.DataFrame, design_matrix: pd.DataFrame, *args, **kwargs):
-    from statsmodels.stats.outliers_influence import variance_inflation_factor
     QUANTITATIVE_DTYPES = ['float64', 'int64']
-    # find the index of exog in design_matrix
-    other_exogs = []
-    for i in range(design_matrix.shape[1]):
-        if design_matrix.columns[i] != exog.columns[0] and design_matrix.iloc[:, i].dtype in QUANTITATIVE_DTYPES:
-            other_exogs.append(design_matrix.iloc[:, i])
-    # concatenate other exogs with exog
+    col = exog.columns[0]
+    # find the other quantitative exogs in design_matrix
+    other_exogs = [other for other in design_matrix.columns
+                   if other != col and design_matrix[other].dtype in QUANTITATIVE_DTYPES]
     if len(other_exogs) != 0:
-        design_matrix = pd.concat(other_exogs, axis=1)
-        design_matrix = pd.concat([exog, design_matrix], axis=1)
-        vif = variance_inflation_factor(design_matrix.values, 0)
-        vif = round(vif, 6)
+        # all VIFs come from one correlation matrix, computed once per check and shared by every column
+        vifs = kwargs.get("vifs", None)
+        if vifs is None or col not in vifs.index:
+            columns = [col] + other_exogs
+            corr = kwargs.get("corr", None)
+            if corr is None or any(c not in corr.index for c in columns):
+                corr = pd.concat([exog, design_matrix[other_exogs]], axis=1).corr()
+            vifs = vifFromCorrelation(corr.loc[columns, columns])
+        vif = round(float(vifs[col]), 6)
         return {
             "stats": vif,
             "annotation": ""
@@ -187,8 +423,164 @@ def VIF(exog: pd.DataFrame, design_matrix: pd.DataFrame, *args, **kwargs):
     }
 
 
+"""
+Column-wise forms of the assumption metrics check every column of a 2-D
+input in one call, they return the same keys as the metric with one array
+entry per column. "vizKwargs" holds per-column arrays that are handed to
+the viz builder, so the viz reuses what the metric has computed.
+"""
+
+def batchOutlier(X, Y = None, *args, **kwargs):
+    import numpy as np
+    values = X.to_numpy(dtype=float)
+    previousX = kwargs.get("previousX", None)
+    reference = previousX if previousX is not None else X
+    profile = kwargs.get("profile", None)
+    quantiles = np.empty((values.shape[1], 3))
+    missing = []
+    for j, col in enumerate(X.columns):
+        columnQuantiles = profile.getQuantiles(reference[col]) if profile is not None else None
+        if columnQuantiles is not None:
+            quantiles[j] = columnQuantiles
+        else:
+            missing.append(j)
+    quantileError = kwargs.get("quantileError", None)
+    if len(missing) > 0:
+        referenceValues = values if previousX is None else previousX.to_numpy(dtype=float)
+        if quantileError is None:
+            quantiles[missing] = np.percentile(
+                referenceValues[:, missing], [25, 50, 75], axis=0).T
+        else:
+            for j in missing:
+                quantiles[j] = columnQuantiles(referenceValues[:, j], [0.25, 0.5, 0.75], quantileError)
+
+    lower_threshold, upper_threshold = iqrBounds(quantiles[:, 0], quantiles[:, 2])
+    count = np.count_nonzero(outlierMask(values, lower_threshold, upper_threshold), axis=0)
+    return {
+        "stats": count,
+        "count": count,
+        "extraStats": {
+            "lower_threshold": lower_threshold,
+            "upper_threshold": upper_threshold,
+        },
+        "vizKwargs": {
+            "quantiles": quantiles,
+        }
+    }
+
+
+def batchLevene(Y1, Y2, *args, **kwargs):
+    import numpy as np
+    import scipy.stats as spstats
+    Y1 = np.asarray(Y1, dtype=float).reshape((len(Y1), -1))
+    Y2 = np.asarray(Y2, dtype=float).reshape((len(Y2), -1))
+    # Levene test centered at the median (Brown-Forsythe), as scipy.stats.levene
+    Z1 = np.abs(Y1 - np.median(Y1, axis=0))
+    Z2 = np.abs(Y2 - np.median(Y2, axis=0))
+    N1, N2 = Y1.shape[0], Y2.shape[0]
+    N, k = N1 + N2, 2
+    Z1bar, Z2bar = Z1.mean(axis=0), Z2.mean(axis=0)
+    Zbar = (Z1.sum(axis=0) + Z2.sum(axis=0)) / N
+    numerator = (N - k) * (N1 * (Z1bar - Zbar) ** 2 + N2 * (Z2bar - Zbar) ** 2)
+    denominator = (k - 1) * (((Z1 - Z1bar) ** 2).sum(axis=0) + ((Z2 - Z2bar) ** 2).sum(axis=0))
+    stats = numerator / denominator
+    p = spstats.f.sf(stats, k - 1, N - k)
+    stats, p = np.round(stats, 6), np.round(p, 6)
+    return {
+        "stats": stats,
+        "pvalue": p,
+        "rejectIndicator": np.where(p < 0.05, "does reject", "does not reject"),
+        "extraStats": {
+            "equal_var": np.where(p < 0.05, "false", "true"),
+            "N1": N1,
+            "N2": N2,
+        }
+    }
+
+
+def batchSharpiro(X, Y = None, *args, **kwargs):
+    import numpy as np
+    values = np.asarray(X, dtype=float).reshape((X.shape[0], -1))
+    # the moments of unmodified columns are read from the dataset profile
+    moments = None
+    profile = kwargs.get("profile", None)
+    if profile is not None and isinstance(X, pd.DataFrame):
+        columnMoments = [profile.getMoments(X[[col]]) for col in X.columns]
+        if all(m is not None for m in columnMoments):
+            moments = tuple(np.array(m) for m in zip(*columnMoments))
+    return normalityTest(values, kwargs.get("normalityTest", "auto"), moments)
+
+
+def batchVIF(exog: pd.DataFrame, design_matrix: pd.DataFrame, *args, **kwargs):
+    import numpy as np
+    vifs = kwargs.get("vifs", None)
+    columns = list(exog.columns)
+    if vifs is None:
+        outputs = [VIF(exog[[col]], design_matrix, **kwargs) for col in columns]
+        return {
+            "stats": np.array([output["stats"] for output in outputs], dtype=object),
+            "annotation": np.array([output["annotation"] for output in outputs], dtype=object),
+        }
+    return {
+        "stats": np.array([round(float(vifs[col]), 6) for col in columns], dtype=object),
+        "annotation": np.array(["" for col in columns], dtype=object),
+    }
+
+
+class ResidualAccumulator(object):
+    """
+    Moments of y_true and of the residuals, updated chunk by chunk, from which
+    the evaluation metrics are computed without keeping the predictions
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sse = 0.0
+
+    def update(self, y_true, y_pred):
+        import numpy as np
+        # float32 inputs stay float32, the sums are accumulated in float64
+        y_true = np.asarray(y_true).reshape(-1)
+        y_pred = np.asarray(y_pred).reshape(-1)
+        n = len(y_true)
+        if n == 0:
+            return self
+        mean = np.mean(y_true, dtype=np.float64)
+        m2 = np.sum(np.square(y_true - mean), dtype=np.float64)
+        total = self.n + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta ** 2 * self.n * n / total
+        self.mean += delta * n / total
+        self.n = total
+        self.sse += np.sum(np.square(y_true - y_pred), dtype=np.float64)
+        return self
+
+
+def streamingMSE(moments: ResidualAccumulator, *args, **kwargs):
+    return {
+        "stats": moments.sse / moments.n,
+    }
+
+
+def streamingR2(moments: ResidualAccumulator, *args, **kwargs):
+    return {
+        "stats": 1 - moments.sse / moments.m2,
+    }
+
+
+def streamingAdjustedR2(moments: ResidualAccumulator, numExog: int, *args, **kwargs):
+    n = moments.n
+    r2 = 1 - moments.sse / moments.m2
+    return {
+        "stats": 1 - (1-r2)*(n-1)/(n-numExog-1),
+    }
+
+
 METRICS = {
     "pearson": pearson,
+    "spearman": spearman,
     "skewness": skewness,
     "kurtosis": kurtosis,
     "outlier": outlier,
@@ -201,40 +593,89 @@ METRICS = {
 }
 # TBC, currently we only support metrics for quantitative variables
 
+BATCH_METRICS = {
+    "pearson": batchPearson,
+    "spearman": batchSpearman,
+}
+
+BATCH_ASSUMPTION_METRICS = {
+    "outlier": batchOutlier,
+    "levene": batchLevene,
+    "sharpiro": batchSharpiro,
+    "VIF": batchVIF,
+}
+
+STREAMING_METRICS = {
+    "mse": streamingMSE,
+    "r2": streamingR2,
+    "adjusted_r2": streamingAdjustedR2,
+}
+
 
 class MetricWrapper(object):
     def __init__(self):
         self._metric = None
         self._metricName = None
+        self._batchMetric = None
         self.selfDefinedMetrics = {}
+        self.selfDefinedBatchMetrics = {}
+        # set to None to disable caching
+        self.cache = RESULT_CACHE
 
-    def addMetric(self, metricName: str, metric: Callable):
+    def addMetric(self, metricName: str, metric: Callable, batchMetric: Callable = None):
         """
         Args:
             metricName (str): the name of the metric
             metric (Callable): a function taking at least one columns and return the metric score and p-value(optional), the higher the better
+            batchMetric (Callable, optional): the vectorized form of metric, taking a 2-D array of columns and returning arrays of scores
         """
         # TBC the higher the better or the lower the better should let users choose
-        if isinstance(metric, Callable):
+        if not isinstance(metric, Callable):
             raise TypeError("metric is not a function")
         if metric.__code__.co_argcount < 1:
             raise TypeError("metric should take at least one column")
+        if batchMetric is not None and not isinstance(batchMetric, Callable):
+            raise TypeError("batchMetric is not a function")
         # TBC, should check the output type
         self.selfDefinedMetrics[metricName] = metric
+        if batchMetric is not None:
+            self.selfDefinedBatchMetrics[metricName] = batchMetric
 
     def setMetric(self, metricName: str):
         temp = {**METRICS, **self.selfDefinedMetrics}
         if metricName in temp.keys():
             self._metric = temp[metricName]
             self._metricName = metricName
+            self._batchMetric = {**BATCH_METRICS, **self.selfDefinedBatchMetrics}.get(metricName, None)
         else:
             raise KeyError("The metric does not exist")
 
+    def hasBatchMetric(self):
+        return self._batchMetric is not None
+
+    def hasStreamingMetric(self):
+        return self._metricName in STREAMING_METRICS and self._metricName not in self.selfDefinedMetrics
+
+    def computeStreaming(self, moments: ResidualAccumulator, numExog: int):
+        return STREAMING_METRICS[self._metricName](moments, numExog)
+
+    def cacheKey(self, kind: str, *values):
+        # self-defined metrics may not be deterministic
+        if self.cache is None or self._metricName in self.selfDefinedMetrics:
+            return None
+        return resultKey(kind, self._metricName, *values)
+
+    def computeBatch(self, X, Y, *referenceXs):
+        key = self.cacheKey("batchMetric", X, Y, *referenceXs)
+        if key is None:
+            return self._batchMetric(X, Y, *referenceXs)
+        return self.cache.getOrCompute(key, self._batchMetric, X, Y, *referenceXs)
+
     def compute(self, X, Y, *referenceXs):
-        
-        outputs = self._metric(X, Y, *referenceXs)
-        
-        return outputs
+        key = self.cacheKey("metric", X, Y, *referenceXs)
+        if key is None:
+            return self._metric(X, Y, *referenceXs)
+        return self.cache.getOrCompute(key, self._metric, X, Y, *referenceXs)
 
 
 if __name__ == "__main__":
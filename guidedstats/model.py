@@ -1,29 +1,206 @@
+import numpy as np
 import pandas as pd
 
+from .executor import checkpoint
+
+# rows of X copied at once when accumulating the Gram matrix
+GRAM_CHUNK_ROWS = 65536
+
+
+class GramAccumulator(object):
+    """
+    Sufficient statistics of a linear regression, accumulated chunk by chunk:
+    the row count, the means of [X, y] and their centered cross products,
+    i.e. X'X, X'y and y'y after centering. Memory is O(p^2) whatever the number of rows
+    """
+
+    def __init__(self, numExog: int):
+        self.n = 0
+        self.mean = np.zeros(numExog + 1)
+        self.comoment = np.zeros((numExog + 1, numExog + 1))
+
+    def update(self, X, y):
+        Z = np.column_stack([np.asarray(X, dtype=float), np.asarray(y, dtype=float).reshape(-1)])
+        n = Z.shape[0]
+        if n == 0:
+            return self
+        mean = Z.mean(axis=0)
+        Z -= mean
+        self.merge(n, mean, Z.T @ Z)
+        return self
+
+    def merge(self, n: int, mean: np.ndarray, comoment: np.ndarray):
+        # pairwise update of the centered cross products (Chan et al.)
+        total = self.n + n
+        delta = mean - self.mean
+        self.comoment += comoment + np.outer(delta, delta) * (self.n * n / total)
+        self.mean += delta * (n / total)
+        self.n = total
+        return self
+
+    def add(self, other):
+        if other.n > 0:
+            self.merge(other.n, other.mean, other.comoment)
+        return self
+
+
+def gramStats(X: pd.DataFrame, Y, chunkRows: int = GRAM_CHUNK_ROWS):
+    """
+    Accumulate the GramAccumulator of X and Y, copying at most chunkRows rows at a time
+    """
+    accumulator = GramAccumulator(X.shape[1])
+    y = np.asarray(Y, dtype=float).reshape(-1)
+    for start in range(0, X.shape[0], chunkRows):
+        checkpoint(start / max(X.shape[0], 1))
+        end = start + chunkRows
+        accumulator.update(X.iloc[start:end].to_numpy(dtype=float), y[start:end])
+    return accumulator
+
+
+class LinearFit(object):
+    """
+    Fitted linear model with an intercept, params are indexed by "const" and the columns of X
+    """
+
+    def __init__(self, params: pd.Series):
+        self.params = params
+
+    def predict(self, X, dtype=np.float64, chunkRows: int = GRAM_CHUNK_ROWS, **kwargs):
+        """
+        Predict into a single buffer of dtype, X is converted chunkRows rows at a time
+        """
+        params = self.params.to_numpy(dtype=float)
+        if X.ndim == 1 or X.shape[1] == len(params) - 1:
+            intercept, slopes = params[0], params[1:]
+        else:
+            # X already holds the constant column
+            intercept, slopes = 0.0, params
+        prediction = np.empty(X.shape[0], dtype=dtype)
+        for start in range(0, X.shape[0], chunkRows):
+            chunk = X.iloc[start:start + chunkRows] if hasattr(X, "iloc") else X[start:start + chunkRows]
+            values = np.asarray(chunk, dtype=float)
+            if values.ndim == 1:
+                values = values.reshape((-1, 1))
+            prediction[start:start + len(values)] = values @ slopes + intercept
+        index = X.index if hasattr(X, "index") else None
+        return pd.Series(prediction, index=index)
+
+
+def olsFromGram(accumulator: GramAccumulator, columns: list):
+    """
+    Solve the least squares problem from its sufficient statistics, and derive the
+    statistics statsmodels would report for OLS(Y, add_constant(X)).fit()
+    """
+    from scipy import stats, linalg
+    n = accumulator.n
+    Sxx = accumulator.comoment[:-1, :-1]
+    Sxy = accumulator.comoment[:-1, -1]
+    Syy = accumulator.comoment[-1, -1]
+    xbar = accumulator.mean[:-1]
+    ybar = accumulator.mean[-1]
+
+    # solve on the correlation scale, the columns may differ by orders of magnitude
+    scale = np.sqrt(np.diag(Sxx))
+    scale[scale == 0] = 1.0
+    corr = Sxx / np.outer(scale, scale)
+    try:
+        factor = linalg.cho_factor(corr)
+        inverse = linalg.cho_solve(factor, np.eye(len(scale))) / np.outer(scale, scale)
+        rank = len(scale)
+    except linalg.LinAlgError:
+        # collinear columns, minimum norm solution as statsmodels' pinv
+        inverse = np.linalg.pinv(Sxx)
+        rank = np.linalg.matrix_rank(corr)
+    slopes = inverse @ Sxy
+    intercept = ybar - xbar @ slopes
+    names = ["const"] + list(columns)
+    params = pd.Series(np.concatenate([[intercept], slopes]), index=names)
+
+    ssr = max(Syy - slopes @ Sxy, 0.0)
+    df_model = float(rank)
+    df_resid = float(n - rank - 1)
+    scale2 = ssr / df_resid
+    # covariance of [intercept, slopes], the inverse of the uncentered X'X times sigma^2
+    cov = np.empty((len(names), len(names)))
+    cov[1:, 1:] = inverse
+    cov[1:, 0] = cov[0, 1:] = -inverse @ xbar
+    cov[0, 0] = 1.0 / n + xbar @ inverse @ xbar
+    cov *= scale2
+
+    bse = pd.Series(np.sqrt(np.diag(cov)), index=names)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tvalues = params / bse
+        pvalues = pd.Series(2 * stats.t.sf(np.abs(tvalues), df_resid), index=names)
+        q = stats.t.ppf(0.975, df_resid)
+        conf_int = pd.DataFrame({0: params - q * bse, 1: params + q * bse})
+        rsquared = 1 - ssr / Syy
+        rsquared_adj = 1 - (n - 1) / df_resid * (1 - rsquared)
+        fvalue = (Syy - ssr) / df_model / scale2
+        f_pvalue = stats.f.sf(fvalue, df_model, df_resid)
+        llf = -n / 2 * (np.log(2 * np.pi) + np.log(ssr / n) + 1)
+    aic = -2 * llf + 2 * (df_model + 1)
+    bic = -2 * llf + np.log(n) * (df_model + 1)
+
+    results = Results()
+    results.setStat("params", params)
+    results.setStat("pvalues", pvalues)
+    results.setStat("df_resid", df_resid)
+    results.setStat("df_model", df_model)
+    results.setStat("rsquared", float(rsquared))
+    results.setStat("rsquared_adj", float(rsquared_adj))
+    results.setStat("fvalue", float(fvalue))
+    results.setStat("f_pvalue", float(f_pvalue))
+    results.setStat("conf_int", conf_int)
+    results.setStat("bse", bse)
+    results.setStat("llf", float(llf))
+    results.setStat("aic", float(aic))
+    results.setStat("bic", float(bic))
+    return (LinearFit(params), results)
+
 
 def naiveLR(X, Y, **kwargs):
-    import statsmodels.api as sm
-    X_wconstant = sm.add_constant(X)
-    model = sm.OLS(Y, X_wconstant).fit()
+    accumulator = gramStats(X, Y)
+    return olsFromGram(accumulator, list(X.columns))
+
+
+def streamLR(X, Y, **kwargs):
+    """
+    naiveLR over ChunkedFrames, the Gram matrix is updated chunk by chunk
+    """
+    from .source import iterAligned
+    accumulator = GramAccumulator(len(X.columns))
+    for XChunk, YChunk in iterAligned(X, Y):
+        checkpoint(label="Fitting chunk by chunk")
+        accumulator.update(XChunk.to_numpy(dtype=float), YChunk.to_numpy(dtype=float))
+    return olsFromGram(accumulator, list(X.columns))
+
+
+def searchAlpha(X, Y, L1_wt=0.0, folds=5, processes=None, **kwargs):
+    """
+    Choose alpha by k-fold cross validation over the regularization path, and return
+    the model fitted on all rows with the best alpha, the path and the CV curve
+    """
+    from .validation import alphaGrid, elasticNetPath, crossValidatePath
+    values = X.to_numpy(dtype=float)
+    y = np.asarray(Y, dtype=float).reshape(-1)
+    alphas = alphaGrid(values, y, L1_wt)
+    cvMSE, cvSE = crossValidatePath(values, y, alphas, L1_wt, folds=int(folds), processes=processes)
+    best = int(np.argmin(cvMSE))
+    path = elasticNetPath(values, y, alphas, L1_wt)
+    names = ["const"] + list(X.columns)
+    params = pd.Series(path[best], index=names)
     results = Results()
-    results.setStat("params", model.params)
-    results.setStat("pvalues", model.pvalues)
-    results.setStat("df_resid", model.df_resid)
-    results.setStat("df_model", model.df_model)
-    results.setStat("rsquared", model.rsquared)
-    results.setStat("rsquared_adj", model.rsquared_adj)
-    results.setStat("fvalue", model.fvalue)
-    results.setStat("f_pvalue", model.f_pvalue)
-    results.setStat("conf_int", model.conf_int())
-    results.setStat("bse", model.bse)
-    results.setStat("llf", model.llf)
-    results.setStat("aic", model.aic)
-    results.setStat("bic", model.bic)
-    return (model, results)
+    results.setStat("params", params)
+    results.setStat("alpha", float(alphas[best]))
+    results.setStat("regularizationPath", {"alphas": alphas, "coefficients": path, "names": names,
+                                           "cvMSE": cvMSE, "cvSE": cvSE, "bestAlpha": float(alphas[best])})
+    return (LinearFit(params), results)
 
 
-def RidgeLR(X, Y, alpha=1.0, **kwargs):
+def RidgeLR(X, Y, alpha=1.0, alphaSearch="none", folds=5, **kwargs):
     import statsmodels.api as sm
+    if alphaSearch == "cv":
+        return searchAlpha(X, Y, L1_wt=0.0, folds=folds)
     X_wconstant = sm.add_constant(X)
     model = sm.OLS(Y, X_wconstant).fit_regularized(
         method='elastic_net', alpha=float(alpha), L1_wt=0.0)
@@ -33,8 +210,10 @@ def RidgeLR(X, Y, alpha=1.0, **kwargs):
     return (model, results)
 
 
-def LassoLR(X, Y, alpha=1.0, **kwargs):
+def LassoLR(X, Y, alpha=1.0, alphaSearch="none", folds=5, **kwargs):
     import statsmodels.api as sm
+    if alphaSearch == "cv":
+        return searchAlpha(X, Y, L1_wt=1.0, folds=folds)
     X_wconstant = sm.add_constant(X)
     model = sm.OLS(Y, X_wconstant).fit_regularized(
         method='elastic_net', alpha=float(alpha), L1_wt=1.0)
@@ -62,6 +241,7 @@ def TTest(X1, X2, alternative="two-sided", equal_var="true"):
 models = {
     "Simple Linear Regression": {
         "func": naiveLR,
+        "streamFunc": streamLR,
         "canPredict": True, },
     "Ridge Regression": {
         "func": RidgeLR,
@@ -96,21 +276,28 @@ class ModelWrapper(object):
         self._modelName = None
         self.fittedModel = None
         self._canPredict = False
+        self._streamModel = None
         self.num_exog = None
+        # parameters of the last fit, reused to refit the model on cross validation folds
+        self.fitParameters = {}
 
     def setModel(self, modelName: str):
         if modelName in models.keys():
             self._model = models[modelName]["func"]
             self._canPredict = models[modelName]["canPredict"]
+            self._streamModel = models[modelName].get("streamFunc", None)
             self._modelName = modelName
 
         else:
             raise KeyError("The model does not exist")
 
     def predict(self, X: pd.DataFrame, **kwargs):
-        import statsmodels.api as sm
-        if self._canPredict:
-            return self.fittedModel.predict(sm.add_constant(X), **kwargs)
+        if self._canPredict and isinstance(self.fittedModel, LinearFit):
+            return self.fittedModel.predict(X, **kwargs)
+        elif self._canPredict:
+            # every predicting model is linear, so statsmodels' results are predicted from their params without add_constant(X)
+            params = pd.Series(np.asarray(self.fittedModel.params, dtype=float).reshape(-1))
+            return LinearFit(params).predict(X, **kwargs)
         else:
             raise TypeError("The model does not support prediction")
 
@@ -211,13 +398,21 @@ class ModelWrapper(object):
         if self._model is None:
             raise ValueError("The model has not been set")
 
-        if not isinstance(Y, pd.Series) and not isinstance(Y, pd.DataFrame):
+        from .source import ChunkedFrame
+        self.fitParameters = dict(kwargs)
+        if isinstance(X, ChunkedFrame):
+            if not isinstance(Y, ChunkedFrame):
+                raise TypeError("Y should be a ChunkedFrame when X is")
+            if self._streamModel is None:
+                raise TypeError("The model does not support chunked data")
+            outputs = self._streamModel(X, Y, **kwargs)
+        elif not isinstance(Y, pd.Series) and not isinstance(Y, pd.DataFrame):
             raise TypeError("Y should be a pandas Series or DataFrame")
-
-        outputs = self._model(X, Y, **kwargs)
+        else:
+            outputs = self._model(X, Y, **kwargs)
 
         if len(outputs) == 2:
-            self.num_exog = X.shape[1]
+            self.num_exog = len(X.columns) if isinstance(X, ChunkedFrame) else X.shape[1]
             (self.fittedModel, self._results) = outputs
         else:
             (self._results,) = outputs
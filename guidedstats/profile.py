@@ -0,0 +1,180 @@
+"""
+This file contains the dataset profile, a columnar summary computed once
+when the dataset is loaded and shared by metrics, assumptions and viz builders
+"""
+import numpy as np
+import pandas as pd
+
+from .utils import QUANTITATIVE_DTYPES, CATEGORICAL_DTYPES
+
+PROFILE_QUANTILES = [0.0, 0.25, 0.5, 0.75, 1.0]
+
+
+def dtypeClass(dtype):
+    if dtype in QUANTITATIVE_DTYPES:
+        return "quantitative"
+    elif dtype in CATEGORICAL_DTYPES:
+        return "categorical"
+    else:
+        return "other"
+
+
+def estimateDistinct(X: pd.Series, precision: int = 12):
+    """
+    HyperLogLog estimate of the number of distinct non-null values in X,
+    the relative error is about 1.04 / sqrt(2 ** precision)
+    """
+    X = X.dropna()
+    if len(X) == 0:
+        return 0
+    m = 1 << precision
+    hashes = pd.util.hash_pandas_object(X, index=False).to_numpy()
+    registerIdx = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    remainder = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # position of the leftmost 1-bit in the remaining 64 - precision bits
+    rank = np.full(len(remainder), 64 - precision + 1, dtype=np.int64)
+    nonzero = remainder > 0
+    rank[nonzero] = (64 - precision) - \
+        np.floor(np.log2(remainder[nonzero].astype(float))).astype(np.int64)
+    registers = np.zeros(m, dtype=np.int64)
+    np.maximum.at(registers, registerIdx, rank)
+
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(2.0 ** -registers)
+    zeros = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and zeros > 0:
+        # small range correction (linear counting)
+        estimate = m * np.log(m / zeros)
+    return int(round(min(estimate, len(X))))
+
+
+class DatasetProfile(object):
+    """
+    Single-pass columnar profile of a dataset: dtype class, count, null count,
+    mean, variance, skew, kurtosis, quantiles, min/max, distinct-count estimate
+    and the correlation matrix of the quantitative columns
+    """
+
+    def __init__(self, dataset: pd.DataFrame):
+        self.index = dataset.index
+        self.columns = {}
+        self.corr = None
+        self.build(dataset)
+
+    def build(self, dataset: pd.DataFrame):
+        dtypes = dataset.dtypes
+        for col in dataset.columns:
+            self.columns[col] = {
+                "dtypeClass": dtypeClass(dtypes[col]),
+                "count": int(dataset[col].count()),
+                "nullCount": int(len(dataset) - dataset[col].count()),
+                "distinct": estimateDistinct(dataset[col]),
+            }
+
+        quantitative = [col for col in dataset.columns
+                        if self.columns[col]["dtypeClass"] == "quantitative"]
+        if len(quantitative) == 0:
+            self.corr = pd.DataFrame()
+            return
+
+        values = dataset[quantitative].to_numpy(dtype=float)
+        counts = np.sum(~np.isnan(values), axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.nanmean(values, axis=0)
+            centered = values - mean
+            m2 = np.nansum(centered ** 2, axis=0) / counts
+            m3 = np.nansum(centered ** 3, axis=0) / counts
+            m4 = np.nansum(centered ** 4, axis=0) / counts
+            variance = m2 * counts / (counts - 1)
+            # biased estimators, same defaults as scipy.stats.skew/kurtosis
+            skew = m3 / m2 ** 1.5
+            kurtosis = m4 / m2 ** 2 - 3.0
+            quantiles = np.nanquantile(values, PROFILE_QUANTILES, axis=0)
+
+            if not np.isnan(values).any():
+                cov = centered.T @ centered
+                std = np.sqrt(np.diag(cov))
+                corr = cov / np.outer(std, std)
+                self.corr = pd.DataFrame(
+                    corr, index=quantitative, columns=quantitative)
+            else:
+                # pairwise complete observations
+                self.corr = dataset[quantitative].corr()
+        del values, centered
+
+        for j, col in enumerate(quantitative):
+            self.columns[col].update({
+                "mean": float(mean[j]),
+                "variance": float(variance[j]),
+                "skew": float(skew[j]),
+                "kurtosis": float(kurtosis[j]),
+                "quantiles": {q: float(quantiles[i, j]) for i, q in enumerate(PROFILE_QUANTILES)},
+                "min": float(quantiles[0, j]),
+                "max": float(quantiles[-1, j]),
+            })
+
+    def getColumn(self, col: str):
+        return self.columns.get(col, None)
+
+    def columnsOfClass(self, dtypeClass: str):
+        return [col for col, stats in self.columns.items() if stats["dtypeClass"] == dtypeClass]
+
+    def describes(self, X):
+        """
+        Whether X holds unmodified rows and columns of the profiled dataset
+        """
+        if X is None or not hasattr(X, "index") or X.index is not self.index:
+            return False
+        names = X.columns if isinstance(X, pd.DataFrame) else [X.name]
+        return all(name in self.columns for name in names)
+
+    def getQuantiles(self, X):
+        """
+        Return (q1, median, q3) of a single column if it is covered by the profile
+        """
+        if not self.describes(X):
+            return None
+        col = X.columns[0] if isinstance(X, pd.DataFrame) else X.name
+        stats = self.columns[col]
+        if "quantiles" not in stats or stats["nullCount"] > 0:
+            return None
+        quantiles = stats["quantiles"]
+        return (quantiles[0.25], quantiles[0.5], quantiles[0.75])
+
+    def getMoments(self, X):
+        """
+        Return (count, skew, kurtosis) of a single column if it is covered by the profile
+        """
+        if not self.describes(X):
+            return None
+        col = X.columns[0] if isinstance(X, pd.DataFrame) else X.name
+        stats = self.columns[col]
+        if "skew" not in stats:
+            return None
+        return (stats["count"], stats["skew"], stats["kurtosis"])
+
+    def getCorrelation(self, df: pd.DataFrame):
+        """
+        Return the correlation matrix of the quantitative columns of df if it is covered by the profile
+        """
+        if not self.describes(df) or self.corr is None:
+            return None
+        if any(self.columns[col]["dtypeClass"] == "other" for col in df.columns):
+            return None
+        columns = [col for col in df.columns
+                   if self.columns[col]["dtypeClass"] == "quantitative"]
+        if not all(col in self.corr.index for col in columns):
+            return None
+        return self.corr.loc[columns, columns]
+
+    def invalidate(self, columns: list = None):
+        """
+        Drop the statistics of columns that have been changed, or of all columns if columns is None
+        """
+        if columns is None:
+            columns = list(self.columns.keys())
+        for col in columns:
+            self.columns.pop(col, None)
+        if self.corr is not None:
+            remaining = [col for col in self.corr.index if col not in columns]
+            self.corr = self.corr.loc[remaining, remaining]
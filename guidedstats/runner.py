@@ -0,0 +1,269 @@
+"""
+Headless runner, executes a built-in workflow on a dataset without a frontend
+
+    python -m guidedstats.runner data.csv --workflow "Linear Regression" \
+        --dependent median_house_value --independent median_income latitude \
+        --train-size 0.8 --model "Simple Linear Regression" --output results.jsonl
+
+Selections name what a user would pick in the widget:
+    {
+        "dependent": str,                # variable of a "dependent variable"/"variable" step
+        "independent": [str],            # variables of an "independent variables" step
+        "group": str,                    # grouping column of a "group variable" step
+        "groups": [str, str],            # the two groups to compare
+        "transformations": {assumptionName or stepId: {"transformationName": str, "variables": [str]}},
+                                         # an assumptionName applies to every step checking it
+        "trainSize": float,
+        "modelName": str,
+        "modelParameters": {name: value},
+        "steps": {stepId: {configKey: value}}   # raw config overrides
+    }
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from .step import (VariableSelectionStep, AssumptionCheckingStep, DataTransformationStep,
+                   TrainTestSplitStep, ModelStep, EvaluationStep)
+from .workflow import WorkFlow
+from .source import ChunkedFrame
+from .utils import jsonCopy
+
+DEFAULT_MODELS = {
+    "Linear Regression": "Simple Linear Regression",
+    "T Test": "T Test",
+}
+
+
+def readDataset(path: str, chunkRows: int = None):
+    """
+    Read the dataset at path, or open it as a ChunkedFrame of chunkRows rows per chunk
+    """
+    if chunkRows is not None:
+        if path.endswith(".parquet") or os.path.isdir(path):
+            return ChunkedFrame.fromParquet(path, chunkRows=chunkRows)
+        return ChunkedFrame.fromCsv(path, chunkRows=chunkRows)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if path.endswith(".json") or path.endswith(".jsonl"):
+        return pd.read_json(path, lines=path.endswith(".jsonl"))
+    return pd.read_csv(path)
+
+
+def readDatasetCode(path: str, datasetName: str = "dataset"):
+    """
+    Code loading the dataset at path into the variable datasetName, as readDataset does in memory
+    """
+    if path.endswith(".parquet") or os.path.isdir(path):
+        read = "pd.read_parquet({!r})".format(path)
+    elif path.endswith(".json") or path.endswith(".jsonl"):
+        read = "pd.read_json({!r}, lines={})".format(path, path.endswith(".jsonl"))
+    else:
+        read = "pd.read_csv({!r})".format(path)
+    return "import pandas as pd\n{} = {}\n".format(datasetName, read)
+
+
+def transformationKeys(step):
+    """
+    Keys of selections["transformations"] applying to step: its assumption name, then its step id
+    """
+    keys = []
+    if isinstance(step, AssumptionCheckingStep) and step.assumption is not None:
+        keys.append(step.assumption._assumptionName)
+    if isinstance(step, (AssumptionCheckingStep, DataTransformationStep)):
+        keys.append(str(step.stepId))
+    return keys
+
+
+def configureStep(step, selections: dict):
+    """
+    Set the config a user would set in the widget, return the config keys to set one after another
+    """
+    updates = []
+    if isinstance(step, VariableSelectionStep):
+        variableType = step._variableType
+        if variableType == "independent variables":
+            updates.append({"variableResults": [{"name": name} for name in selections["independent"]]})
+        elif variableType == "group variable":
+            updates.append({"variableResults": [{"name": selections["group"]}]})
+            # group options are only offered once the grouping column is set
+            updates.append({"groupResults": [{"name": group} for group in selections["groups"]]})
+        else:
+            updates.append({"variableResults": [{"name": selections["dependent"]}]})
+    elif isinstance(step, (AssumptionCheckingStep, DataTransformationStep)):
+        transformations = {str(key): value for key, value in selections.get("transformations", {}).items()}
+        transformation = next((transformations[key] for key in transformationKeys(step) if key in transformations),
+                              None)
+        if transformation is not None:
+            updates.append({"transformationName": transformation["transformationName"],
+                            "variableResults": [{"name": name} for name in transformation["variables"]]})
+    elif isinstance(step, TrainTestSplitStep):
+        updates.append({"trainSize": selections.get("trainSize", 0.8)})
+    elif isinstance(step, ModelStep):
+        modelName = selections.get("modelName", DEFAULT_MODELS.get(step.workflow.workflowName))
+        updates.append({"modelName": modelName})
+        parameters = selections.get("modelParameters", None)
+        if parameters is not None:
+            updates.append({"modelParameters": [{"name": name, "value": value}
+                                                for name, value in parameters.items()]})
+
+    overrides = selections.get("steps", {}).get(str(step.stepId), None)
+    if overrides is not None:
+        updates.append(overrides)
+    return updates
+
+
+def stepSummary(step, includeViz: bool = False):
+    config = {key: value for key, value in step.config.items() if includeViz or key != "viz"}
+    return {"stepId": step.stepId, "stepName": step.stepName, "stepType": step.stepType,
+            "done": step.done, "config": config, "message": step.message}
+
+
+def executeWorkflow(dataset: pd.DataFrame | ChunkedFrame, workflowName: str, selections: dict,
+                    datasetName: str = "dataset", quantileError: float = None, trace: str = None,
+                    traceLabels: dict = None):
+    """
+    Run every step of a built-in workflow synchronously and return the workflow. The steps are
+    profiled into the JSON-lines file trace if given, traceLabels are added to every record
+    """
+    workflow = WorkFlow(dataset, workflowName=workflowName, datasetName=datasetName)
+    workflow.quantileError = quantileError
+    workflow.outputsStorage[0] = {"workflowVariableName": "workflow"}
+    if trace is not None:
+        workflow.enableProfiling(trace, memory=False, labels=traceLabels)
+    try:
+        workflow.startGuiding()
+        known = set(key for step in workflow.stepList for key in transformationKeys(step))
+        unknown = [key for key in selections.get("transformations", {}) if str(key) not in known]
+        if len(unknown) > 0:
+            raise ValueError("Transformations {} match no assumption or transformation step, use one of {}".format(
+                unknown, sorted(known)))
+
+        for step in workflow.stepList[1:]:
+            if isinstance(step, EvaluationStep):
+                # evaluated as soon as the model step moves forward
+                break
+            with workflow.holdSync():
+                for update in configureStep(step, selections):
+                    step.config = {**step.config, **update}
+                step.toExecute = True
+            if not step.done:
+                raise ValueError("Step {} ({}) could not be executed, check the selections".format(
+                    step.stepId, step.stepName))
+    finally:
+        workflow.disableProfiling()
+    return workflow
+
+
+def runWorkflow(dataset: pd.DataFrame | ChunkedFrame, workflowName: str, selections: dict, datasetName: str = "dataset",
+                exportCode: bool = True, includeViz: bool = False, quantileError: float = None, trace: str = None,
+                traceLabels: dict = None):
+    """
+    Run every step of a built-in workflow synchronously and return its results
+    """
+    workflow = executeWorkflow(dataset, workflowName, selections, datasetName, quantileError, trace, traceLabels)
+    results = {
+        "workflowName": workflowName,
+        "datasetName": datasetName,
+        "message": workflow.message,
+        "steps": [stepSummary(step, includeViz) for step in workflow.stepList],
+    }
+    evaluation = workflow.stepList[-1]
+    if isinstance(evaluation, EvaluationStep):
+        results["modelResults"] = evaluation.config.get("modelResults", None)
+        results["modelParameters"] = evaluation.config.get("modelParameters", None)
+    if workflow.current_model is not None and workflow.current_model._results is not None:
+        results["report"] = workflow.exportReport()
+    if exportCode:
+        results["code"] = workflow.exportCode()
+    return jsonCopy(results)
+
+
+def runDataset(path: str, workflowName: str, selections: dict, chunkRows: int = None, **kwargs):
+    """
+    Run a workflow on the dataset at path, errors are returned instead of raised. The dataset is
+    named "dataset" in the exported code, which starts by reading it from path
+    """
+    try:
+        dataset = readDataset(path, chunkRows)
+        results = runWorkflow(dataset, workflowName, selections, datasetName="dataset", traceLabels={"path": path},
+                              **kwargs)
+    except Exception as e:
+        return {"workflowName": workflowName, "datasetName": "dataset", "path": path,
+                "error": "{}: {}".format(type(e).__name__, e)}
+    results["path"] = path
+    if "code" in results:
+        results["code"] = readDatasetCode(path, "dataset") + results["code"]
+    return results
+
+
+def runMany(paths: list, workflowName: str, selections: dict, processes: int = None, **kwargs):
+    """
+    Run a workflow on many datasets in a process pool, yield the results in the order of paths
+    """
+    if processes == 1:
+        for path in paths:
+            yield runDataset(path, workflowName, selections, **kwargs)
+        return
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(runDataset, path, workflowName, selections, **kwargs) for path in paths]
+        for future in futures:
+            yield future.result()
+
+
+def parseArgs(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="guidedstats-run", description="Run a GuidedStats workflow on datasets without a frontend")
+    parser.add_argument("datasets", nargs="+", help="csv, parquet or json(l) files")
+    parser.add_argument("--workflow", default="Linear Regression", choices=list(DEFAULT_MODELS.keys()))
+    parser.add_argument("--selections", help="json file of selections, overridden by the options below")
+    parser.add_argument("--dependent")
+    parser.add_argument("--independent", nargs="+")
+    parser.add_argument("--group")
+    parser.add_argument("--groups", nargs=2)
+    parser.add_argument("--train-size", type=float, dest="trainSize")
+    parser.add_argument("--model", dest="modelName")
+    parser.add_argument("--chunk-rows", type=int, default=None, dest="chunkRows",
+                        help="stream the datasets in chunks of this many rows instead of loading them")
+    parser.add_argument("--quantile-error", type=float, default=None, dest="quantileError",
+                        help="approximate the quantiles of outlier checks and transformations within this rank error")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="number of worker processes, 1 runs in this process")
+    parser.add_argument("--trace", help="append the time, CPU time, input size and synced bytes of every step "
+                                        "call to this jsonl file")
+    parser.add_argument("--no-code", action="store_true", help="do not export the code of the workflow")
+    parser.add_argument("--output", help="jsonl file of results, one line per dataset (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArgs(argv)
+    selections = {}
+    if args.selections is not None:
+        with open(args.selections) as fp:
+            selections = json.load(fp)
+    for key in ["dependent", "independent", "group", "groups", "trainSize", "modelName"]:
+        if getattr(args, key) is not None:
+            selections[key] = getattr(args, key)
+
+    output = open(args.output, "w") if args.output is not None else sys.stdout
+    failed = 0
+    try:
+        for results in runMany(args.datasets, args.workflow, selections, processes=args.processes,
+                               chunkRows=args.chunkRows, quantileError=args.quantileError,
+                               exportCode=not args.no_code, trace=args.trace):
+            failed += "error" in results
+            output.write(json.dumps(results) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failed > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+This file contains approximate quantiles of columns that are too large to sort:
+a mergeable KLL sketch, built chunk by chunk and merged across worker processes
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+import pandas as pd
+
+from .source import CHUNK_ROWS, ChunkedFrame
+
+# default normalized rank error of approximate quantiles
+DEFAULT_QUANTILE_ERROR = 0.01
+MIN_K = 8
+
+
+def kForError(epsilon: float):
+    """
+    Compactor size k of a sketch with a normalized rank error of about epsilon
+    (the single-quantile bound 2.296 / k^0.9723 of the DataSketches KLL sketch)
+    """
+    return max(MIN_K, int(np.ceil((2.296 / epsilon) ** (1 / 0.9723))))
+
+
+class QuantileSketch(object):
+    """
+    KLL sketch of the finite values of a column. Items of level h stand for 2^h values,
+    a full level is sorted and every other item is promoted, so a sketch of n values
+    holds O(k log(n / k)) items. Sketches with the same epsilon can be merged
+    """
+
+    def __init__(self, epsilon: float = DEFAULT_QUANTILE_ERROR, seed: int = 0):
+        self.epsilon = epsilon
+        self.k = kForError(epsilon)
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return sum(len(level) for level in self.levels)
+
+    def capacity(self, level: int):
+        # lower levels hold fewer items, capacities shrink geometrically by 2/3
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float).reshape(-1)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other: "QuantileSketch"):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, items in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) > self.capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(self.levels[h])
+                # an odd item out stays on its level, so the total weight is kept exactly
+                odd = len(items) % 2
+                promoted = items[odd + int(self._rng.integers(2))::2]
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                self.levels[h] = items[:odd]
+            h += 1
+
+    def quantile(self, q):
+        """
+        Approximate q-quantiles, q is a number or an array in [0, 1]
+        """
+        q = np.asarray(q, dtype=float)
+        if self.n == 0:
+            return np.full(q.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+        positions = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        values = items[np.clip(positions, 0, len(items) - 1)]
+        # the extremes are known exactly
+        values = np.where(q <= 0, self.min, np.where(q >= 1, self.max, values))
+        return values if values.ndim > 0 else float(values)
+
+
+def sketchValues(values, epsilon: float = DEFAULT_QUANTILE_ERROR, chunkRows: int = CHUNK_ROWS, seed: int = 0):
+    """
+    Sketch an in-memory column chunkRows values at a time
+    """
+    values = np.asarray(values).reshape(-1)
+    sketch = QuantileSketch(epsilon, seed)
+    for start in range(0, len(values), chunkRows):
+        sketch.update(values[start:start + chunkRows])
+    return sketch
+
+
+def sketchChunk(chunk: pd.DataFrame, epsilon: float, seed: int):
+    return {col: QuantileSketch(epsilon, seed).update(chunk[col].to_numpy(dtype=float)) for col in chunk.columns}
+
+
+def sketchColumns(frame: ChunkedFrame, columns: list = None, epsilon: float = DEFAULT_QUANTILE_ERROR,
+                  processes: int = 1, seed: int = 0):
+    """
+    Sketch every column of a chunked frame in a single pass. With several processes the
+    chunks are sketched by a pool and merged, at most two chunks per worker are in flight
+    """
+    columns = list(columns) if columns is not None else list(frame.columns)
+    sketches = {col: QuantileSketch(epsilon, seed) for col in columns}
+
+    def mergeChunk(chunkSketches):
+        for col, sketch in chunkSketches.items():
+            sketches[col].merge(sketch)
+
+    if processes == 1:
+        for i, chunk in enumerate(frame.iterChunks(columns)):
+            mergeChunk(sketchChunk(chunk, epsilon, seed + i))
+        return sketches
+    workers = processes if processes is not None else (os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for i, chunk in enumerate(frame.iterChunks(columns)):
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    mergeChunk(future.result())
+            pending.add(pool.submit(sketchChunk, chunk, epsilon, seed + i))
+        for future in pending:
+            mergeChunk(future.result())
+    return sketches
+
+
+def columnQuantiles(X, q, quantileError: float = None):
+    """
+    Quantiles q (in [0, 1]) of a single column. Exact (np.percentile) unless quantileError is set,
+    chunked frames are always sketched, with DEFAULT_QUANTILE_ERROR if no error is given
+    """
+    if isinstance(X, ChunkedFrame):
+        epsilon = quantileError if quantileError is not None else DEFAULT_QUANTILE_ERROR
+        return sketchColumns(X, epsilon=epsilon)[X.columns[0]].quantile(q)
+    values = np.asarray(X, dtype=float).reshape(-1)
+    if quantileError is None:
+        return np.percentile(values, np.asarray(q) * 100)
+    return sketchValues(values, quantileError).quantile(q)
@@ -0,0 +1,162 @@
+"""
+This file contains chunked data sources, tables read chunk by chunk so that
+models can be fitted and evaluated on data that does not fit in memory
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 65536
+# rows of a chunked source the workflow keeps in memory for exploration (profile, assumptions, viz)
+SAMPLE_ROWS = 100000
+
+
+def hashUniform(index, seed: int = 0):
+    """
+    Map every row label of index to a number in [0, 1), the same label always gets the same number
+    """
+    hashes = pd.util.hash_array(np.asarray(index), hash_key="guidedstats{:05d}".format(seed % 100000))
+    return (hashes >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def hashSplit(chunk: pd.DataFrame, trainSize: float = 0.8, train: bool = True, seed: int = 0):
+    """
+    Row mask of the train (or test) rows of chunk, rows are assigned by hashing their label
+    """
+    isTrain = hashUniform(chunk.index, seed) < float(trainSize)
+    return isTrain if train else ~isTrain
+
+
+def readCsvChunks(path: str, columns: list = None, chunkRows: int = CHUNK_ROWS, **kwargs):
+    # the chunks of read_csv carry on the row numbers of the previous ones
+    return pd.read_csv(path, usecols=columns, chunksize=chunkRows, **kwargs)
+
+
+def readParquetChunks(path: str, columns: list = None, chunkRows: int = CHUNK_ROWS, **kwargs):
+    import pyarrow.dataset as ds
+    dataset = ds.dataset(path, format="parquet", **kwargs)
+    offset = 0
+    for batch in dataset.to_batches(columns=columns, batch_size=chunkRows):
+        chunk = batch.to_pandas()
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+
+def readFrameChunks(frame: pd.DataFrame, columns: list = None, chunkRows: int = CHUNK_ROWS):
+    if columns is not None:
+        frame = frame[columns]
+    for start in range(0, len(frame), chunkRows):
+        yield frame.iloc[start:start + chunkRows]
+
+
+class ChunkedFrame(object):
+    """
+    Lazy table read chunk by chunk. read(columns) returns an iterator of DataFrame
+    chunks whose row labels are unique across chunks. Selecting columns and
+    filtering rows return new ChunkedFrames, nothing is read until iterChunks
+    """
+
+    def __init__(self, read, columns: list = None, filters: tuple = ()):
+        self._read = read
+        self._columns = list(columns) if columns is not None else None
+        self._filters = tuple(filters)
+
+    @classmethod
+    def fromCsv(cls, path: str, chunkRows: int = CHUNK_ROWS, **kwargs):
+        return cls(functools.partial(readCsvChunks, path, chunkRows=chunkRows, **kwargs))
+
+    @classmethod
+    def fromParquet(cls, path: str, chunkRows: int = CHUNK_ROWS, **kwargs):
+        return cls(functools.partial(readParquetChunks, path, chunkRows=chunkRows, **kwargs))
+
+    @classmethod
+    def fromFrame(cls, frame: pd.DataFrame, chunkRows: int = CHUNK_ROWS):
+        return cls(functools.partial(readFrameChunks, frame, chunkRows=chunkRows))
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            chunk = next(iter(self._read()), None)
+            self._columns = list(chunk.columns) if chunk is not None else []
+        return pd.Index(self._columns)
+
+    @property
+    def shape(self):
+        return (self.countRows(), len(self.columns))
+
+    def __getitem__(self, columns):
+        if isinstance(columns, str):
+            columns = [columns]
+        return ChunkedFrame(self._read, columns, self._filters)
+
+    def where(self, mask, columns: list = None):
+        """
+        Keep the rows where mask(chunk) is True, columns are the columns mask reads
+        if it does not only depend on the row labels
+        """
+        return ChunkedFrame(self._read, self._columns, self._filters + ((mask, tuple(columns or ())),))
+
+    def sharesSource(self, other):
+        return self._read is other._read and self._filters == other._filters
+
+    def iterChunks(self, columns: list = None):
+        columns = list(columns) if columns is not None else self._columns
+        readColumns = columns
+        if columns is not None:
+            # the columns read by the filters are read too, and dropped after filtering
+            readColumns = list(dict.fromkeys(columns + [col for _, maskColumns in self._filters for col in maskColumns]))
+        for chunk in self._read(columns=readColumns):
+            for mask, _ in self._filters:
+                chunk = chunk[np.asarray(mask(chunk), dtype=bool)]
+            if len(chunk) > 0:
+                yield chunk if columns is None else chunk[columns]
+
+    def countRows(self):
+        return sum(len(chunk) for chunk in self.iterChunks())
+
+    def sample(self, n: int = SAMPLE_ROWS, seed: int = 0):
+        """
+        Return a DataFrame of at most n rows, the n rows with the smallest hashes of their labels,
+        so the same rows are kept whatever the chunk size
+        """
+        sample = None
+        keys = np.empty(0)
+        for chunk in self.iterChunks():
+            chunkKeys = hashUniform(chunk.index, seed)
+            if sample is not None:
+                chunk = pd.concat([sample, chunk])
+                chunkKeys = np.concatenate([keys, chunkKeys])
+            if len(chunk) > n:
+                kept = np.sort(np.argpartition(chunkKeys, n - 1)[:n])
+                chunk, chunkKeys = chunk.iloc[kept], chunkKeys[kept]
+            sample, keys = chunk, chunkKeys
+        if sample is None:
+            return pd.DataFrame(columns=self._columns)
+        return sample.sort_index()
+
+
+def iterAligned(*frames: ChunkedFrame):
+    """
+    Yield tuples of the row-aligned chunks of frames, reading the source once if they share it
+    """
+    first = frames[0]
+    if all(first.sharesSource(frame) for frame in frames[1:]):
+        columnLists = [list(frame.columns) for frame in frames]
+        union = list(dict.fromkeys(col for columns in columnLists for col in columns))
+        for chunk in first.iterChunks(union):
+            yield tuple(chunk[columns] for columns in columnLists)
+    else:
+        yield from zip(*(frame.iterChunks() for frame in frames))
+
+
+def alignedSample(n: int, *frames: ChunkedFrame, seed: int = 0):
+    """
+    Return the same sampled rows of every frame as DataFrames
+    """
+    if all(frames[0].sharesSource(frame) for frame in frames[1:]):
+        union = list(dict.fromkeys(col for frame in frames for col in frame.columns))
+        sample = frames[0][union].sample(n, seed)
+        return tuple(sample[list(frame.columns)] for frame in frames)
+    return tuple(frame.sample(n, seed) for frame in frames)
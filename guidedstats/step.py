@@ -1,21 +1,30 @@
 from abc import abstractmethod
+import contextlib
 import json
 import copy
+import functools
 import re
 import textwrap
 import traitlets as tl
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
-from .utils import CATEGORICAL_DTYPES, checkPRange, getUniqueValues
-from .metrics import MetricWrapper
+from .utils import CATEGORICAL_DTYPES, checkPRange, getUniqueValues, topKIndices, jsonCopy
+from .metrics import MetricWrapper, ResidualAccumulator
 from .assumptions import AssumptionWrapper
 from .transformations import TransformationWrapper
-from .viz import VIZ
+from .viz import VIZ, MAX_POINTS
 from .model import ModelWrapper
+from .profile import DatasetProfile
+from .lineage import DatasetView
+from .source import ChunkedFrame, alignedSample, hashSplit, iterAligned
+from .validation import crossValidationFolds, crossValidateModel, summarizeFolds
 from .export import vizTypeToSpec, exportTTestReport, exportRegressionReport
+from .executor import StepExecutor, checkpoint, currentJob
+from .tracing import traceMethods
 from .utils import QUANTITATIVE_DTYPES
 
+INLINE_EXECUTOR = StepExecutor("inline")
+
 
 class Config(tl.HasTraits):
     dataset = tl.Unicode("").tag(sync=True)
@@ -44,6 +53,8 @@ class Step(tl.HasTraits):
     previousConfig = tl.Dict({}).tag(sync=True)
     groupConfig = tl.Dict({}).tag(sync=True)
     message = tl.Unicode().tag(sync=True)
+    # {"running", "fraction", "label", "runId"} of the step's job, plus "error" or "cancelled" once it has ended
+    progress = tl.Dict({}).tag(sync=True)
     """
     base class
     """
@@ -72,6 +83,14 @@ class Step(tl.HasTraits):
 
         self.previousSteps = previousSteps
 
+        # trait changes made inside transactions and the notifications actually delivered
+        self.notificationCounts = {"changes": 0, "notifications": 0, "observerCallsSaved": 0}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # forward and the observers of every step are recorded by the profiler of its workflow
+        traceMethods(cls)
+
     @property
     def workflow(self):
         return self._workflow
@@ -80,15 +99,70 @@ class Step(tl.HasTraits):
     def workflow(self, workflow):
         self._workflow = workflow
 
+    @property
+    def executor(self):
+        # steps outside of a workflow run their jobs inline
+        return self.workflow.executor if self.workflow is not None else INLINE_EXECUTOR
+
     # utils function
     def changeConfig(self, key, value):
-        tmp = self.config
-        tmp[key] = value
-        tmp = json.dumps(tmp)
-        tmp = json.loads(tmp)
-        self.config = tmp
+        job = currentJob()
+        if job is not None and job.stepId == self.stepId:
+            # changes made by a job are applied with its result, those of a superseded job are dropped
+            job.staged[key] = jsonCopy(value)
+            return
+        # config is updated in place, so observers of config are not notified, only the frontend is synced
+        self.config[key] = jsonCopy(value)
         if self.workflow is not None:
-            self.workflow.updateWorkflowInfo(None)
+            self.workflow.syncTrait(self, "config")
+
+    def getConfig(self, key, default=None):
+        """
+        The value of key in config, including the changes staged by the running job
+        """
+        job = currentJob()
+        if job is not None and job.stepId == self.stepId and key in job.staged:
+            return job.staged[key]
+        return self.config.get(key, default)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Coalesce the trait changes made inside into one notification per trait,
+        and the workflowInfo patches they cause into one frontend sync
+        """
+        with contextlib.ExitStack() as stack:
+            if self.workflow is not None:
+                stack.enter_context(self.workflow.holdSync())
+            stack.enter_context(self.holdNotifications())
+            yield
+
+    @contextlib.contextmanager
+    def holdNotifications(self):
+        if self._cross_validation_lock:
+            # notifications are already held by an outer transaction
+            yield
+            return
+        changes = {}
+        with self.hold_trait_notifications():
+            hold = self.notify_change
+
+            def count(change):
+                changes[change.name] = changes.get(change.name, 0) + 1
+                hold(change)
+
+            # hold_trait_notifications restores notify_change on exit
+            self.notify_change = count
+            yield
+        # hold_trait_notifications delivers one notification per changed trait
+        for name, n in changes.items():
+            self.notificationCounts["changes"] += n
+            self.notificationCounts["notifications"] += 1
+            self.notificationCounts["observerCallsSaved"] += (n - 1) * self.observerCount(name)
+
+    def observerCount(self, name):
+        notifiers = self._trait_notifiers
+        return sum(len(notifiers.get(key, {}).get("change", [])) for key in (name, tl.All))
 
     def compareConfig(self, old_config, new_config):
         differentKeys = []
@@ -109,15 +183,20 @@ class Step(tl.HasTraits):
         pass
         
     def moveToNextStep(self):
-        self.done = True
-        self.workflow.moveToNextStep(self)
+        with self.workflow.holdSync():
+            self.done = True
+            self.workflow.moveToNextStep(self)
     
     def rerun(self):
         config = copy.deepcopy(self.config)
-        self.previousConfig = config
-        self.config = {}
-        self.config = config
-        self.toExecute = True
+        with self.transaction():
+            self.previousConfig = config
+            # reset config silently, the single notification of config then shows every key as changed
+            self._trait_values["config"] = {}
+            self.notificationCounts["changes"] += 1
+            self.notificationCounts["observerCallsSaved"] += self.observerCount("config")
+            self.config = config
+            self.toExecute = True
 
     @abstractmethod
     def forward(self):
@@ -139,6 +218,9 @@ class Step(tl.HasTraits):
         pass
 
 
+traceMethods(Step)
+
+
 class GuidedStep(Step):
     """
         GuidedStep suggests potentially insightful column(s) based on selected metrics
@@ -170,24 +252,50 @@ class GuidedStep(Step):
         """
             Return the top-k highest column(s) based on the metric
         """
+        dtypes = dataframe.dtypes
+        # referenceColumns is the dependent variable
+        # the constraint should be relaxed for other types of variables
+        candidates = [column for column in columns
+                      if column not in referenceColumns and dtypes[column] in QUANTITATIVE_DTYPES]
+        if self.metric.hasBatchMetric() and len(referenceColumns) == 1:
+            return self.batchCompare(dataframe, candidates, k, referenceColumns[0])
+
         results = []
-        for column in columns:
-            if column not in referenceColumns:  # referenceColumns is the dependent variable
-                if dataframe[column].dtype in QUANTITATIVE_DTYPES:
-                    # the constraint should be relaxed for other types of variables
-                    result = {"name": column}
-                    outputs = self.computeMetric(
-                        dataframe, column, *referenceColumns)
-                    result["score"] = outputs["stats"]
-                    if "pvalue" in outputs:
-                        pvalue = outputs["pvalue"]
-                        result["pvalue"] = pvalue
-                    # TBC, here only consider correlation
-                    results.append(result)
+        for column in candidates:
+            result = {"name": column}
+            outputs = self.computeMetric(
+                dataframe, column, *referenceColumns)
+            result["score"] = outputs["stats"]
+            if "pvalue" in outputs:
+                pvalue = outputs["pvalue"]
+                result["pvalue"] = pvalue
+            # TBC, here only consider correlation
+            results.append(result)
         descendingColumns = sorted(
             results, key=lambda x: abs(x["score"]), reverse=True)
         return descendingColumns[0:min(len(descendingColumns), k)]
 
+    def batchCompare(self, dataframe: pd.DataFrame, columns: list, k: int, referenceColumn: str):
+        """
+            Score all columns at once with the vectorized form of the metric and return the top-k
+        """
+        if len(columns) == 0:
+            return []
+        try:
+            X = dataframe[columns].to_numpy(dtype=float)
+            Y = dataframe[referenceColumn].to_numpy(dtype=float)
+            outputs = self.metric.computeBatch(X, Y)
+        except Exception as e:
+            self.workflow.message = f"{e}"
+            raise e
+        results = []
+        for i in topKIndices(outputs["stats"], k):
+            result = {"name": columns[i], "score": float(outputs["stats"][i])}
+            if "pvalue" in outputs:
+                result["pvalue"] = float(outputs["pvalue"][i])
+            results.append(result)
+        return results
+
 # Define Step that get the outputs of the previous step
 
 
@@ -202,6 +310,9 @@ class SucccessorStep(Step):
 
 
 class DataTransformationStep(SucccessorStep):
+    # looked up in the outputs of the steps before, besides the outputs of the previous step
+    implicitInputs = ["dataset"]
+
     def __init__(self, stepId: int = None, stepName="Data Transformation", stepExplanation="", succeedPreviousStepOutput=True, previousSteps: list = None, **kwargs):
         super().__init__(stepId, stepName, stepExplanation,
                          succeedPreviousStepOutput, previousSteps, **kwargs)
@@ -247,21 +358,29 @@ class DataTransformationStep(SucccessorStep):
 
             outputName = self.outputNames[0]
             otherParameters["outputName"] = outputName
-            inputDataset = copy.deepcopy(self.inputs["dataset"])
-            transformedDataset = self._transformation.transform(
-                inputDataset, columns, **otherParameters)
-            outputs = copy.deepcopy(self.getPreviousOutputs())
-            for key in transformedDataset.keys():
+            if self.workflow is not None:
+                otherParameters.update(self.workflow.quantileOptions())
+            # transformations do not mutate their input, no copy is needed
+            (transformedDataset, msg) = self._transformation.transform(
+                self.inputs["dataset"], columns, **otherParameters)
+            if transformedDataset is None:
+                if self.workflow is not None and msg is not None:
+                    self.workflow.message = msg
+                return
+            outputs = dict(self.getPreviousOutputs())
+            for key in columns:
                 outputs[key] = transformedDataset[key]
-            self.outputs = outputs
 
             # update current dataframe
             if self.workflow is not None:
-                dataset = copy.deepcopy(self.inputs["dataset"])
-                for key in transformedDataset.keys():
-                    dataset[key] = transformedDataset[key]
-                self.workflow.current_dataframe = dataset
-            del inputDataset, dataset, transformedDataset
+                self.workflow.invalidateProfile(columns)
+                view = self.workflow.datasetView
+                if view is not None:
+                    outputs["datasetView"] = view.derive(
+                        transformedDataset, stepId=self.stepId)
+                self.workflow.current_dataframe = transformedDataset
+            self.outputs = outputs
+            del transformedDataset
 
             self.done = True
 
@@ -275,22 +394,8 @@ class DataTransformationStep(SucccessorStep):
         if self.outputNames is None:
             self.outputNames = [list(outputs.keys())[0]]
 
-        # get dataset from previous steps
-        # format: [string, string]
-        keys = list(self.workflow.outputsStorage.keys())
-        keys.sort(reverse=True)
-        found = False
-        currentIdx = 0
-        dataset = None
-
-        while not found:
-            currentObservingOutputs = self.workflow.outputsStorage[keys[currentIdx]]
-            if "dataset" in currentObservingOutputs:
-                found = True
-                dataset = currentObservingOutputs["dataset"]
-            currentIdx += 1
-
-        self.inputs["dataset"] = dataset
+        # get dataset from the closest previous step outputting it
+        self.inputs["dataset"] = self.workflow.inputOf(self, "dataset")
 
         self.inputs[list(outputs.keys())[0]] = outputs[list(outputs.keys())[0]]
 
@@ -335,7 +440,11 @@ class LoadDatasetStep(Step):
         self.dataset = self.workflow.dataset
         self.datasetName = self.workflow.datasetName
 
-        self.outputs = {"dataset": self.dataset, "datasetName": self.datasetName}
+        # profile the dataset once, metrics, assumptions and viz builders read from it
+        profile = DatasetProfile(self.dataset)
+        self.outputs = {"dataset": self.dataset,
+                        "datasetName": self.datasetName, "profile": profile,
+                        "datasetView": DatasetView(self.dataset, stepId=self.stepId)}
 
         # update current dataframe
         if self.workflow is not None:
@@ -423,12 +532,19 @@ class VariableSelectionStep(GuidedStep):
                 candidateColumns = self.compare(
                     dataset, dataset.columns, self.candidateNum)
         else:
-            if self.requireVarCategory:
-                candidateColumns = [
-                    {"name": col} for col in dataset.columns if dataset[col].dtype in CATEGORICAL_DTYPES]
-            else:
+            profile = self.workflow.profile if self.workflow is not None else None
+            dtypeClass = "categorical" if self.requireVarCategory else "quantitative"
+            if profile is not None and profile.describes(dataset):
                 candidateColumns = [{"name": col}
-                                    for col in dataset.columns if dataset[col].dtype in QUANTITATIVE_DTYPES]
+                                    for col in profile.columnsOfClass(dtypeClass)]
+            else:
+                dtypes = dataset.dtypes
+                if self.requireVarCategory:
+                    candidateColumns = [
+                        {"name": col} for col in dataset.columns if dtypes[col] in CATEGORICAL_DTYPES]
+                else:
+                    candidateColumns = [{"name": col}
+                                        for col in dataset.columns if dtypes[col] in QUANTITATIVE_DTYPES]
 
         self.changeConfig("variableCandidates", candidateColumns)
 
@@ -462,7 +578,6 @@ class VariableSelectionStep(GuidedStep):
                     options = [{"name": value} for value in values]
                     self.groupCandidates = options
                     self.changeConfig("groupCandidates", self.groupCandidates)
-                    self.workflow.updateWorkflowInfo(None)
         else:
             if hasVariableResults:
                 selectedColumns = [result["name"]
@@ -492,6 +607,11 @@ class VariableSelectionStep(GuidedStep):
         self.findVariableCandidates(dataset, referenceDataset)
 
 
+def runAssumptionCheck(assumption: AssumptionWrapper, inputs: tuple, kwargs: dict):
+    assumptionResults, vizs = assumption.checkAssumption(*inputs, **kwargs)
+    return assumptionResults, vizs, list(assumption.allExtraStats)
+
+
 class AssumptionCheckingStep(SucccessorStep):
 
     def __init__(self, stepId: int = None, stepName="Check Assumption", stepExplanation="", succeedPreviousStepOutput=True, previousSteps: list = None, assumptionName: str = None, isRelaxed: bool = True, **kwargs):
@@ -503,6 +623,9 @@ class AssumptionCheckingStep(SucccessorStep):
         # get inputNames
         self.previousSteps = kwargs.get("inputNames", None)
         self.transformedDataset = None
+        self.transformedView = None
+        # keyword arguments of the assumption's metric, e.g. {"normalityTest": "auto"}
+        self.assumptionOptions = kwargs.get("assumptionOptions", {})
 
         if assumptionName is not None:
             self.assumption = AssumptionWrapper()
@@ -523,6 +646,8 @@ class AssumptionCheckingStep(SucccessorStep):
         code += f"\n# Step {self.stepId + 1}: {self.stepName}\n"
 
         code += "# Function to check the assumption\n"
+        for helper in self.assumption._assumption.get("helper_funcs", []):
+            code += inspect.getsource(helper) + "\n"
         metric_code = inspect.getsource(
             self.assumption._assumption["metric_func"])
         code += metric_code
@@ -570,26 +695,34 @@ class AssumptionCheckingStep(SucccessorStep):
     @tl.observe("toExecute")
     def onObserveToExecute(self, change):
         if change["old"] == False and change["new"] == True:
-            if self.config.get("assumptionResults", None) is not None:
-
-                # update self.inputs andd dataframe
-                if self.transformedDataset is not None:
-                    self.workflow.current_dataframe = self.transformedDataset
-                    self.outputs["dataset"] = self.transformedDataset
-
-                if self.outputNames is not None:
-                    for i, outputName in enumerate(self.outputNames):
-                        ipt = list(self.inputs.values())[i]
-                        if self.transformedDataset is not None:
-                            self.outputs[outputName] = self.transformedDataset[ipt.columns]
-                        else:
-                            self.outputs[outputName] = ipt
-                else:
-                    self.outputs = self.getPreviousOutputs()
-
-                self.moveToNextStep()
+            if self.executor.isRunning(self):
+                # the step proceeds once the running check has been applied
+                return
+            self.proceed()
+
+    def proceed(self):
+        if self.config.get("assumptionResults", None) is not None:
+
+            # update self.inputs andd dataframe
+            if self.transformedDataset is not None:
+                self.workflow.current_dataframe = self.transformedDataset
+                self.outputs["dataset"] = self.transformedDataset
+                if self.transformedView is not None:
+                    self.outputs["datasetView"] = self.transformedView
+
+            if self.outputNames is not None:
+                for i, outputName in enumerate(self.outputNames):
+                    ipt = list(self.inputs.values())[i]
+                    if self.transformedDataset is not None:
+                        self.outputs[outputName] = self.transformedDataset[ipt.columns]
+                    else:
+                        self.outputs[outputName] = ipt
             else:
-                self.toExecute = False
+                self.outputs = self.getPreviousOutputs()
+
+            self.moveToNextStep()
+        else:
+            self.toExecute = False
 
     @tl.observe("config")
     def onObserveConfig(self, change):
@@ -605,24 +738,39 @@ class AssumptionCheckingStep(SucccessorStep):
             dataset = self.workflow.current_dataframe
 
             (transformedDataset, msg) = self._transformation.transform(
-                dataset, columns)
+                dataset, columns, **self.workflow.quantileOptions())
+            self.workflow.invalidateProfile(columns)
             if transformedDataset is not None:
                 self.transformedDataset = transformedDataset
-                inputs = copy.deepcopy(self.inputs)
+                view = self.workflow.datasetView
+                if view is not None:
+                    self.transformedView = view.derive(
+                        transformedDataset, stepId=self.stepId)
+                # only the DataFrames are re-selected from the transformed dataset
+                inputs = dict(self.inputs)
                 for key in inputs.keys():
-                    inputs[key] = self.transformedDataset[inputs[key].columns]
+                    if isinstance(inputs[key], pd.DataFrame):
+                        inputs[key] = self.transformedDataset[inputs[key].columns]
                 self.checkAssumption(
                     inputs, previousInputs=self.inputs, groups=self.inputs.get("groups", None))
             if msg is not None:
                 self.workflow.message = msg
 
     def checkAssumption(self, inputs: dict, **kwargs):
-        # 2. check assumption
-        assumptionResults, vizs = self.assumption.checkAssumption(
-            *tuple(inputs.values()), **kwargs)
-        # 3. set config
+        kwargs.update(self.assumptionOptions)
+        if self.workflow is not None:
+            kwargs["profile"] = self.workflow.profile
+            kwargs.update(self.workflow.quantileOptions())
+        # 2. check assumption, 3. set config once the check is done
+        self.executor.submit(self, runAssumptionCheck, self.assumption, tuple(inputs.values()), kwargs,
+                             apply=self.applyAssumption, label="Checking {}".format(self.assumption._assumptionName))
+
+    def applyAssumption(self, result):
+        assumptionResults, vizs, self.assumption.allExtraStats = result
         self.changeConfig("assumptionResults", assumptionResults)
         self.changeConfig("viz", vizs)
+        if self.toExecute:
+            self.proceed()
 
     def forward(self, **inputs):
 
@@ -648,6 +796,22 @@ class TrainTestSplitStep(Step):
 
     def clear(self):
         self.config.pop("trainSize", None)
+        self.config.pop("splitMode", None)
+
+    def crossValidationSplits(self, X: pd.DataFrame, Y: pd.DataFrame):
+        """
+        Positional fold indices of XTrain when splitMode is "kfold", the model is cross validated
+        on them in EvaluationStep. Optional config: folds, repeats, seed, stratify (bool, by the
+        quantiles of Y) and groupColumn (a column of the dataset whose groups are never split)
+        """
+        groups = None
+        groupColumn = self.config.get("groupColumn", None)
+        if groupColumn:
+            groups = self.workflow.dataset.loc[X.index, groupColumn].to_numpy()
+        strata = Y.to_numpy().reshape(-1) if self.config.get("stratify", False) else None
+        return crossValidationFolds(len(X), folds=int(self.config.get("folds", 5)),
+                                    repeats=int(self.config.get("repeats", 1)),
+                                    seed=int(self.config.get("seed", 0)), strata=strata, groups=groups)
 
     def export(self, export_viz_func=False, **kwargs):
         code = ""
@@ -676,6 +840,11 @@ yTest = Y.iloc[test_indices]\n""")
 
                 X = self.inputs["X"]
                 Y = self.inputs["Y"]
+                source = self.workflow.source if self.workflow is not None else None
+                if source is not None:
+                    self.splitSource(source, X, Y, trainSize)
+                    self.moveToNextStep()
+                    return
                 indices = np.arange(len(X))
                 np.random.shuffle(indices)
                 train_indices = indices[:int(len(indices)*float(trainSize))]
@@ -688,22 +857,46 @@ yTest = Y.iloc[test_indices]\n""")
                 yTest = Y.iloc[test_indices]
 
                 self.outputs = {"XTrain": XTrain, "XTest": XTest,
-                                "yTrain": yTrain, "yTest": yTest}
+                                "yTrain": yTrain, "yTest": yTest, "folds": None}
+                if self.config.get("splitMode", "holdout") == "kfold":
+                    self.outputs["folds"] = self.crossValidationSplits(XTrain, yTrain)
 
                 self.moveToNextStep()
             else:
                 self.toExecute = False
 
+    def splitSource(self, source: ChunkedFrame, X: pd.DataFrame, Y: pd.DataFrame, trainSize: float):
+        """
+        Split a chunked source lazily, rows are assigned to train or test by hashing their labels
+        """
+        train = source.where(functools.partial(hashSplit, trainSize=trainSize, train=True))
+        test = source.where(functools.partial(hashSplit, trainSize=trainSize, train=False))
+        XColumns, YColumns = list(X.columns), list(Y.columns)
+        self.outputs = {"XTrain": train[XColumns], "XTest": test[XColumns],
+                        "yTrain": train[YColumns], "yTest": test[YColumns], "folds": None}
+        if self.config.get("splitMode", "holdout") == "kfold":
+            self.workflow.message = "Cross validation is not available for chunked sources, the hold-out split is used"
+        transformed = [step.stepName for step in self.workflow.steps[:self.stepId]
+                       if step.config.get("transformationName", None) is not None]
+        if len(transformed) > 0:
+            self.workflow.message = "Transformations ({}) were applied to the in-memory sample only, " \
+                "the model is fitted on the untransformed source".format(", ".join(transformed))
+
     def forward(self, X: pd.DataFrame, Y: pd.DataFrame):
         self.inputs = {"X": X, "Y": Y}
 
 
+def fitModel(modelWrapper: ModelWrapper, inputs: tuple, args: dict):
+    # every fit gets its own wrapper, so the model of a superseded fit never replaces the current one
+    return copy.copy(modelWrapper).fit(*inputs, **args)
+
+
 class ModelStep(GuidedStep):
 
     def __init__(self, stepId: int = None, stepName="Train Model", stepExplanation="", succeedPreviousStepOutput=False, previousSteps: list = None, compare: bool = False, metricName: str = None, modelCandidates: list = None, **kwargs):
         super().__init__(stepId, stepName, stepExplanation, succeedPreviousStepOutput,
                          previousSteps, compare, metricName, **kwargs)
-        # TBC, should allow more types of models and hyperparameter search
+        # TBC, should allow more types of models, Ridge/Lasso search alpha with alphaSearch="cv"
         self.modelWrapper = ModelWrapper()
         self.succeedPreviousStepOutput = succeedPreviousStepOutput
 
@@ -720,7 +913,7 @@ class ModelStep(GuidedStep):
         code = ""
         import inspect
         code += textwrap.dedent(f"""\n# Step {self.stepId + 1}: {self.stepName}
-from guidedstats.model import Results\n""")
+from guidedstats.model import Results, gramStats, olsFromGram, searchAlpha\n""")
         if self.config.get("modelName", None) is not None:
             code += inspect.getsource(self.modelWrapper._model)
 
@@ -740,13 +933,18 @@ from guidedstats.model import Results\n""")
 
             if self.config.get("modelParameters", None) is not None:
                 for parameter in self.config["modelParameters"]:
-                    arguments.append(f"{parameter['name']} = {parameter['value']}")
+                    # the same arguments as the fit in onObserveToExecute, strings are quoted
+                    value = parameter.get("value", parameter.get("default", None))
+                    if value is not None:
+                        arguments.append(f"{parameter['name']} = {value!r}")
 
             code += f"""model,results = {self.modelWrapper._model.__name__}({",".join(arguments)})\n"""
         return code
 
     @tl.observe("config")
     def onObserveConfig(self, change):
+        # a fit started with the previous config is outdated
+        self.executor.cancel(self)
         if "modelName" in change["new"] and change["new"].get("modelName", None) != change["old"].get("modelName", None):
             self.config.pop("modelParameters", None)
             modelName = change["new"]["modelName"]
@@ -756,26 +954,30 @@ from guidedstats.model import Results\n""")
     def onObserveToExecute(self, change):
         if change["old"] == False and change["new"] == True:
             if self.config.get("modelName", None) is not None:
+                args = {}
                 if self.config.get("modelParameters", None) is not None:
-                    args = {}
                     for parameter in self.config["modelParameters"]:
-                        args[parameter["name"]] = parameter["value"]
-                    model, results = self.modelWrapper.fit(
-                        *tuple(self.inputs.values()), **args)
-                else:
-                    model, results = self.modelWrapper.fit(
-                        *tuple(self.inputs.values()))
-
-                # update current model and results
-                if self.workflow is not None:
-                    self.workflow.current_model = model
-
-                # TBC, the model should be wrapped
-                self.outputs = {"model": model, "results": results}
-                self.moveToNextStep()
+                        # parameters left untouched in the frontend keep their defaults
+                        value = parameter.get("value", parameter.get("default", None))
+                        if value is not None:
+                            args[parameter["name"]] = value
+                self.executor.submit(self, fitModel, self.modelWrapper, tuple(self.inputs.values()), args,
+                                     apply=self.applyFit, label="Fitting {}".format(self.config["modelName"]),
+                                     picklable=True)
             else:
                 self.toExecute = False
 
+    def applyFit(self, result):
+        model, results = result
+        self.modelWrapper = model
+        # update current model and results
+        if self.workflow is not None:
+            self.workflow.current_model = model
+
+        # TBC, the model should be wrapped
+        self.outputs = {"model": model, "results": results}
+        self.moveToNextStep()
+
     def forward(self, **inputs):
         self.inputs = inputs
 
@@ -788,6 +990,11 @@ class EvaluationStep(GuidedStep):
         self.previousSteps = kwargs.get("inputNames", None)
         self.evaluationMetricNames = kwargs.get("evaluationMetricNames", None)
         self.visType = kwargs.get("visType", None)
+        # dtype of the prediction buffers, "float32" halves their memory on large test sets
+        self.predictionDtype = kwargs.get("predictionDtype", "float64")
+        # the residual viz shares MAX_POINTS between Train and Test, keeping the residualExtremes largest residuals
+        self.residualStratify = kwargs.get("residualStratify", True)
+        self.residualExtremes = kwargs.get("residualExtremes", 0)
 
         self.columns = None
 
@@ -801,6 +1008,7 @@ class EvaluationStep(GuidedStep):
     def clear(self):
         self.config.pop("modelParameters", None)
         self.config.pop("modelResults", None)
+        self.config.pop("cvFolds", None)
         self.config.pop("viz", None)
 
     def export(self, export_viz_func=False, **kwargs):
@@ -872,44 +1080,96 @@ Y_true_test = yTest.to_numpy().reshape((-1))''')
                     params[i], 4), "pvalue": round(p_values[i], 6)})
             else:
                 rows.append({"name": col, "value": round(params[i], 4)})
+        if results.getStat("alpha") is not None:
+            rows.append({"name": "alpha (CV)", "value": float("{:.4g}".format(results.getStat("alpha")))})
         self.changeConfig("modelParameters", rows)
 
-    def evaluate_model(self, model, XTrain, XTest, yTrain, yTest):
+    def evaluate_streaming(self, model, XTrain, XTest, yTrain, yTest):
+        """
+        evaluate_model over ChunkedFrames, predictions are made and scored chunk by chunk
+        """
         modelResults = []
-        if model._canPredict:
-            Y_hat_train = model.predict(XTrain)
-            Y_hat_train = Y_hat_train.to_numpy().reshape((-1))
-            Y_true_train = yTrain.to_numpy().reshape((-1))
-
+        for group, X, Y in [("Train", XTrain, yTrain), ("Test", XTest, yTest)]:
+            moments = ResidualAccumulator()
+            for XChunk, YChunk in iterAligned(X, Y):
+                checkpoint(label="Scoring the {} chunks".format(group))
+                moments.update(YChunk.to_numpy(), model.predict(XChunk).to_numpy())
+            if moments.n == 0:
+                continue
             for metric in self.metricWrappers:
-                outputs = metric.compute(Y_true_train, Y_hat_train, XTrain)
+                if not metric.hasStreamingMetric():
+                    continue
+                outputs = metric.computeStreaming(moments, len(X.columns))
                 modelResults.append(
-                    {"name": metric._metricName, "score": round(outputs["stats"], 4), "group": "Train"})
+                    {"name": metric._metricName, "score": round(outputs["stats"], 4), "group": group})
+        self.changeConfig("modelResults", modelResults)
 
+    def predict(self, model, X: pd.DataFrame, Y: pd.DataFrame):
+        """
+        Return (y_true, y_hat) as flat arrays of predictionDtype, computed once and
+        shared by the metrics and the residual viz
+        """
+        dtype = np.dtype(self.predictionDtype)
+        y_hat = model.predict(X, dtype=dtype).to_numpy().reshape((-1))
+        y_true = Y.to_numpy(dtype=dtype).reshape((-1))
+        return y_true, y_hat
+
+    def score(self, y_true, y_hat, X, group: str):
+        # residual moments are computed in one pass and shared by mse, r2 and adjusted_r2
+        moments = ResidualAccumulator().update(y_true, y_hat)
+        modelResults = []
+        for metric in self.metricWrappers:
+            if metric.hasStreamingMetric():
+                outputs = metric.computeStreaming(moments, X.shape[1])
+            else:
+                outputs = metric.compute(y_true, y_hat, X)
+            modelResults.append(
+                {"name": metric._metricName, "score": round(float(outputs["stats"]), 4), "group": group})
+        return modelResults
+
+    def evaluate_model(self, model, XTrain, XTest, yTrain, yTest, predictions: dict = None):
+        if isinstance(XTrain, ChunkedFrame):
+            self.evaluate_streaming(model, XTrain, XTest, yTrain, yTest)
+            return
+        modelResults = []
+        if model._canPredict:
+            if predictions is None:
+                predictions = {"Train": self.predict(model, XTrain, yTrain),
+                               "Test": self.predict(model, XTest, yTest)}
+            modelResults += self.score(*predictions["Train"], XTrain, "Train")
             if len(yTest) > 0:
-                Y_hat_test = model.predict(XTest)
-                Y_hat_test = Y_hat_test.to_numpy().reshape((-1))
-                Y_true_test = yTest.to_numpy().reshape((-1))
-
-                for metric in self.metricWrappers:
-                    outputs = metric.compute(Y_true_test, Y_hat_test, XTest)
-                    modelResults.append(
-                        {"name": metric._metricName, "score": round(outputs["stats"], 4), "group": "Test"})
+                modelResults += self.score(*predictions["Test"], XTest, "Test")
 
         self.changeConfig("modelResults", modelResults)
 
-    def generate_residual_viz(self, model, XTrain, XTest, yTrain, yTest):
-        vizStats = []
+    def evaluate_folds(self, model, XTrain, yTrain, folds):
+        """
+        Refit the model on every cross validation fold of the training rows, report the
+        fold-mean and fold-std of each metric (group "CV") and the scores and time of every fold
+        """
+        metricNames = [metric._metricName for metric in self.metricWrappers]
+        scores = crossValidateModel(XTrain, yTrain, model._modelName, model.fitParameters,
+                                    metricNames, folds)
+        summary = summarizeFolds(scores, metricNames)
+        modelResults = list(self.getConfig("modelResults", []))
+        for metricName in metricNames:
+            modelResults.append({"name": metricName, "score": round(summary[metricName]["mean"], 4),
+                                 "std": round(summary[metricName]["std"], 4), "group": "CV"})
+        self.changeConfig("modelResults", modelResults)
+        self.changeConfig("cvFolds", [{key: round(value, 4) if isinstance(value, float) else value
+                                       for key, value in score.items()} for score in scores])
+
+    def generate_residual_viz(self, model, XTrain, XTest, yTrain, yTest, predictions: dict = None):
+        if isinstance(XTrain, ChunkedFrame):
+            # residuals of a sample of the rows, at most MAX_POINTS per group
+            XTrain, yTrain = alignedSample(MAX_POINTS, XTrain, yTrain)
+            XTest, yTest = alignedSample(MAX_POINTS, XTest, yTest)
         if model._canPredict:
-            Y_hat_test = model.predict(XTest).to_numpy().reshape((-1))
-            Y_true_test = yTest.to_numpy().reshape((-1))
-            vizStats.extend(VIZ['residual'](
-                Y_hat_test, Y_true_test, group="Test"))
-
-            Y_hat_train = model.predict(XTrain).to_numpy().reshape((-1))
-            Y_true_train = yTrain.to_numpy().reshape((-1))
-            vizStats.extend(VIZ['residual'](
-                Y_hat_train, Y_true_train, group="Train"))
+            if predictions is None:
+                predictions = {"Train": self.predict(model, XTrain, yTrain),
+                               "Test": self.predict(model, XTest, yTest)}
+            vizStats = VIZ['residualGroups']({"Test": predictions["Test"], "Train": predictions["Train"]},
+                                             stratify=self.residualStratify, extremes=self.residualExtremes)
 
             viz = {
                 "vizType": "scatter",
@@ -918,6 +1178,14 @@ Y_true_test = yTest.to_numpy().reshape((-1))''')
                 "vizStats": vizStats,
             }
             vizs = [viz]
+            path = self.inputs["results"].getStat("regularizationPath")
+            if path is not None:
+                vizs.append({
+                    "vizType": "regularizationPath",
+                    "xLabel": "alpha",
+                    "yLabel": "CV MSE",
+                    "vizStats": VIZ["regularizationPath"](**path),
+                })
             self.changeConfig("viz", vizs)
 
     def generate_ttest_viz(self, Y1, Y2, results):
@@ -947,11 +1215,14 @@ Y_true_test = yTest.to_numpy().reshape((-1))''')
         
     def forward(self, **inputs):
         self.inputs = inputs
-        model = self.inputs["model"]
-        results = self.inputs["results"]
-        
-        self.report(results)
+        self.executor.submit(self, self.evaluate, self.inputs["model"], self.inputs["results"],
+                             apply=self.applyEvaluation, label="Evaluating the model")
 
+    def evaluate(self, model, results):
+        """
+        Compute the parameters, scores and viz of the model, the config changes are staged
+        and applied by applyEvaluation
+        """
         if self.visType == "residual":
             XTest = self.inputs["XTest"]
             XTrain = self.inputs["XTrain"]
@@ -960,8 +1231,17 @@ Y_true_test = yTest.to_numpy().reshape((-1))''')
 
             self.columns = ["const"] + list(XTrain.columns)
             self.update_model_parameters(model, results, columns=self.columns)
-            self.evaluate_model(model, XTrain, XTest, yTrain, yTest)
-            self.generate_residual_viz(model, XTrain, XTest, yTrain, yTest)
+            predictions = None
+            if model._canPredict and not isinstance(XTrain, ChunkedFrame):
+                predictions = {"Train": self.predict(model, XTrain, yTrain),
+                               "Test": self.predict(model, XTest, yTest)}
+            checkpoint(0.2, "Scoring the model")
+            self.evaluate_model(model, XTrain, XTest, yTrain, yTest, predictions)
+            folds = self.inputs.get("folds", None)
+            if folds is not None and model._canPredict:
+                self.evaluate_folds(model, XTrain, yTrain, folds)
+            checkpoint(0.8, "Plotting residuals")
+            self.generate_residual_viz(model, XTrain, XTest, yTrain, yTest, predictions)
         elif self.visType == "ttest":
             Y1 = self.inputs["Y1"]
             Y2 = self.inputs["Y2"]
@@ -969,5 +1249,8 @@ Y_true_test = yTest.to_numpy().reshape((-1))''')
             self.columns = ["T Statistic"]
             self.update_model_parameters(model, results, columns=self.columns)
             self.generate_ttest_viz(Y1, Y2, results)
+        return results
 
+    def applyEvaluation(self, results):
+        self.report(results)
         self.done = True
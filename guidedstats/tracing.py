@@ -0,0 +1,225 @@
+"""
+This file contains the profiler of workflows. Once enabled on a workflow, every call of
+forward, onObserveConfig, onObserveToExecute and moveToNextStep records its wall and CPU
+time, its peak traced allocation, the rows and columns of the step's inputs and the bytes
+synced to the frontend meanwhile. Calls nested in others (a moveToNextStep forwarding the
+next step) are recorded with the id of their parent record. While no profiler is enabled,
+the traced methods cost a single check
+"""
+import functools
+import json
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+TRACED_METHODS = ["forward", "onObserveConfig", "onObserveToExecute", "moveToNextStep"]
+
+# number of enabled profilers, the traced methods call through while it is 0
+ACTIVE = 0
+
+
+class StepProfiler(object):
+    """
+    Records of the traced calls of one workflow, appended to the JSON-lines file trace if given.
+    The peak allocation is traced with tracemalloc, which slows the calls down (memory=False
+    skips it), and is shared by the threads running meanwhile
+    """
+
+    def __init__(self, trace: str = None, memory: bool = True, labels: dict = None):
+        self.trace = trace
+        self.memory = memory
+        self.labels = labels or {}
+        self.records = []
+        self.calls = 0
+        self.enabled = False
+        self.startedTracing = False
+        self.origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file = None
+
+    @property
+    def stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def enable(self):
+        global ACTIVE
+        if self.enabled:
+            return
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.startedTracing = True
+        if self.trace is not None:
+            self._file = open(self.trace, "a")
+        self.enabled = True
+        ACTIVE += 1
+
+    def disable(self):
+        global ACTIVE
+        if not self.enabled:
+            return
+        self.enabled = False
+        ACTIVE -= 1
+        if self.startedTracing:
+            tracemalloc.stop()
+            self.startedTracing = False
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def call(self, owner, step, method: str, func, args: tuple, kwargs: dict):
+        """
+        Run func(*args, **kwargs), a method of owner (step or its workflow) called for step, and record it
+        """
+        stack = self.stack
+        memory = self.memory and tracemalloc.is_tracing()
+        frame = {"parent": stack[-1]["id"] if stack else None, "depth": len(stack), "syncedBytes": 0, "peak": 0}
+        with self._lock:
+            frame["id"] = self.calls
+            self.calls += 1
+        if memory:
+            # the peak of the enclosing call so far is kept, the peak of this call is traced from its start
+            if stack:
+                stack[-1]["peak"] = max(stack[-1]["peak"], tracemalloc.get_traced_memory()[1] - stack[-1]["base"])
+            tracemalloc.reset_peak()
+            frame["base"] = tracemalloc.get_traced_memory()[0]
+        stack.append(frame)
+        error = None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return func(*args, **kwargs)
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            stack.pop()
+            peak = None
+            if memory:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1] - frame["base"])
+                if stack:
+                    # the peak of this call counts towards the peak of the enclosing one
+                    stack[-1]["peak"] = max(stack[-1]["peak"], peak + frame["base"] - stack[-1]["base"])
+                tracemalloc.reset_peak()
+            rows, columns = inputShape(getattr(step, "inputs", {}), kwargs)
+            self.record({**self.labels,
+                         "id": frame["id"], "parent": frame["parent"], "depth": frame["depth"],
+                         "stepId": getattr(step, "stepId", None), "stepName": getattr(step, "stepName", None),
+                         "stepType": getattr(step, "stepType", None),
+                         "method": "{}.{}".format(type(owner).__name__, method),
+                         "start": time.perf_counter() - wall - self.origin, "wall": wall, "cpu": cpu,
+                         "peakBytes": peak, "rows": rows, "columns": columns,
+                         "syncedBytes": frame["syncedBytes"], "error": error})
+
+    def record(self, record: dict):
+        with self._lock:
+            self.records.append(record)
+            if self._file is not None:
+                self._file.write(json.dumps(record) + "\n")
+                self._file.flush()
+
+    def addSyncedBytes(self, value):
+        """
+        Count the bytes of value, sent to the frontend, towards every call in progress
+        """
+        stack = self.stack
+        if not stack:
+            return
+        n = payloadBytes(value)
+        for frame in stack:
+            frame["syncedBytes"] += n
+
+    def summary(self):
+        with self._lock:
+            records = list(self.records)
+        summary = pd.DataFrame(records, columns=RECORD_COLUMNS + sorted(self.labels))
+        summary = summary.sort_values("id", ignore_index=True)
+        for name in ["parent", "rows", "columns", "peakBytes"]:
+            summary[name] = summary[name].astype("Int64")
+        return summary
+
+
+RECORD_COLUMNS = ["id", "parent", "depth", "stepId", "stepName", "stepType", "method", "start", "wall", "cpu",
+                  "peakBytes", "rows", "columns", "syncedBytes", "error"]
+
+
+def inputShape(inputs: dict, kwargs: dict):
+    """
+    The most rows of the frames among the inputs of a step and the total of their columns. The rows
+    of a ChunkedFrame are not counted, that would read the whole source
+    """
+    from .source import ChunkedFrame
+    rows, columns = None, None
+    # forward stores its keyword arguments as its inputs, each frame is counted once
+    values = {id(value): value for value in list(kwargs.values()) + list(inputs.values())}
+    for value in values.values():
+        if isinstance(value, ChunkedFrame):
+            columns = (columns or 0) + len(value.columns)
+        elif isinstance(value, (pd.DataFrame, pd.Series, np.ndarray)):
+            shape = value.shape
+            rows = max(rows or 0, shape[0])
+            columns = (columns or 0) + (shape[1] if len(shape) > 1 else 1)
+    return rows, columns
+
+
+def payloadBytes(value):
+    """
+    Bytes sent to the frontend for value: its JSON state plus its binary buffers
+    """
+    from ipywidgets.widgets.widget import _remove_buffers
+    from .utils import encodeBuffers
+    state, _, buffers = _remove_buffers(encodeBuffers(value))
+    return len(json.dumps(state, default=str)) + sum(memoryview(buffer).nbytes for buffer in buffers)
+
+
+def traced(method: str, step=None):
+    """
+    Decorate a method of a step (or, with step a function of the arguments, of a workflow) to be
+    recorded by the profiler of its workflow
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not ACTIVE:
+                return func(self, *args, **kwargs)
+            profiler = profilerOf(self)
+            if profiler is None or not profiler.enabled:
+                return func(self, *args, **kwargs)
+            return profiler.call(self, self if step is None else step(*args), method, func, (self,) + args, kwargs)
+
+        wrapper.traced = True
+        return wrapper
+
+    return decorator
+
+
+def profilerOf(owner):
+    # owner is a step, or the workflow itself
+    workflow = getattr(owner, "workflow", owner)
+    return getattr(workflow, "profiler", None)
+
+
+def traceMethods(cls):
+    """
+    Trace the methods of TRACED_METHODS defined by cls, including those observing traits
+    """
+    for name in TRACED_METHODS:
+        attribute = cls.__dict__.get(name)
+        if attribute is None:
+            continue
+        # tl.observe wraps the method in a handler, which binds handler.func to the instance
+        handler = attribute if hasattr(attribute, "trait_names") else None
+        func = handler.func if handler is not None else attribute
+        if getattr(func, "traced", False) or not callable(func):
+            continue
+        if handler is not None:
+            handler.func = traced(name)(func)
+        else:
+            setattr(cls, name, traced(name)(func))
+    return cls
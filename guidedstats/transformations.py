@@ -1,33 +1,50 @@
+import functools
+
 import numpy as np
 import pandas as pd
+from .lineage import replaceColumns
+from .sketch import columnQuantiles
+from .source import ChunkedFrame
+from .utils import iqrBounds
 
 def log_transform(data: pd.DataFrame,columns,**kwargs):
     for col in columns:
         if data[col].min() <= 0:
             return (None,"There's non-positive value in the column. Logarithmic transformation is not applicable to non-positive values.")
-        data[col] = np.log(data[col])
+    # copy-on-write, only the transformed columns get new buffers
+    data = replaceColumns(data, {col: np.log(data[col]) for col in columns})
     return (data,None)
 
+def withinBounds(chunk: pd.DataFrame, column, lower: float, upper: float):
+    return (chunk[column] >= lower) & (chunk[column] <= upper)
+
+
+def filterBounds(data: pd.DataFrame | ChunkedFrame, column, lower: float, upper: float):
+    if isinstance(data, ChunkedFrame):
+        # the rows are filtered lazily, chunk by chunk
+        return data.where(functools.partial(withinBounds, column=column, lower=lower, upper=upper), [column])
+    return data[withinBounds(data, column, lower, upper)]
+
+
 #winsorization
-def winsorize(data: pd.DataFrame, columns, **kwargs):
+def winsorize(data: pd.DataFrame | ChunkedFrame, columns, **kwargs):
+    # quantiles are approximated by a sketch if quantileError is set, and always for chunked data
+    quantileError = kwargs.get("quantileError", None)
     for col in columns:
-        lower = data[col].quantile(0.05)
-        upper = data[col].quantile(0.95)
-        data = data[(data[col] >= lower) & (data[col] <= upper)]
+        if quantileError is None and not isinstance(data, ChunkedFrame):
+            lower = data[col].quantile(0.05)
+            upper = data[col].quantile(0.95)
+        else:
+            lower, upper = columnQuantiles(data[col], [0.05, 0.95], quantileError)
+        data = filterBounds(data, col, lower, upper)
     return (data, None)
 
-def deleteOutliers(data: pd.DataFrame, columns, **kwargs):
-    for col in columns:   
-        X = data[col]
-        Q1 = np.percentile(X, 25)
-        Q3 = np.percentile(X, 75)
-        IQR = Q3 - Q1
-
-        lower_threshold = Q1 - 1.5 * IQR
-        upper_threshold = Q3 + 1.5 * IQR
-
-        data = data[(data[col] >= lower_threshold) & (data[col] <= upper_threshold)]
-        return (data, None)
+def deleteOutliers(data: pd.DataFrame | ChunkedFrame, columns, **kwargs):
+    for col in columns:
+        Q1, Q3 = columnQuantiles(data[col], [0.25, 0.75], kwargs.get("quantileError", None))
+        lower_threshold, upper_threshold = iqrBounds(Q1, Q3)
+        data = filterBounds(data, col, lower_threshold, upper_threshold)
+    return (data, None)
 
 TRANSFORMATIONS = {
     "Logarithmic Transform": 
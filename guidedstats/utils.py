@@ -1,3 +1,5 @@
+import json
+import numpy as np
 import pandas as pd
 
 QUANTITATIVE_DTYPES = ['float64', 'int64']
@@ -25,4 +27,94 @@ def getLatestValue(outputsStorage, key):
     for stepId in sorted(outputsStorage.keys(), reverse=True):
         if key in outputsStorage[stepId]:
             return outputsStorage[stepId][key]
-    return None
\ No newline at end of file
+    return None
+
+
+def topKIndices(scores, k: int):
+    """
+    Return the indices of the k scores with the largest magnitude, in descending order
+    """
+    magnitude = np.abs(np.asarray(scores, dtype=float))
+    magnitude[np.isnan(magnitude)] = -np.inf
+    k = min(k, len(magnitude))
+    if k <= 0:
+        return np.array([], dtype=int)
+    if k < len(magnitude):
+        indices = np.argpartition(-magnitude, k - 1)[:k]
+    else:
+        indices = np.arange(len(magnitude))
+    # ties keep the original column order, as the stable sort did before
+    order = np.lexsort((indices, -magnitude[indices]))
+    return indices[order]
+
+
+def iqrBounds(q1: float, q3: float, whisker: float = 1.5):
+    """
+    Return the (lower, upper) outlier thresholds of the quartiles q1 and q3
+    """
+    iqr = q3 - q1
+    return q1 - whisker * iqr, q3 + whisker * iqr
+
+
+def outlierMask(values, lower, upper):
+    """
+    Boolean mask of the values outside of [lower, upper], nan is never an outlier
+    """
+    return (values < lower) | (values > upper)
+
+
+def tailValues(values, k: int, largest: bool = True):
+    """
+    Return the k largest (or smallest) values, most extreme first, in O(n) with np.partition
+    """
+    values = np.asarray(values, dtype=float).reshape(-1)
+    k = min(k, len(values))
+    if k <= 0:
+        return values[:0]
+    if largest:
+        values = -values
+    if k < len(values):
+        values = np.partition(values, k - 1)[:k]
+    values = np.sort(values)[:k]
+    return -values if largest else values
+
+
+def jsonCopy(value):
+    """
+    Copy of a JSON-like value, as json.loads(json.dumps(value)) would give, numpy arrays are kept as they are
+    """
+    if isinstance(value, np.ndarray):
+        return value
+    if isinstance(value, dict):
+        return {key if isinstance(key, str) else json.dumps(key): jsonCopy(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonCopy(item) for item in value]
+    return json.loads(json.dumps(value))
+
+
+def encodeBuffers(value, widget=None):
+    """
+    Replace the numpy arrays in value by {"dtype", "shape", "buffer"}, ipywidgets sends the buffers as binary
+    """
+    if isinstance(value, np.ndarray):
+        array = np.ascontiguousarray(value)
+        return {"dtype": str(array.dtype), "shape": list(array.shape),
+                "buffer": memoryview(array.reshape(-1).view(np.uint8))}
+    if isinstance(value, dict):
+        return {key: encodeBuffers(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encodeBuffers(item) for item in value]
+    return value
+
+
+def decodeBuffers(value, widget=None):
+    """
+    Inverse of encodeBuffers
+    """
+    if isinstance(value, dict):
+        if set(value.keys()) == {"dtype", "shape", "buffer"}:
+            return np.frombuffer(value["buffer"], dtype=value["dtype"]).reshape(value["shape"])
+        return {key: decodeBuffers(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decodeBuffers(item) for item in value]
+    return value
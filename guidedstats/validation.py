@@ -0,0 +1,229 @@
+"""
+This file contains the resampling helpers used for model selection: fold
+assignment, regularization paths and their cross-validated scores
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .executor import checkpoint
+
+ALPHA_GRID_SIZE = 30
+# ridge folds below this many rows run in this process, starting a pool costs more than the closed-form fits
+POOL_MIN_ROWS = 20000
+
+
+def foldIds(n: int, folds: int = 5, seed: int = 0):
+    """
+    Assign n rows to folds of (almost) equal size at random
+    """
+    ids = np.arange(n) % folds
+    np.random.default_rng(seed).shuffle(ids)
+    return ids
+
+
+def stratifiedFoldIds(strata, folds: int = 5, seed: int = 0, bins: int = 10):
+    """
+    Assign rows to folds so that every fold has the same share of every stratum,
+    numeric strata are binned into quantiles first
+    """
+    strata = pd.Series(np.asarray(strata).reshape(-1))
+    if strata.dtype.kind in "fiu" and strata.nunique() > bins:
+        strata = pd.qcut(strata, bins, labels=False, duplicates="drop")
+    codes = pd.factorize(strata)[0]
+    rng = np.random.default_rng(seed)
+    ids = np.empty(len(codes), dtype=np.int64)
+    # rows of a stratum are dealt to the folds in turn, starting after the previous stratum
+    order = np.lexsort((rng.random(len(codes)), codes))
+    ids[order] = np.arange(len(codes)) % folds
+    return ids
+
+
+def groupFoldIds(groups, folds: int = 5, seed: int = 0):
+    """
+    Assign rows to folds so that the rows of a group are never split, the largest
+    groups are placed first, each into the fold with the fewest rows so far
+    """
+    codes, uniques = pd.factorize(pd.Series(np.asarray(groups).reshape(-1)))
+    if len(uniques) < folds:
+        raise ValueError("{} groups cannot be split into {} folds".format(len(uniques), folds))
+    sizes = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    rng = np.random.default_rng(seed)
+    # random tie-breaking between groups of the same size
+    order = np.lexsort((rng.random(len(uniques)), -sizes))
+    groupFold = np.empty(len(uniques), dtype=np.int64)
+    loads = np.zeros(folds, dtype=np.int64)
+    for group in order:
+        fold = int(np.argmin(loads))
+        groupFold[group] = fold
+        loads[fold] += sizes[group]
+    return np.where(codes >= 0, groupFold[codes], -1)
+
+
+def crossValidationFolds(n: int, folds: int = 5, repeats: int = 1, seed: int = 0, strata=None, groups=None):
+    """
+    Positional train/test indices of (repeated) k-fold cross validation,
+    stratified by strata or grouped by groups if given
+    """
+    splits = []
+    for repeat in range(repeats):
+        if groups is not None:
+            ids = groupFoldIds(groups, folds, seed + repeat)
+        elif strata is not None:
+            ids = stratifiedFoldIds(strata, folds, seed + repeat)
+        else:
+            ids = foldIds(n, folds, seed + repeat)
+        for fold in range(folds):
+            splits.append({"repeat": repeat, "fold": fold,
+                           "train": np.flatnonzero((ids != fold) & (ids >= 0)),
+                           "test": np.flatnonzero(ids == fold)})
+    return splits
+
+
+def withConstant(X: np.ndarray):
+    return np.column_stack([np.ones(len(X)), X])
+
+
+def alphaGrid(X: np.ndarray, y: np.ndarray, L1_wt: float = 0.0, num: int = ALPHA_GRID_SIZE):
+    """
+    Descending log-spaced alphas for statsmodels' elastic net penalty. The lasso grid starts
+    at the smallest alpha zeroing every coefficient, the ridge grid spans the squared singular
+    values of the design, the columns are not standardized so both grids span many decades
+    """
+    Xc = withConstant(X)
+    n = len(y)
+    if L1_wt > 0:
+        alphaMax = np.max(np.abs(Xc.T @ y)) / n / L1_wt
+        alphaMin = alphaMax * 1e-6
+    else:
+        s = np.linalg.svd(Xc, compute_uv=False)
+        alphaMax = 10 * s[0] ** 2 / n
+        alphaMin = 1e-3 * max(s[-1], s[0] * 1e-8) ** 2 / n
+    return np.logspace(np.log10(alphaMax), np.log10(alphaMin), num)
+
+
+def ridgePath(X: np.ndarray, y: np.ndarray, alphas: np.ndarray):
+    """
+    Ridge coefficients for every alpha from a single SVD, same penalty as statsmodels' fit_regularized(L1_wt=0)
+    """
+    u, s, vt = np.linalg.svd(withConstant(X), full_matrices=False)
+    q = (u.T @ y) * s
+    return (q[None, :] / (s[None, :] ** 2 + alphas[:, None] * len(y))) @ vt
+
+
+def elasticNetPath(X: np.ndarray, y: np.ndarray, alphas: np.ndarray, L1_wt: float = 0.0):
+    """
+    Coefficients (const first) for every alpha, one row per alpha
+    """
+    if L1_wt == 0:
+        return ridgePath(X, y, alphas)
+    import statsmodels.api as sm
+    model = sm.OLS(y, withConstant(X))
+    path = []
+    start = None
+    # alphas are descending, every fit is warm-started from the sparser previous solution
+    for alpha in alphas:
+        start = model.fit_regularized(method="elastic_net", alpha=float(alpha), L1_wt=L1_wt,
+                                      start_params=start).params
+        path.append(start)
+    return np.array(path)
+
+
+def foldScores(X: np.ndarray, y: np.ndarray, trainMask: np.ndarray, alphas: np.ndarray, L1_wt: float = 0.0):
+    """
+    Held-out mean squared error of every alpha of the path fitted on the train rows
+    """
+    path = elasticNetPath(X[trainMask], y[trainMask], alphas, L1_wt)
+    residuals = y[~trainMask][:, None] - withConstant(X[~trainMask]) @ path.T
+    return np.mean(residuals ** 2, axis=0)
+
+
+def crossValidatePath(X: np.ndarray, y: np.ndarray, alphas: np.ndarray, L1_wt: float = 0.0,
+                      folds: int = 5, processes: int = None, seed: int = 0):
+    """
+    Mean and standard error over k folds of the held-out MSE of every alpha,
+    the folds are fitted in parallel on a process pool
+    """
+    ids = foldIds(len(y), folds, seed)
+    masks = [ids != k for k in range(folds)]
+    if processes == 1 or (processes is None and L1_wt == 0 and len(y) < POOL_MIN_ROWS):
+        scores = []
+        for k, mask in enumerate(masks):
+            checkpoint(k / folds, "Cross validating fold {} of {}".format(k + 1, folds))
+            scores.append(foldScores(X, y, mask, alphas, L1_wt))
+    else:
+        workers = processes if processes is not None else min(folds, os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            scores = list(pool.map(foldScores, [X] * folds, [y] * folds, masks,
+                                   [alphas] * folds, [L1_wt] * folds))
+    scores = np.array(scores)
+    return scores.mean(axis=0), scores.std(axis=0, ddof=1) / np.sqrt(folds)
+
+
+def scoreFold(X: pd.DataFrame, Y: pd.DataFrame, modelName: str, parameters: dict, metricNames: list, split: dict):
+    """
+    Fit the model on the train rows of split and score it on its test rows
+    """
+    from .model import ModelWrapper
+    from .metrics import MetricWrapper
+    start = time.perf_counter()
+    XTrain, XTest = X.iloc[split["train"]], X.iloc[split["test"]]
+    model = ModelWrapper()
+    model.setModel(modelName)
+    model.fit(XTrain, Y.iloc[split["train"]], **parameters)
+    y_hat = np.asarray(model.predict(XTest)).reshape(-1)
+    y_true = Y.iloc[split["test"]].to_numpy().reshape(-1)
+    scores = {"repeat": split["repeat"], "fold": split["fold"],
+              "nTrain": len(split["train"]), "nTest": len(split["test"])}
+    for metricName in metricNames:
+        metric = MetricWrapper()
+        metric.setMetric(metricName)
+        metric.cache = None
+        scores[metricName] = float(metric.compute(y_true, y_hat, XTest)["stats"])
+    scores["seconds"] = time.perf_counter() - start
+    return scores
+
+
+# data of the folds, set once per worker process instead of being sent with every fold
+_foldData = {}
+
+
+def _setFoldData(X, Y):
+    _foldData["X"], _foldData["Y"] = X, Y
+
+
+def _scoreFoldInWorker(modelName, parameters, metricNames, split):
+    return scoreFold(_foldData["X"], _foldData["Y"], modelName, parameters, metricNames, split)
+
+
+def crossValidateModel(X: pd.DataFrame, Y: pd.DataFrame, modelName: str, parameters: dict, metricNames: list,
+                       splits: list, processes: int = None):
+    """
+    Scores of every split, the folds are fitted concurrently on a process pool
+    """
+    if processes == 1 or (processes is None and len(X) < POOL_MIN_ROWS):
+        scores = []
+        for i, split in enumerate(splits):
+            checkpoint(i / len(splits), "Scoring fold {} of {}".format(i + 1, len(splits)))
+            scores.append(scoreFold(X, Y, modelName, parameters, metricNames, split))
+        return scores
+    workers = processes if processes is not None else min(len(splits), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setFoldData, initargs=(X, Y)) as pool:
+        futures = [pool.submit(_scoreFoldInWorker, modelName, parameters, metricNames, split)
+                   for split in splits]
+        return [future.result() for future in futures]
+
+
+def summarizeFolds(scores: list, metricNames: list):
+    """
+    Mean and standard deviation over folds of every metric
+    """
+    summary = {}
+    for metricName in metricNames:
+        values = np.array([score[metricName] for score in scores])
+        summary[metricName] = {"mean": float(values.mean()),
+                               "std": float(values.std(ddof=1)) if len(values) > 1 else 0.0}
+    return summary
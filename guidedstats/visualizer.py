@@ -16,12 +16,13 @@ from IPython import get_ipython
 from ipywidgets import DOMWidget
 import traitlets as tl
 from traitlets import Int, Unicode, Dict, List, Instance
-from varname.utils import ImproperUseError
 
 from ._frontend import module_name, module_version
+from .utils import encodeBuffers, decodeBuffers
 
 from .step import *
 from .workflow import WorkFlow
+from .executor import StepExecutor
 from .export import *
 from .assumptions import ASSUMPTIONS
 from .transformations import TRANSFORMATIONS
@@ -47,14 +48,17 @@ class GuidedStats(DOMWidget):
     selectedStepInfo = Dict({}).tag(sync=True)
 
     workflow = Instance(WorkFlow)
-    workflowInfo = Dict({}).tag(sync=True)
+    # numpy arrays in workflowInfo (viz payloads) are sent as binary buffers
+    workflowInfo = Dict({}).tag(sync=True, to_json=encodeBuffers, from_json=decodeBuffers)
 
     serial = Unicode("").tag(sync=True)
 
-    def __init__(self, dataset: pd.DataFrame, datasetName: str = "dataset", *args, **kwargs):
+    def __init__(self, dataset: pd.DataFrame, datasetName: str = "dataset", executorMode: str = "thread", *args, **kwargs):
         super(GuidedStats, self).__init__(*args, **kwargs)
 
         self.dataset = dataset
+        # fits, assumption checks and evaluations run off the kernel's event loop, see StepExecutor
+        self.executorMode = executorMode
 
         user_ns = get_ipython().user_ns
         for name, value in user_ns.items():
@@ -66,6 +70,7 @@ class GuidedStats(DOMWidget):
         self.ignore_update = False
 
         self.observe(self.addWorkFlow, names='selectedWorkflow')
+        self.on_msg(self._handle_custom_msg)
 
         self.getBuiltinWorkflow()
         self.getBuiltinSteps()
@@ -81,6 +86,14 @@ class GuidedStats(DOMWidget):
 
         self.exportCode = html_table
 
+    def _handle_custom_msg(self, widget, content, buffers):
+        from ipywidgets.widgets.widget import _put_buffers
+        # patches of workflowInfo made by the frontend, see WidgetWritable in src/stores.ts
+        if content.get("type") == "patch" and content.get("name") == "workflowInfo":
+            if self.workflow is not None:
+                _put_buffers(content, content.get("buffer_paths", []), buffers)
+                self.workflow.applyWorkflowInfoPatches(decodeBuffers(content["patches"]))
+
     def _import(self, name: str, item):
         if name == "dataset":
             # import dataset
@@ -130,15 +143,7 @@ class GuidedStats(DOMWidget):
         # self.exportCode = html_table
 
     def exportReport(self):
-        if self.workflow.current_model is not None:
-            if self.workflow.current_model._results is None:
-                raise ValueError("Model not fitted")
-            if self.workflow.current_model._modelName == "Simple Linear Regression":
-                return exportRegressionReport(self.workflow.current_model._results)
-            elif self.workflow.current_model._modelName == "T Test":
-                return exportTTestReport(self.workflow.current_model._results)
-        else:
-            raise ValueError("No model found")
+        return self.workflow.exportReport()
 
     def exportCurrentModel(self):
         if self.workflow.current_model is not None:
@@ -183,19 +188,30 @@ class GuidedStats(DOMWidget):
         # TBC, dataset stuff should be refined
         workflow = WorkFlow(
             dataset=self.dataset, datasetName=self.datasetName, workflowName=change["new"])
+        workflow.executor = StepExecutor(self.executorMode)
+        if self.trait_has_value("workflow"):
+            self.workflow.executor.shutdown()
         self.workflow = workflow
         self.workflow.outputsStorage[0] = {}
         self.workflow.outputsStorage[0]["workflowVariableName"] = self.workflowVariableName
         self.workflow.observe(self.updateWorkflowInfo, names=["workflowInfo"])
+        self.workflow.observe(self.sendWorkflowPatch, names=["workflowPatch"])
         self.workflow.startGuiding()
 
     def updateWorkflowInfo(self, change):
         self.ignore_update = True
         new_info = self.workflow.workflowInfo
-        if new_info != self.workflowInfo:
+        if new_info is not self.workflowInfo:
             self.workflowInfo = new_info
         self.ignore_update = False
 
+    def sendWorkflowPatch(self, change):
+        from ipywidgets.widgets.widget import _remove_buffers
+        # workflowInfo has been updated in place, only the changed fields are sent
+        content, buffer_paths, buffers = _remove_buffers(encodeBuffers(change["new"]))
+        self.send({"type": "patch", "name": "workflowInfo", "buffer_paths": buffer_paths, **content},
+                  buffers=buffers)
+
     @tl.observe("workflowInfo")
     def onObserveWorkflowInfo(self, change):
         if self.ignore_update:
@@ -210,4 +226,5 @@ class GuidedStats(DOMWidget):
 
     @current_dataframe.setter
     def current_dataframe(self, df):
+        from varname.utils import ImproperUseError
         raise ImproperUseError("current_dataframe is read-only")
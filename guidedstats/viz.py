@@ -1,5 +1,127 @@
 import pandas as pd
-import random
+
+from .utils import iqrBounds, tailValues
+
+# default number of points sent for point-based viz, the points are sent as binary columns
+MAX_POINTS = 10000
+# with more rows than MAX_POINTS, point-based viz are aggregated into bins instead of sampled
+DENSITY_BINS = 200
+SCATTER_BINS = 64
+
+
+def shouldAggregate(n: int, **kwargs):
+    aggregate = kwargs.get("aggregate", None)
+    if aggregate is None:
+        return n > kwargs.get("max_point", MAX_POINTS)
+    return bool(aggregate)
+
+
+def binIndices(values, lower: float, upper: float, bins: int):
+    """
+    Index of the equal-width bin of each value, O(n) unlike np.histogram with searchsorted
+    """
+    import numpy as np
+    width = (upper - lower) / bins if upper > lower else 1.0
+    idx = ((values - lower) / width).astype(np.int64)
+    return np.clip(idx, 0, bins - 1), width
+
+
+def binnedKDE(X, bins: int = DENSITY_BINS):
+    """
+    Gaussian KDE evaluated on a grid of bins, the data are binned once and the
+    binned counts are convolved with the kernel, so the cost is O(n + bins^2)
+    """
+    import numpy as np
+    X = X[np.isfinite(X)]
+    n = len(X)
+    if n == 0:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    mean, std = X.mean(), X.std(ddof=1)
+    q1, q3 = np.percentile(X, [25, 75])
+    # Silverman's rule of thumb
+    spread = min(std, (q3 - q1) / 1.34) if q3 > q1 else std
+    bandwidth = 0.9 * spread * n ** -0.2 if spread > 0 else 1.0
+    lower, upper = X.min() - 3 * bandwidth, X.max() + 3 * bandwidth
+
+    idx, width = binIndices(X, lower, upper, bins)
+    counts = np.bincount(idx, minlength=bins)
+    grid = lower + (np.arange(bins) + 0.5) * width
+    half = int(np.ceil(4 * bandwidth / width))
+    kernel = np.exp(-0.5 * (np.arange(-half, half + 1) * width / bandwidth) ** 2)
+    density = np.convolve(counts, kernel, mode="full")[half:half + bins] / \
+        (n * bandwidth * np.sqrt(2 * np.pi))
+    normal = np.exp(-0.5 * ((grid - mean) / std) ** 2) / (std * np.sqrt(2 * np.pi)) \
+        if std > 0 else np.zeros(bins)
+    return grid, density, normal
+
+
+def binned2D(x, y, bins: int = SCATTER_BINS):
+    """
+    Centers and counts of the non-empty cells of a bins x bins grid over (x, y)
+    """
+    import numpy as np
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if len(x) == 0:
+        return x, y, np.zeros(0)
+    ix, xWidth = binIndices(x, x.min(), x.max(), bins)
+    iy, yWidth = binIndices(y, y.min(), y.max(), bins)
+    counts = np.bincount(ix * bins + iy, minlength=bins * bins)
+    cells = np.flatnonzero(counts)
+    xCenters = x.min() + (cells // bins + 0.5) * xWidth
+    yCenters = y.min() + (cells % bins + 0.5) * yWidth
+    return xCenters, yCenters, counts[cells]
+
+
+def boxStats(X):
+    """
+    Quartiles and 1.5 IQR whiskers of X, as drawn by a boxplot
+    """
+    import numpy as np
+    X = X[np.isfinite(X)]
+    q1, median, q3 = np.percentile(X, [25, 50, 75])
+    iqr = q3 - q1
+    lower = X[X >= q1 - 1.5 * iqr].min()
+    upper = X[X <= q3 + 1.5 * iqr].max()
+    return lower, q1, median, q3, upper
+
+
+def columnarVizStats(**columns):
+    """
+    Columnar viz payload: numeric columns become float32 arrays, other columns are
+    dictionary-encoded into integer codes and their categories
+    """
+    import numpy as np
+    stats = {}
+    length = 0
+    for name, values in columns.items():
+        values = np.asarray(values).reshape(-1)
+        length = len(values)
+        if values.dtype.kind in "biuf":
+            stats[name] = values.astype(np.float32)
+        else:
+            codes, categories = pd.factorize(values.astype(str))
+            dtype = np.uint8 if len(categories) <= 256 else np.uint32
+            stats[name] = {"codes": codes.astype(dtype), "categories": categories.tolist()}
+    return {"columns": stats, "length": length}
+
+
+def concatVizStats(*vizStats):
+    """
+    Concatenate columnar viz payloads with the same columns
+    """
+    import numpy as np
+    columns = {}
+    for name, column in vizStats[0]["columns"].items():
+        if isinstance(column, dict):
+            columns[name] = np.concatenate([np.asarray(stats["columns"][name]["categories"], dtype=object)[
+                stats["columns"][name]["codes"]] for stats in vizStats])
+        else:
+            columns[name] = np.concatenate([stats["columns"][name] for stats in vizStats])
+    stats = columnarVizStats(**columns)
+    if "aggregate" in vizStats[0]:
+        stats["aggregate"] = vizStats[0]["aggregate"]
+    return stats
 
 
 def boxplotVizStats(X: pd.Series, *args, **kwargs):
@@ -8,29 +130,23 @@ def boxplotVizStats(X: pd.Series, *args, **kwargs):
         X = X.iloc[:, 0]
     max_outlier = kwargs.get("max_outlier", 50)
     previousX = kwargs.get("previousX", None)
-    if previousX is not None:
-        q1 = np.quantile(previousX, 0.25)
-        median = np.median(previousX)
-        q3 = np.quantile(previousX, 0.75)
-        iqr = q3 - q1
-    else:
-        q1 = np.quantile(X, 0.25)
-        median = np.median(X)
-        q3 = np.quantile(X, 0.75)
-        iqr = q3 - q1
-
-    lower_bound = q1 - 1.5 * iqr
-    upper_bound = q3 + 1.5 * iqr
-    upper_outliers = sorted([float(x)
-                            for x in X if float(x) > upper_bound], reverse=True)
-    lower_outliers = sorted(
-        [float(x) for x in X if float(x) < lower_bound], reverse=False)
-
-    outliers = []
-    for i in range(min(len(upper_outliers), max_outlier)):
-        outliers.append(upper_outliers[i])
-    for i in range(min(len(lower_outliers), max_outlier)):
-        outliers.append(lower_outliers[i])
+    profile = kwargs.get("profile", None)
+    # quantiles already computed by the outlier metric
+    quantiles = kwargs.get("quantiles", None)
+    if quantiles is None and profile is not None:
+        quantiles = profile.getQuantiles(previousX if previousX is not None else X)
+    if quantiles is None:
+        from .sketch import columnQuantiles
+        reference = previousX if previousX is not None else X
+        quantiles = columnQuantiles(reference, [0.25, 0.5, 0.75], kwargs.get("quantileError", None))
+    q1, median, q3 = quantiles
+
+    lower_bound, upper_bound = iqrBounds(q1, q3)
+    values = X.to_numpy(dtype=float)
+    # only the max_outlier most extreme values of each side are drawn
+    upper_outliers = tailValues(values[values > upper_bound], max_outlier, largest=True)
+    lower_outliers = tailValues(values[values < lower_bound], max_outlier, largest=False)
+    outliers = np.concatenate([upper_outliers, lower_outliers]).tolist()
 
     stats = {
         "name": X.name,
@@ -59,22 +175,83 @@ def multiBoxplotVizStats(*args, **kwargs):
     return stats
 
 
+def sampleResiduals(Y_hat, Y_true, size: int, rng, extremes: int = 0):
+    """
+    Positions of size rows drawn at random, the extremes rows with the largest absolute
+    residuals are always kept. Without extremes only the drawn rows' residuals are computed
+    """
+    import numpy as np
+    n = len(Y_hat)
+    if size >= n:
+        return np.arange(n)
+    extremes = min(extremes, size)
+    if extremes <= 0:
+        return np.sort(rng.choice(n, size, replace=False))
+    magnitude = np.abs(Y_hat - Y_true)
+    # nan residuals sort last, so they are never kept as extremes
+    top = np.argpartition(np.where(np.isnan(magnitude), -np.inf, -magnitude), extremes - 1)[:extremes]
+    rest = np.ones(n, dtype=bool)
+    rest[top] = False
+    drawn = rng.choice(np.flatnonzero(rest), size - extremes, replace=False)
+    return np.sort(np.concatenate([top, drawn]))
+
+
 def residVizStats(Y_hat, Y_true, **kwargs):
-    max_point = kwargs.get("max_point", 100)
+    import numpy as np
+    max_point = kwargs.get("max_point", MAX_POINTS)
     group = kwargs.get("group", "group")
-    resid = Y_hat - Y_true
-    vizStats = []
-    for i in range(len(Y_hat)):
-        vizStats.append({"x": Y_hat[i], "y": resid[i], "group": group})
-    sample = random.sample(vizStats, min(max_point, len(vizStats)))
-    return sample
+    Y_hat = np.asarray(Y_hat).reshape(-1)
+    Y_true = np.asarray(Y_true).reshape(-1)
+    if shouldAggregate(len(Y_hat), **kwargs):
+        Y_hat = Y_hat.astype(float, copy=False)
+        x, y, count = binned2D(Y_hat, Y_hat - Y_true, kwargs.get("bins", SCATTER_BINS))
+        stats = columnarVizStats(x=x, y=y, count=count, group=np.repeat(group, len(count)))
+        stats["aggregate"] = "bins2d"
+        return stats
+    rng = kwargs.get("rng", None)
+    if rng is None:
+        rng = np.random.default_rng(kwargs.get("seed", 0))
+    sample_index = sampleResiduals(Y_hat, Y_true, max_point, rng, kwargs.get("extremes", 0))
+    Y_hat = Y_hat[sample_index].astype(float)
+    return columnarVizStats(x=Y_hat, y=Y_hat - Y_true[sample_index],
+                            group=np.repeat(group, len(sample_index)))
+
+
+def residGroupsVizStats(predictions: dict, **kwargs):
+    """
+    Residual viz of several groups, predictions maps every group to its (Y_true, Y_hat).
+    With stratify, max_point is shared by the groups in proportion to their sizes,
+    otherwise every group gets max_point
+    """
+    import numpy as np
+    max_point = kwargs.pop("max_point", MAX_POINTS)
+    sizes = np.array([len(Y_true) for Y_true, _ in predictions.values()])
+    # all groups are either binned or sampled, so that their payloads can be concatenated
+    aggregate = kwargs.pop("aggregate", None)
+    if aggregate is None:
+        aggregate = shouldAggregate(int(sizes.max(initial=0)), max_point=max_point)
+    quotas = np.minimum(sizes, max_point)
+    if kwargs.pop("stratify", False) and sizes.sum() > max_point:
+        shares = sizes * max_point / sizes.sum()
+        quotas = np.floor(shares).astype(int)
+        # the points left by rounding down go to the largest remainders
+        quotas[np.argsort(quotas - shares)[:max_point - quotas.sum()]] += 1
+    rng = np.random.default_rng(kwargs.pop("seed", 0))
+    stats = [residVizStats(Y_hat, Y_true, group=group, aggregate=aggregate, max_point=int(quota), rng=rng, **kwargs)
+             for (group, (Y_true, Y_hat)), quota in zip(predictions.items(), quotas)]
+    return concatVizStats(*stats)
 
 
 def heapmapVizStats(X, df: pd.DataFrame, **kwargs):
     max_point = kwargs.get("max_point", 150)
 
     # generate a heatmap of correlation matrix
-    matrix = df.corr(numeric_only=True)
+    matrix = kwargs.get("corr", None)
+    profile = kwargs.get("profile", None)
+    if matrix is None and profile is not None:
+        matrix = profile.getCorrelation(df)
+    if matrix is None:
+        matrix = df.corr(numeric_only=True)
     stats = []
     for i, var1 in enumerate(matrix.index):
         for j in range(len(matrix.columns)):
@@ -85,60 +262,90 @@ def heapmapVizStats(X, df: pd.DataFrame, **kwargs):
 
 def densityVizStats(X, **kwargs):
     import numpy as np
-    max_point = kwargs.get("max_point", 150)
+    max_point = kwargs.get("max_point", MAX_POINTS)
 
-    stats = []
-    X = np.array(X).reshape(-1).tolist()
+    X = np.asarray(X, dtype=float).reshape(-1)
+    # an all-NaN column gives an empty payload
+    X = X[np.isfinite(X)]
+    if shouldAggregate(len(X), **kwargs):
+        grid, density, normal = binnedKDE(X, kwargs.get("bins", DENSITY_BINS))
+        stats = columnarVizStats(value=grid, density=density, normal=normal)
+        stats["aggregate"] = "kde"
+        return stats
     # randomly sample min(max_point,len(X)) points
     sample_num = min(max_point, len(X))
     sample_index = np.random.choice(len(X), sample_num, replace=False)
-    for i in sample_index:
-        stats.append({"value": X[i]})
-    del X
-    return stats
+    return columnarVizStats(value=X[sample_index])
 
 
 def tTestVizStats(Y1, Y2, **kwargs):
     import numpy as np
-    max_point = kwargs.get("max_point", 150)
+    max_point = kwargs.get("max_point", MAX_POINTS)
     group_label = kwargs.get("groups", ["group1", "group2"])
 
-    stats = []
-    Y1 = np.array(Y1).reshape(-1).tolist()
-    Y2 = np.array(Y2).reshape(-1).tolist()
+    Y1 = np.asarray(Y1, dtype=float).reshape(-1)
+    Y2 = np.asarray(Y2, dtype=float).reshape(-1)
+    if shouldAggregate(max(len(Y1), len(Y2)), **kwargs):
+        boxes = np.array([boxStats(Y1), boxStats(Y2)])
+        stats = columnarVizStats(group=np.array([str(group_label[0]), str(group_label[1])]),
+                                 lower=boxes[:, 0], q1=boxes[:, 1], median=boxes[:, 2],
+                                 q3=boxes[:, 3], upper=boxes[:, 4])
+        stats["aggregate"] = "boxplot"
+        return stats
     # randomly sample min(max_point,len(X)) points
-    sample_num = min(max_point, len(Y1))
-    sample_index = np.random.choice(len(Y1), sample_num, replace=False)
-    for i in sample_index:
-        stats.append({"group": group_label[0], "value": Y1[i]})
-    sample_num = min(max_point, len(Y2))
-    sample_index = np.random.choice(len(Y2), sample_num, replace=False)
-    for i in sample_index:
-        stats.append({"group": group_label[1], "value": Y2[i]})
-    del Y1, Y2
-    return stats
+    sample_index1 = np.random.choice(len(Y1), min(max_point, len(Y1)), replace=False)
+    sample_index2 = np.random.choice(len(Y2), min(max_point, len(Y2)), replace=False)
+    values = np.concatenate([Y1[sample_index1], Y2[sample_index2]])
+    groups = np.concatenate([np.repeat(str(group_label[0]), len(sample_index1)),
+                             np.repeat(str(group_label[1]), len(sample_index2))])
+    return columnarVizStats(group=groups, value=values)
 
 
 def linearVizStats(X, Y, **kwargs):
     import numpy as np
-    X = np.array(X).reshape(-1).tolist()
-    Y = np.array(Y).reshape(-1).tolist()
+    X = np.asarray(X, dtype=float).reshape(-1)
+    Y = np.asarray(Y, dtype=float).reshape(-1)
     assert len(X) == len(Y)
-    max_point = kwargs.get("max_point", 150)
+    max_point = kwargs.get("max_point", MAX_POINTS)
+    if shouldAggregate(len(X), **kwargs):
+        x, y, count = binned2D(X, Y, kwargs.get("bins", SCATTER_BINS))
+        stats = columnarVizStats(x=x, y=y, count=count)
+        stats["aggregate"] = "bins2d"
+        # the regression line is fitted on all rows, not on the bins
+        finite = np.isfinite(X) & np.isfinite(Y)
+        slope, intercept = np.polyfit(X[finite], Y[finite], 1)
+        rSquared = np.corrcoef(X[finite], Y[finite])[0, 1] ** 2
+        stats["fit"] = {"slope": float(slope), "intercept": float(intercept), "rSquared": float(rSquared)}
+        return stats
     sample_num = min(max_point, len(X))
     sample_index = np.random.choice(len(X), sample_num, replace=False)
-    stats = []
-    for i in sample_index:
-        stats.append({"x": X[i], "y": Y[i]})
-    del X, Y
+    return columnarVizStats(x=X[sample_index], y=Y[sample_index])
+
+def regularizationPathVizStats(alphas, coefficients, names, cvMSE, cvSE, bestAlpha=None, *args, **kwargs):
+    """
+    CV curve (alpha, cvMSE, cvSE) and coefficient path (alpha, name, coefficient) of an alpha search
+    """
+    import numpy as np
+    alphas = np.asarray(alphas)
+    coefficients = np.asarray(coefficients)
+    stats = {
+        "curve": columnarVizStats(alpha=alphas, cvMSE=cvMSE, cvSE=cvSE),
+        "path": columnarVizStats(alpha=np.repeat(alphas, len(names)),
+                                 name=np.tile(np.asarray(names, dtype=object), len(alphas)),
+                                 coefficient=coefficients.reshape(-1)),
+        "bestAlpha": bestAlpha,
+    }
     return stats
 
+
 VIZ = {
     "boxplot": boxplotVizStats,
     "multiBoxplot": multiBoxplotVizStats,
     "density": densityVizStats,
     "heatmap": heapmapVizStats,
     "residual": residVizStats,
+    "residualGroups": residGroupsVizStats,
     "ttest": tTestVizStats,
-    "regression": linearVizStats
+    "regression": linearVizStats,
+    "regularizationPath": regularizationPathVizStats,
 }
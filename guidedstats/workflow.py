@@ -1,6 +1,5 @@
-from ipylab import JupyterFrontEnd
-
 from collections import OrderedDict
+import contextlib
 from typing import Iterable
 import pandas as pd
 import traitlets as tl
@@ -8,10 +7,20 @@ import copy as copy
 import json
 
 from .step import *
-from .utils import getLatestValue
+from .utils import getLatestValue, jsonCopy
+from .lineage import DatasetView, MemoryIndex, ownedBytes
+from .cache import RESULT_CACHE, sameContent
+from .graph import StepGraph
+from .executor import StepExecutor
+from .tracing import StepProfiler, traced
+from .source import ChunkedFrame, SAMPLE_ROWS
 from .action import ACTIONS
 from .config import _regressionConfig, _ttestConfig
 
+WORKFLOW_INFO_FIELDS = ["workflowName", "currentStepId", "message", "report", "action", "presets"]
+STEP_INFO_FIELDS = ["stepId", "stepName", "stepType", "stepExplanation", "suggestions", "done", "isProceeding",
+                    "toExecute", "isShown", "config", "previousConfig", "groupConfig", "message", "progress"]
+
 
 class WorkFlow(tl.HasTraits):
     workflowName = tl.Unicode()
@@ -22,11 +31,21 @@ class WorkFlow(tl.HasTraits):
     presets = tl.List([]).tag(sync=True)
     _steps = tl.List(trait=tl.Instance(Step)).tag(sync=True)
     workflowInfo = tl.Dict({}).tag(sync=True)
+    # latest change of workflowInfo, {"patches": [{"path": [...], "revision": int, "fields": {...}}]}
+    workflowPatch = tl.Dict({})
 
-    def __init__(self, dataset: pd.DataFrame, workflowName="workflow", datasetName="dataset"):
+    def __init__(self, dataset: pd.DataFrame | ChunkedFrame, workflowName="workflow", datasetName="dataset"):
 
         self.workflowName = workflowName
-        self.dataset = copy.deepcopy(dataset)
+        # a chunked source is explored through an in-memory sample, models are fitted and evaluated on all its rows
+        self.source = None
+        if isinstance(dataset, ChunkedFrame):
+            self.source = dataset
+            dataset = dataset.sample(SAMPLE_ROWS)
+        # rank error of the sketched quantiles of outlier checks and transformations, None computes them exactly
+        self.quantileError = None
+        # the user's frame is never mutated, steps derive copy-on-write views of it
+        self.dataset = dataset.copy(deep=False)
         self.datasetName = datasetName
         self.stepList = []
 
@@ -41,6 +60,13 @@ class WorkFlow(tl.HasTraits):
         # workflow-related state variables
         self.isObservingWorkflowInfo = False
         self.isUpdatingWorkflowInfo = False
+        # incremented on every change of workflowInfo, stored in the revision field of what has changed
+        self.revision = 0
+        # patches are collected while syncDepth > 0 and sent together, see holdSync
+        self.syncDepth = 0
+        self.pendingPatches = []
+        self.pendingFullSync = False
+        self.syncCounts = {"patches": 0, "syncs": 0, "fullSyncs": 0}
 
         # initialize workflowInfo
         self.workflowInfo = {"workflowName": self.workflowName,
@@ -49,18 +75,72 @@ class WorkFlow(tl.HasTraits):
                              "report": "",
                              "action": self.action,
                              "presets": self.presets,
-                             "steps": []}
+                             "steps": [],
+                             "revision": self.revision}
 
         self.outputsStorage = {}
+        # dependency graph of the steps, built by constructSteps, and the steps whose inputs have changed
+        self.graph = None
+        self.dirty = set()
+        # runs the computations of the steps, inline unless a background mode is chosen
+        self.executor = StepExecutor()
+        # records the calls of the steps once enableProfiling is called
+        self.profiler = None
 
-        self.observe(self.updateWorkflowInfo, names=[
-                     "workflowName", "currentStepId","message","report","action","presets"])
+        self.observe(self.updateWorkflowInfo, names=WORKFLOW_INFO_FIELDS)
 
         if self.workflowName == "Linear Regression":
             self.configFile = _regressionConfig
         elif self.workflowName == "T Test":
             self.configFile = _ttestConfig
 
+    @property
+    def profile(self):
+        return self.latestOutput("profile")
+
+    @property
+    def datasetView(self):
+        return self.latestOutput("datasetView")
+
+    def latestOutput(self, key):
+        """
+            The value of key output by the last step that stored it
+        """
+        if self.graph is None:
+            return getLatestValue(self.outputsStorage, key)
+        stepId = self.graph.latest(key)
+        return self.outputsStorage[stepId][key] if stepId is not None else None
+
+    def inputOf(self, step: Step, key):
+        """
+            The value of key output by the closest step before step that stored it
+        """
+        stepId = self.graph.producer(step.stepId, key)
+        return self.outputsStorage[stepId][key] if stepId is not None else None
+
+    def storageFootprint(self):
+        """
+            Bytes each outputsStorage entry owns, buffers shared with earlier entries are not counted
+        """
+        seen = MemoryIndex()
+        footprint = {}
+        for stepId in sorted(self.outputsStorage.keys()):
+            footprint[stepId] = {}
+            for key, value in self.outputsStorage[stepId].items():
+                if isinstance(value, DatasetView):
+                    value = value.frame
+                footprint[stepId][key] = ownedBytes(value, seen)
+                seen.add(value)
+        return footprint
+
+    def invalidateProfile(self, columns: list = None):
+        """
+            Drop profiled statistics of columns changed by a transformation
+        """
+        profile = self.profile
+        if profile is not None:
+            profile.invalidate(columns)
+
     @property
     def steps(self):
         return self._steps
@@ -69,15 +149,13 @@ class WorkFlow(tl.HasTraits):
     def steps(self, value):
         # Unobserve old steps
         for step in self._steps:
-            step.unobserve(self.updateWorkflowInfo, names=["stepId", "stepName", "stepType", "stepExplanation", "suggestions",
-                           "done", "isProceeding", "toExecute", "isShown", "config", "previousConfig", "groupConfig","message"])
+            step.unobserve(self.updateWorkflowInfo, names=STEP_INFO_FIELDS)
         # Set the new steps
         self._steps = value
         # Observe new steps
         for step in self._steps:
             step.workflow = self
-            step.observe(self.updateWorkflowInfo, names=["stepId", "stepName", "stepType", "stepExplanation", "suggestions",
-                         "done", "isProceeding", "toExecute", "isShown", "config", "previousConfig", "groupConfig","message"])
+            step.observe(self.updateWorkflowInfo, names=STEP_INFO_FIELDS)
 
     def loadData(self):
         """
@@ -117,35 +195,73 @@ class WorkFlow(tl.HasTraits):
                 code += step.export(export_viz_func = export_viz_func, **kwargs)
             return code    
     
+    def exportReport(self):
+        if self.current_model is not None:
+            if self.current_model._results is None:
+                raise ValueError("Model not fitted")
+            if self.current_model._modelName == "Simple Linear Regression":
+                return exportRegressionReport(self.current_model._results)
+            elif self.current_model._modelName == "T Test":
+                return exportTTestReport(self.current_model._results)
+        else:
+            raise ValueError("No model found")
+
+    def storeOutputs(self, step: Step):
+        """
+            Store step.outputs, return the keys whose content has changed
+        """
+        stored = self.outputsStorage.setdefault(step.stepId, {})
+        changed = []
+        for key, value in step.outputs.items():
+            previous = stored.get(key, None)
+            if isinstance(previous, DatasetView) and isinstance(value, DatasetView):
+                previous, value = previous.frame, value.frame
+            if key not in stored or not sameContent(previous, value):
+                changed.append(key)
+        stored.update(step.outputs)
+        if self.graph is not None:
+            self.graph.record(step.stepId, stored.keys())
+        return changed
+
+    @traced("moveToNextStep", step=lambda step: step)
     def moveToNextStep(self, step: Step):
         # if done, store the current outputs and move to the next step
-        # update self.outputsStorage[step.stepId] with step.outputs
-        if step.stepId not in self.outputsStorage:
-            self.outputsStorage[step.stepId] = {}
-        self.outputsStorage[step.stepId].update(step.outputs)
-        
+        changed = self.storeOutputs(step)
+
         stepIdx = self.stepList.index(step)
 
-        step.isProceeding = False
-        step.toExecute = False
-
-        # if the current step is farther than the next step
-        if self.stepList.index(self.currentStep) > stepIdx+1:
-            next_step = self.stepList[stepIdx+1]
-            self.callStepForward(next_step)
-            next_step.rerun()
-            # reconstruct the steps after the current step
-            # for i in range(stepIdx+1, len(self.stepList)):
-            #     newStep = self.constructStep(self.configFile[i])
-            #     self.stepList[i] = newStep
-            #     self.outputsStorage[self.stepList[i].stepId] = {}
-            # self.steps = self.stepList
-        else:         
+        with step.transaction():
+            step.isProceeding = False
+            step.toExecute = False
+
+        if stepIdx < self.stepList.index(self.currentStep):
+            # an upstream step was executed again, only the steps reading its changed outputs are recomputed
+            self.dirty.discard(step.stepId)
+            self.dirty.update(self.graph.consumers(step.stepId, changed))
+            self.runDirtySteps()
+        else:
             self.currentStep = self.stepList[stepIdx+1]
             self.currentStep.isProceeding = True
             self.callStepForward(self.currentStep)
 
+    def runDirtySteps(self):
+        """
+            Recompute the first dirty step before the current step, its moveToNextStep schedules the next one.
+            The current step is forwarded again once every step before it is clean
+        """
+        currentIdx = self.stepList.index(self.currentStep)
+        for step in self.stepList[:currentIdx]:
+            if step.stepId in self.dirty:
+                self.callStepForward(step)
+                step.rerun()
+                return
+        if self.currentStep.stepId in self.dirty:
+            self.dirty.discard(self.currentStep.stepId)
+            self.callStepForward(self.currentStep)
+
     def callStepForward(self, step: Step):
+        # the inputs of step are replaced, what it is computing from the old ones is discarded
+        self.executor.cancel(step)
         if step.succeedPreviousStepOutput:
             # let step itself get its parameters from previous steps
             currentIdx = self.stepList.index(step)
@@ -153,20 +269,11 @@ class WorkFlow(tl.HasTraits):
             step.forward(**parameters)
         else:
             parameters = OrderedDict()
-
-            stepIdx = self.stepList.index(step)
-
-            # get parameters from previous steps
+            # get parameters from the closest previous steps outputting them
             for pconfig in step.previousSteps:
-                # format: [string, string]
-                found = False
-                currentIdx = stepIdx - 1
-                while not found and currentIdx >= 0:
-                    currentObservingOutputs = self.outputsStorage[currentIdx]
-                    if pconfig in currentObservingOutputs:
-                        found = True
-                        parameters[pconfig] = currentObservingOutputs[pconfig]
-                    currentIdx -= 1
+                stepId = self.graph.producer(step.stepId, pconfig)
+                if stepId is not None:
+                    parameters[pconfig] = self.outputsStorage[stepId][pconfig]
 
             step.forward(**parameters)
             
@@ -202,12 +309,12 @@ class WorkFlow(tl.HasTraits):
                         value = extraStats[argument]
                     else:
                         if 'col' in argument:
-                            columns = getLatestValue(self.outputsStorage, "columns")
+                            columns = self.latestOutput("columns")
                             col = columns[activeTab]
                             arguments_map['col'] = col
                             continue
                         
-                        value = getLatestValue(self.outputsStorage, argument)
+                        value = self.latestOutput(argument)
                     if value is not None:
                         arguments_map[argument] = value
                     else:
@@ -217,6 +324,8 @@ class WorkFlow(tl.HasTraits):
                 text = template.format(**arguments_map)
                 
                 if action["type"] == "code":
+                    # only available in a running JupyterLab, imported here so that headless runs do not need it
+                    from ipylab import JupyterFrontEnd
                     app = JupyterFrontEnd()
                     app.commands.execute('notebook:insert-cell-below')
                     app.commands.execute('notebook:enter-edit-mode')
@@ -244,7 +353,7 @@ class WorkFlow(tl.HasTraits):
                 if search_key in extraStats:
                     value = extraStats[search_key] 
                 else:
-                    value = getLatestValue(self.outputsStorage, search_key)
+                    value = self.latestOutput(search_key)
                 if value is not None:
                     if len(list(filter(lambda x: x["name"] != search_key, presets))) != 0:
                         preset = list(filter(lambda x: x["name"] == search_key, presets))[0]
@@ -256,67 +365,238 @@ class WorkFlow(tl.HasTraits):
                     raise ValueError("Invalid preset")        
                                 
     def updateWorkflowInfo(self, change=None):
+        """
+            Keep workflowInfo up to date with the workflow and its steps.
+            A change of a single trait is applied to workflowInfo in place and published
+            as a patch in workflowPatch, only structural changes rebuild workflowInfo
+        """
+        if change is not None:
+            self.syncTrait(change["owner"], change["name"])
+            return
+
+        if self.syncDepth > 0:
+            # rebuilt once the outermost holdSync exits
+            self.pendingFullSync = True
+            return
+
+        self.revision += 1
         stepInfos = []
         for step in self.steps:
-            stepInfo = {"stepId": step.stepId, "stepName": step.stepName, "stepType": step.stepType, "stepExplanation": step.stepExplanation, "suggestions": step.suggestions, "done": step.done, "isProceeding": step.isProceeding,
-                        "toExecute": step.toExecute, "isShown": step.isShown, "config": step.config, "previousConfig": step.previousConfig, "groupConfig": step.groupConfig, "message": step.message}
+            stepInfo = {name: getattr(step, name) for name in STEP_INFO_FIELDS}
+            stepInfo["revision"] = self.revision
             stepInfos.append(stepInfo)
 
-        info = {"workflowName": self.workflowName,
-                "currentStepId": self.currentStepId,
-                "message": self.message,
-                "report": self.report,
-                "action": self.action,
-                "presets": self.presets,
-                "steps": stepInfos}
+        info = {name: getattr(self, name) for name in WORKFLOW_INFO_FIELDS}
+        info["steps"] = stepInfos
+        info["revision"] = self.revision
 
+        self.syncCounts["fullSyncs"] += 1
+        if self.profiler is not None and self.profiler.enabled:
+            self.profiler.addSyncedBytes(info)
         self.workflowInfo = info
 
+    def syncTrait(self, owner, name):
+        """
+            Sync the trait name of owner (the workflow or one of its steps) to the frontend
+        """
+        patch = self.patchWorkflowInfo(owner, name)
+        if patch is None:
+            self.updateWorkflowInfo(None)
+            return
+        self.syncCounts["patches"] += 1
+        if self.syncDepth > 0:
+            self.pendingPatches.append(patch)
+        else:
+            self.publishPatches([patch])
+
+    def publishPatches(self, patches: list):
+        # patches of the same path are merged, the latest value of a field wins
+        merged = OrderedDict()
+        for patch in patches:
+            key = tuple(patch["path"])
+            if key in merged:
+                merged[key]["fields"].update(patch["fields"])
+                merged[key]["revision"] = patch["revision"]
+            else:
+                merged[key] = {"path": patch["path"], "revision": patch["revision"],
+                               "fields": dict(patch["fields"])}
+        self.syncCounts["syncs"] += 1
+        patch = {"patches": list(merged.values())}
+        if self.profiler is not None and self.profiler.enabled:
+            self.profiler.addSyncedBytes(patch)
+        self.workflowPatch = patch
+
+    @contextlib.contextmanager
+    def holdSync(self):
+        """
+            Collect the workflowInfo patches made inside into a single frontend sync
+        """
+        self.syncDepth += 1
+        try:
+            yield
+        finally:
+            self.syncDepth -= 1
+            if self.syncDepth == 0:
+                patches, self.pendingPatches = self.pendingPatches, []
+                if self.pendingFullSync:
+                    self.pendingFullSync = False
+                    self.updateWorkflowInfo(None)
+                elif len(patches) > 0:
+                    self.publishPatches(patches)
+
+    def enableProfiling(self, trace: str = None, memory: bool = True, labels: dict = None):
+        """
+            Record the wall and CPU time, peak allocation, input size and synced bytes of every
+            forward, onObserveConfig, onObserveToExecute and moveToNextStep of the steps,
+            appended to the JSON-lines file trace if given. labels are added to every record. See profileSteps
+        """
+        self.disableProfiling()
+        labels = {"workflowName": self.workflowName, "datasetName": self.datasetName, **(labels or {})}
+        self.profiler = StepProfiler(trace, memory, labels=labels)
+        self.profiler.enable()
+        return self.profiler
+
+    def disableProfiling(self):
+        # the records are kept until profiling is enabled again
+        if self.profiler is not None:
+            self.profiler.disable()
+
+    def profileSteps(self):
+        """
+            DataFrame of the calls recorded since enableProfiling, one row per call in the order they were made.
+            parent is the id of the call a call was made in, whose times include those of the calls it made
+        """
+        if self.profiler is None:
+            raise ValueError("Profiling is not enabled, call enableProfiling first")
+        return self.profiler.summary()
+
+    def notificationStats(self):
+        """
+            Counters of the trait notifications and frontend syncs saved by transactions and holdSync
+        """
+        stats = {"changes": 0, "notifications": 0, "observerCallsSaved": 0}
+        for step in self.steps:
+            for key in stats:
+                stats[key] += step.notificationCounts[key]
+        stats.update(self.syncCounts)
+        stats["syncsSaved"] = self.syncCounts["patches"] - self.syncCounts["syncs"]
+        return stats
+
+    def cacheStats(self):
+        """
+            Hit/miss counters and memory use of the metric and assumption result cache
+        """
+        return RESULT_CACHE.stats()
+
+    def quantileOptions(self):
+        """
+            Keyword arguments of the quantile-based assumption checks and transformations
+        """
+        return {} if self.quantileError is None else {"quantileError": self.quantileError}
+
+    def patchWorkflowInfo(self, owner, name):
+        """
+            Apply the current value of the trait name of owner to workflowInfo in place,
+            return the patch or None if workflowInfo no longer matches the steps
+        """
+        stepInfos = self.workflowInfo.get("steps", [])
+        if len(stepInfos) != len(self.steps):
+            return None
+        if owner is self:
+            path = []
+            target = self.workflowInfo
+        else:
+            idx = next((i for i, step in enumerate(self.steps) if step is owner), None)
+            if idx is None:
+                return None
+            path = ["steps", idx]
+            target = stepInfos[idx]
+
+        self.revision += 1
+        value = getattr(owner, name)
+        target[name] = value
+        target["revision"] = self.revision
+        return {"path": path, "revision": self.revision, "fields": {name: value}}
+
+    def applyWorkflowInfoPatches(self, patches: list):
+        """
+            Apply patches sent by the frontend to workflowInfo in place, then update the workflow
+            the same way as when the whole workflowInfo is replaced
+        """
+        for patch in patches:
+            # nested values are copied before being patched, they may be the traits of a step
+            target = self.workflowInfo
+            for key in patch["path"]:
+                child = copy.copy(target[key])
+                target[key] = child
+                target = child
+            target.update(patch["fields"])
+        with self.holdSync():
+            self.applyWorkflowInfo(self.workflowInfo)
+
     @tl.observe("workflowInfo")
     def onObserveWorkflowInfo(self, change):
-        if change["old"] != change["new"]:
-            workflowInfo = change["new"]
-            if self.workflowName != workflowInfo["workflowName"]:
-                self.workflowName = workflowInfo["workflowName"]
-                self.isObservingWorkflowInfo = False
-                return
-            if self.currentStepId != workflowInfo["currentStepId"]:
-                self.currentStepId = workflowInfo["currentStepId"]
-                self.isObservingWorkflowInfo = False
-                return
-            if self.message != workflowInfo["message"]:
-                self.message = workflowInfo["message"]
-                self.isObservingWorkflowInfo = False
-                return
-            if self.report != workflowInfo["report"]:
-                self.report = workflowInfo["report"]
-                self.isObservingWorkflowInfo = False
-                return
-            if self.action != workflowInfo["action"]:
-                self.action = workflowInfo["action"]
-                self.isObservingWorkflowInfo = False
-                return
+        # viz holds numpy arrays, so the dicts are not compared by value
+        if change["old"] is not change["new"]:
+            # everything the change triggers reaches the frontend in one sync
+            with self.holdSync():
+                self.applyWorkflowInfo(change["new"])
 
-            for idx, stepInfo in enumerate(workflowInfo["steps"]):
-                step = self.steps[idx]
-                if step.isShown != stepInfo["isShown"]:
-                    step.isShown = stepInfo["isShown"]
-                    break
-                if step.done != stepInfo["done"]:
-                    step.done = stepInfo["done"]
-                    break
-                if step.toExecute != stepInfo["toExecute"]:
-                    step.toExecute = stepInfo["toExecute"]
-                    break
-                configs = json.loads(json.dumps(stepInfo["config"]))
-                if step.config != configs:
-                    step.config = configs
-                    break
-                if step.message != stepInfo["message"]:
-                    step.message = stepInfo["message"]
-                    break
+    def applyWorkflowInfo(self, workflowInfo: dict):
+        """
+            Apply the first difference between workflowInfo and the workflow
+        """
+        if self.workflowName != workflowInfo["workflowName"]:
+            self.workflowName = workflowInfo["workflowName"]
+            self.isObservingWorkflowInfo = False
+            return
+        if self.currentStepId != workflowInfo["currentStepId"]:
+            self.currentStepId = workflowInfo["currentStepId"]
+            self.isObservingWorkflowInfo = False
+            return
+        if self.message != workflowInfo["message"]:
+            self.message = workflowInfo["message"]
+            self.isObservingWorkflowInfo = False
+            return
+        if self.report != workflowInfo["report"]:
+            self.report = workflowInfo["report"]
+            self.isObservingWorkflowInfo = False
+            return
+        if self.action != workflowInfo["action"]:
+            self.action = workflowInfo["action"]
+            self.isObservingWorkflowInfo = False
+            return
+
+        for idx, stepInfo in enumerate(workflowInfo["steps"]):
+            step = self.steps[idx]
+            if step.isShown != stepInfo["isShown"]:
+                step.isShown = stepInfo["isShown"]
+                break
+            if step.done != stepInfo["done"]:
+                step.done = stepInfo["done"]
+                break
+            if step.toExecute != stepInfo["toExecute"]:
+                step.toExecute = stepInfo["toExecute"]
+                break
+            # viz is owned by the backend, what the frontend sends back is ignored
+            configs = jsonCopy({key: value for key, value in stepInfo["config"].items() if key != "viz"})
+            if {key: value for key, value in step.config.items() if key != "viz"} != configs:
+                if "viz" in step.config:
+                    configs["viz"] = step.config["viz"]
+                step.config = configs
+                break
+            if step.message != stepInfo["message"]:
+                step.message = stepInfo["message"]
+                break
+            if stepInfo.get("progress", {}).get("cancelRequested", False) and self.executor.isRunning(step):
+                self.executor.cancel(step)
+                break
         
-    def importDataset(self, data: pd.DataFrame):
+    def importDataset(self, data: pd.DataFrame | ChunkedFrame):
+        self.source = None
+        if isinstance(data, ChunkedFrame):
+            self.source = data
+            data = data.sample(SAMPLE_ROWS)
         self.dataset = data
         self.current_dataframe = data
         loadStep = self.steps[0]
@@ -341,6 +621,8 @@ class WorkFlow(tl.HasTraits):
         for stepInfo in self.configFile:
             step = self.constructStep(stepInfo)
             self.stepList.append(step)
+        self.graph = StepGraph(self.stepList)
+        self.dirty = set()
 
     def startGuiding(self):
         self.constructSteps()
@@ -54,10 +54,13 @@ setup_args = dict(
     license_file="LICENSE",
     long_description=long_description,
     long_description_content_type="text/markdown",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=["benchmarks", "benchmarks.*"]),
     install_requires=install_requires,
     zip_safe=False,
     include_package_data=True,
+    entry_points={
+        "console_scripts": ["guidedstats-run = guidedstats.runner:main"],
+    },
     python_requires=">=3.7",
     platforms="Linux, Mac OS X, Windows",
     keywords=["Jupyter", "JupyterLab", "JupyterLab3"],
@@ -1,6 +1,82 @@
 import type { Visualization } from '../../../interface/interfaces';
 import _ from 'lodash';
 
+const TYPED_ARRAYS: { [dtype: string]: any } = {
+    float32: Float32Array,
+    float64: Float64Array,
+    uint8: Uint8Array,
+    uint16: Uint16Array,
+    uint32: Uint32Array,
+    int8: Int8Array,
+    int16: Int16Array,
+    int32: Int32Array
+};
+
+// {dtype, shape, buffer} sent by the backend as a binary buffer, see encodeBuffers
+function decodeArray(array: any): ArrayLike<number> {
+    const view: DataView = array.buffer;
+    // copy the bytes, typed arrays need an offset aligned to their element size
+    const buffer = view.buffer.slice(
+        view.byteOffset,
+        view.byteOffset + view.byteLength
+    );
+    return new TYPED_ARRAYS[array.dtype](buffer);
+}
+
+function decodeColumn(column: any): ArrayLike<any> {
+    if (column.categories !== undefined) {
+        // dictionary-encoded column
+        return Array.from(
+            decodeArray(column.codes),
+            (code: number) => column.categories[code]
+        );
+    }
+    return decodeArray(column);
+}
+
+const decodedVizStats = new WeakMap<object, any[]>();
+
+// rows of a viz payload, columnar payloads are decoded once and cached
+export function getVizValues(viz: Visualization): any[] {
+    const stats: any = viz.vizStats;
+    if (!stats || Array.isArray(stats) || stats.columns === undefined) {
+        return stats;
+    }
+    if (decodedVizStats.has(stats)) {
+        return decodedVizStats.get(stats);
+    }
+    const columns = Object.keys(stats.columns).map((name: string) => [
+        name,
+        decodeColumn(stats.columns[name])
+    ]);
+    const rows = new Array(stats.length);
+    for (let i = 0; i < stats.length; i++) {
+        const row: any = {};
+        for (const [name, values] of columns) {
+            row[name as string] = (values as ArrayLike<any>)[i];
+        }
+        rows[i] = row;
+    }
+    decodedVizStats.set(stats, rows);
+    return rows;
+}
+
+// kind of server-side aggregation of the payload ('kde', 'bins2d', 'boxplot'), undefined for raw points
+function getAggregate(viz: Visualization): string | undefined {
+    const stats: any = viz.vizStats;
+    return stats && !Array.isArray(stats) ? stats.aggregate : undefined;
+}
+
+// binned scatter points are sized by the number of rows in their bin
+function getCountEncoding(viz: Visualization) {
+    if (getAggregate(viz) !== 'bins2d') {
+        return {};
+    }
+    return {
+        size: { field: 'count', type: 'quantitative', legend: null }
+    };
+}
+
 export function getBoxplotStats(
     viz: Visualization,
     width: number = 200,
@@ -11,7 +87,7 @@ export function getBoxplotStats(
         width: 'container',
         height: height,
         data: {
-            values: viz.vizStats
+            values: getVizValues(viz)
         },
         encoding: { y: { field: 'name', type: 'nominal', title: null } },
         axes: [
@@ -75,13 +151,13 @@ export function getScatterPlotStats(
 ) {
     let spec;
     if (group.length === 0) {
-        let xMax = Math.max(...viz.vizStats.map((d: any) => d.x));
-        let xMin = Math.min(...viz.vizStats.map((d: any) => d.x));
+        let xMax = _.max(getVizValues(viz).map((d: any) => d.x));
+        let xMin = _.min(getVizValues(viz).map((d: any) => d.x));
         spec = {
             $schema: 'https://vega.github.io/schema/vega-lite/v5.json',
             width: 'container',
             height: height,
-            data: { values: viz.vizStats },
+            data: { values: getVizValues(viz) },
             mark: { type: 'point', tooltip: true },
             axes: [
                 {
@@ -104,17 +180,18 @@ export function getScatterPlotStats(
                     type: 'quantitative',
                     scale: { domain: [xMin, xMax] }
                 },
-                y: { field: 'y', title: viz.yLabel, type: 'quantitative' }
+                y: { field: 'y', title: viz.yLabel, type: 'quantitative' },
+                ...getCountEncoding(viz)
             }
         };
     } else {
-        let xMax = Math.max(
-            ...viz.vizStats
+        let xMax = _.max(
+            getVizValues(viz)
                 .filter((d: any) => d.group === group)
                 .map((d: any) => d.x)
         );
-        let xMin = Math.min(
-            ...viz.vizStats
+        let xMin = _.min(
+            getVizValues(viz)
                 .filter((d: any) => d.group === group)
                 .map((d: any) => d.x)
         );
@@ -123,7 +200,7 @@ export function getScatterPlotStats(
             width: 'container',
             height: height,
             data: {
-                values: viz.vizStats.filter((d: any) => d.group === group)
+                values: getVizValues(viz).filter((d: any) => d.group === group)
             },
             mark: { type: 'point', tooltip: true },
             axes: [
@@ -147,7 +224,8 @@ export function getScatterPlotStats(
                     type: 'quantitative',
                     scale: { domain: [xMin, xMax] }
                 },
-                y: { field: 'y', title: viz.yLabel, type: 'quantitative' }
+                y: { field: 'y', title: viz.yLabel, type: 'quantitative' },
+                ...getCountEncoding(viz)
             }
         };
     }
@@ -161,6 +239,86 @@ export function getDensityPlotStats(
     height: number = 120
 ) {
     if (subvizType === 'density') {
+        // aggregated payloads hold the density and normal estimates on a grid
+        const data =
+            getAggregate(viz) === 'kde'
+                ? [
+                      {
+                          name: 'points',
+                          values: getVizValues(viz)
+                      },
+                      {
+                          name: 'density',
+                          source: 'points',
+                          transform: [
+                              {
+                                  type: 'project',
+                                  fields: ['value', 'density']
+                              }
+                          ]
+                      },
+                      {
+                          name: 'normal',
+                          source: 'points',
+                          transform: [
+                              {
+                                  type: 'project',
+                                  fields: ['value', 'normal'],
+                                  as: ['value', 'density']
+                              }
+                          ]
+                      }
+                  ]
+                : [
+                      {
+                          name: 'points',
+                          values: getVizValues(viz)
+                      },
+                      {
+                          name: 'summary',
+                          source: 'points',
+                          transform: [
+                              {
+                                  type: 'aggregate',
+                                  fields: ['value', 'value'],
+                                  ops: ['mean', 'stdev'],
+                                  as: ['mean', 'stdev']
+                              }
+                          ]
+                      },
+                      {
+                          name: 'density',
+                          source: 'points',
+                          transform: [
+                              {
+                                  type: 'density',
+                                  extent: { signal: "domain('xscale')" },
+                                  distribution: {
+                                      function: 'kde',
+                                      field: 'value'
+                                  }
+                              }
+                          ]
+                      },
+                      {
+                          name: 'normal',
+                          transform: [
+                              {
+                                  type: 'density',
+                                  extent: { signal: "domain('xscale')" },
+                                  distribution: {
+                                      function: 'normal',
+                                      mean: {
+                                          signal: "data('summary')[0].mean"
+                                      },
+                                      stdev: {
+                                          signal: "data('summary')[0].stdev"
+                                      }
+                                  }
+                              }
+                          ]
+                      }
+                  ];
         const spec = {
             $schema: 'https://vega.github.io/schema/vega/v5.json',
             description:
@@ -168,49 +326,7 @@ export function getDensityPlotStats(
             width: width,
             height: height,
             padding: 5,
-            data: [
-                {
-                    name: 'points',
-                    values: viz.vizStats
-                },
-                {
-                    name: 'summary',
-                    source: 'points',
-                    transform: [
-                        {
-                            type: 'aggregate',
-                            fields: ['value', 'value'],
-                            ops: ['mean', 'stdev'],
-                            as: ['mean', 'stdev']
-                        }
-                    ]
-                },
-                {
-                    name: 'density',
-                    source: 'points',
-                    transform: [
-                        {
-                            type: 'density',
-                            extent: { signal: "domain('xscale')" },
-                            distribution: { function: 'kde', field: 'value' }
-                        }
-                    ]
-                },
-                {
-                    name: 'normal',
-                    transform: [
-                        {
-                            type: 'density',
-                            extent: { signal: "domain('xscale')" },
-                            distribution: {
-                                function: 'normal',
-                                mean: { signal: "data('summary')[0].mean" },
-                                stdev: { signal: "data('summary')[0].stdev" }
-                            }
-                        }
-                    ]
-                }
-            ],
+            data: data,
             scales: [
                 {
                     name: 'xscale',
@@ -296,7 +412,7 @@ export function getDensityPlotStats(
             data: [
                 {
                     name: 'points',
-                    values: viz.vizStats
+                    values: getVizValues(viz)
                 },
                 {
                     name: 'quantiles',
@@ -371,12 +487,61 @@ export function getTTestPlotStats(
     if (!_.isUndefined(viz?.title)) {
         title = viz.title;
     }
+    // aggregated payloads hold one row of box statistics per group
+    const layer =
+        getAggregate(viz) === 'boxplot'
+            ? [
+                  {
+                      mark: { type: 'rule' },
+                      encoding: {
+                          y: { field: 'group', type: 'nominal' },
+                          x: { field: 'lower', type: 'quantitative' },
+                          x2: { field: 'upper' }
+                      }
+                  },
+                  {
+                      mark: { type: 'bar', size: 14 },
+                      encoding: {
+                          y: { field: 'group', type: 'nominal' },
+                          x: { field: 'q1', type: 'quantitative' },
+                          x2: { field: 'q3' },
+                          color: {
+                              field: 'group',
+                              type: 'nominal',
+                              legend: null
+                          }
+                      }
+                  },
+                  {
+                      mark: { type: 'tick', color: 'white', size: 14 },
+                      encoding: {
+                          y: { field: 'group', type: 'nominal' },
+                          x: { field: 'median', type: 'quantitative' }
+                      }
+                  }
+              ]
+            : [
+                  {
+                      mark: 'boxplot',
+                      encoding: {
+                          y: { field: 'group', type: 'nominal' },
+                          x: { field: 'value', type: 'quantitative' }
+                      }
+                  },
+                  {
+                      mark: 'point',
+                      encoding: {
+                          y: { field: 'group', type: 'nominal' },
+                          x: { field: 'value', type: 'quantitative' }
+                      }
+                  }
+              ];
     const spec = {
         $schema: 'https://vega.github.io/schema/vega-lite/v5.json',
         width: 'container',
         height: height,
         data: {
-            values: viz.vizStats
+            values: getVizValues(viz)
         },
         axes: [
             {
@@ -387,22 +552,7 @@ export function getTTestPlotStats(
             },
             { orient: 'left', scale: 'yscale', labelOverlap: true, zindex: 1 }
         ],
-        layer: [
-            {
-                mark: 'boxplot',
-                encoding: {
-                    y: { field: 'group', type: 'nominal' },
-                    x: { field: 'value', type: 'quantitative' }
-                }
-            },
-            {
-                mark: 'point',
-                encoding: {
-                    y: { field: 'group', type: 'nominal' },
-                    x: { field: 'value', type: 'quantitative' }
-                }
-            }
-        ],
+        layer: layer,
         title: {
             text: title,
             anchor: 'middle'
@@ -422,7 +572,7 @@ export function getHeatMapStats(
         width: 'container',
         height: height,
         data: {
-            values: viz.vizStats
+            values: getVizValues(viz)
         },
         title: {
             text: 'Correlation Matrix',
@@ -457,12 +607,99 @@ export function getRegressionPlotStats(
     width: number = 200,
     height: number = 120
 ) {
+    // binned payloads come with the regression line fitted on all rows
+    const fit = (viz.vizStats as any)?.fit;
+    const fitLayers = _.isUndefined(fit)
+        ? [
+              {
+                  mark: {
+                      type: 'line',
+                      color: 'firebrick'
+                  },
+                  transform: [
+                      {
+                          regression: 'y',
+                          on: 'x'
+                      }
+                  ],
+                  encoding: {
+                      x: {
+                          field: 'x',
+                          type: 'quantitative',
+                          axis: {
+                              title: 'X'
+                          }
+                      },
+                      y: {
+                          field: 'y',
+                          type: 'quantitative',
+                          axis: {
+                              title: 'Y'
+                          }
+                      }
+                  }
+              },
+              {
+                  transform: [
+                      {
+                          regression: 'y',
+                          on: 'x',
+                          params: true
+                      },
+                      {
+                          calculate: "'R²: '+format(datum.rSquared, '.2f')",
+                          as: 'R2'
+                      }
+                  ],
+                  mark: {
+                      type: 'text',
+                      color: 'firebrick',
+                      x: 'width',
+                      align: 'right',
+                      y: -5
+                  },
+                  encoding: {
+                      text: {
+                          type: 'nominal',
+                          field: 'R2'
+                      }
+                  }
+              }
+          ]
+        : [
+              {
+                  mark: {
+                      type: 'line',
+                      color: 'firebrick'
+                  },
+                  transform: [
+                      {
+                          calculate: `${fit.intercept} + ${fit.slope} * datum.x`,
+                          as: 'fitted'
+                      }
+                  ],
+                  encoding: {
+                      x: { field: 'x', type: 'quantitative' },
+                      y: { field: 'fitted', type: 'quantitative' }
+                  }
+              },
+              {
+                  mark: {
+                      type: 'text',
+                      color: 'firebrick',
+                      x: 'width',
+                      align: 'right',
+                      y: -5,
+                      text: `R²: ${fit.rSquared.toFixed(2)}`
+                  }
+              }
+          ];
     const spec = {
         $schema: 'https://vega.github.io/schema/vega-lite/v5.json',
         width: 'container',
         height: height,
         data: {
-            values: viz.vizStats
+            values: getVizValues(viz)
         },
         layer: [
             {
@@ -484,62 +721,80 @@ export function getRegressionPlotStats(
                         axis: {
                             title: 'Y'
                         }
-                    }
+                    },
+                    ...getCountEncoding(viz)
                 }
             },
+            ...fitLayers
+        ]
+    };
+    return spec;
+}
+
+// CV curve and coefficient path of a cross-validated alpha search
+export function getRegularizationPathStats(
+    viz: Visualization,
+    width: number = 200,
+    height: number = 120
+) {
+    const stats: any = viz.vizStats;
+    const curve = getVizValues({ ...viz, vizStats: stats.curve }).map(
+        (d: any) => ({ ...d, lower: d.cvMSE - d.cvSE, upper: d.cvMSE + d.cvSE })
+    );
+    const path = getVizValues({ ...viz, vizStats: stats.path });
+    const x = {
+        field: 'alpha',
+        title: viz.xLabel,
+        type: 'quantitative',
+        scale: { type: 'log' }
+    };
+    const best = {
+        data: { values: [{ alpha: stats.bestAlpha }] },
+        mark: { type: 'rule', strokeDash: [4, 4], color: 'gray' },
+        encoding: { x: { field: 'alpha', type: 'quantitative' } }
+    };
+    const spec = {
+        $schema: 'https://vega.github.io/schema/vega-lite/v5.json',
+        vconcat: [
             {
-                mark: {
-                    type: 'line',
-                    color: 'firebrick'
-                },
-                transform: [
+                width: width,
+                height: height,
+                layer: [
                     {
-                        regression: 'y',
-                        on: 'x'
-                    }
-                ],
-                encoding: {
-                    x: {
-                        field: 'x',
-                        type: 'quantitative',
-                        axis: {
-                            title: 'X'
+                        data: { values: curve },
+                        mark: { type: 'errorband' },
+                        encoding: {
+                            x: x,
+                            y: { field: 'lower', type: 'quantitative', title: viz.yLabel },
+                            y2: { field: 'upper' }
                         }
                     },
-                    y: {
-                        field: 'y',
-                        type: 'quantitative',
-                        axis: {
-                            title: 'Y'
+                    {
+                        data: { values: curve },
+                        mark: { type: 'line', point: true, tooltip: true },
+                        encoding: {
+                            x: x,
+                            y: { field: 'cvMSE', type: 'quantitative', title: viz.yLabel }
                         }
-                    }
-                }
+                    },
+                    best
+                ]
             },
             {
-                transform: [
+                width: width,
+                height: height,
+                layer: [
                     {
-                        regression: 'y',
-                        on: 'x',
-                        params: true
+                        data: { values: path },
+                        mark: { type: 'line', tooltip: true },
+                        encoding: {
+                            x: x,
+                            y: { field: 'coefficient', type: 'quantitative' },
+                            color: { field: 'name', type: 'nominal' }
+                        }
                     },
-                    {
-                        calculate: "'R²: '+format(datum.rSquared, '.2f')",
-                        as: 'R2'
-                    }
-                ],
-                mark: {
-                    type: 'text',
-                    color: 'firebrick',
-                    x: 'width',
-                    align: 'right',
-                    y: -5
-                },
-                encoding: {
-                    text: {
-                        type: 'nominal',
-                        field: 'R2'
-                    }
-                }
+                    best
+                ]
             }
         ]
     };
@@ -554,5 +809,6 @@ export const vizTypeToSpec = {
     density: getDensityPlotStats,
     ttest: getTTestPlotStats,
     heatmap: getHeatMapStats,
-    regression: getRegressionPlotStats
+    regression: getRegressionPlotStats,
+    regularizationPath: getRegularizationPathStats
 };
@@ -23,6 +23,8 @@ export type Model = {
 export type ModelResult = {
     name: string;
     score: number;
+    // fold-std of cross validated scores
+    std?: number;
     group?: string;
 };
 
@@ -53,6 +55,18 @@ export type Step = {
     previousConfig?: StepConfig;
     groupConfig?: GroupConfig;
     message?: string;
+    progress?: StepProgress;
+    revision?: number;
+};
+
+export type StepProgress = {
+    running?: boolean;
+    fraction?: number;
+    label?: string;
+    runId?: number;
+    error?: string;
+    cancelled?: boolean;
+    cancelRequested?: boolean;
 };
 
 export type GroupConfig = {
@@ -97,7 +111,32 @@ export type Visualization = {
         | BoxPlotStats[]
         | ScatterPlotStats[]
         | DensityPlotStats[]
-        | HeatMapStats[];
+        | HeatMapStats[]
+        | ColumnarStats
+        | RegularizationPathStats;
+};
+
+// cross-validated alpha search: CV curve (alpha, cvMSE, cvSE) and coefficient path (alpha, name, coefficient)
+export type RegularizationPathStats = {
+    curve: ColumnarStats;
+    path: ColumnarStats;
+    bestAlpha: number;
+};
+
+// columns sent as binary buffers, string columns are dictionary-encoded
+export type ColumnarStats = {
+    length: number;
+    columns: {
+        [name: string]:
+            | BinaryArray
+            | { codes: BinaryArray; categories: string[] };
+    };
+};
+
+export type BinaryArray = {
+    dtype: string;
+    shape: number[];
+    buffer: DataView;
 };
 
 export type BoxPlotStats = {
@@ -135,6 +174,7 @@ export type Workflow = {
     action: Action;
     presets: Preset[];
     steps: Step[];
+    revision?: number;
 };
 
 export type LoadDatasetStep = Step & {
@@ -1,11 +1,161 @@
-import { writable } from 'svelte/store';
+import { writable, get } from 'svelte/store';
 import type { Writable } from 'svelte/store';
+import { put_buffers, remove_buffers } from '@jupyter-widgets/base';
 import type { DOMWidgetModel } from '@jupyter-widgets/base';
 
+type Path = Array<string | number>;
+
+// {path: location of the object to update, revision: set by the backend, fields: new values}
+export interface Patch {
+    path: Path;
+    revision?: number;
+    fields: { [key: string]: any };
+}
+
+function getIn(obj: any, path: Path): any {
+    return path.reduce(
+        (o: any, key: string | number) => (o == null ? undefined : o[key]),
+        obj
+    );
+}
+
+function setIn(obj: any, path: Path, value: any): any {
+    if (path.length === 0) {
+        return value;
+    }
+    const [key, ...rest] = path;
+    const output: any = Array.isArray(obj) ? [...obj] : { ...obj };
+    output[key] = setIn(obj[key], rest, value);
+    return output;
+}
+
+function isPlainObject(obj: any): boolean {
+    return (
+        obj !== null &&
+        typeof obj === 'object' &&
+        !Array.isArray(obj) &&
+        !ArrayBuffer.isView(obj)
+    );
+}
+
+// fields of next that differ from prev, null if next has dropped some fields
+function changedFields(
+    prev: any,
+    next: any
+): { [key: string]: any } | null {
+    if (Object.keys(prev).some((key: string) => !(key in next))) {
+        return null;
+    }
+    const fields: { [key: string]: any } = {};
+    for (const key of Object.keys(next)) {
+        if (!isEqual(prev[key], next[key])) {
+            fields[key] = next[key];
+        }
+    }
+    return fields;
+}
+
+function isEqual(a: any, b: any): boolean {
+    if (a === b) {
+        return true;
+    }
+    if (
+        a === null ||
+        b === null ||
+        typeof a !== 'object' ||
+        typeof b !== 'object' ||
+        Array.isArray(a) !== Array.isArray(b) ||
+        ArrayBuffer.isView(a) ||
+        ArrayBuffer.isView(b)
+    ) {
+        return false;
+    }
+    const keys = Object.keys(a);
+    if (keys.length !== Object.keys(b).length) {
+        return false;
+    }
+    return keys.every(key => isEqual(a[key], b[key]));
+}
+
+export function applyPatches<T>(value: T, patches: Array<Patch>): T {
+    let output: any = value;
+    for (const patch of patches) {
+        const target = getIn(output, patch.path);
+        if (target === undefined) {
+            continue;
+        }
+        // drop patches older than what the target already holds
+        if (
+            patch.revision !== undefined &&
+            target.revision !== undefined &&
+            patch.revision <= target.revision
+        ) {
+            continue;
+        }
+        const updated = { ...target, ...patch.fields };
+        if (patch.revision !== undefined) {
+            updated.revision = patch.revision;
+        }
+        output = setIn(output, patch.path, updated);
+    }
+    return output;
+}
+
+// return the patches turning prev into next, items of the lists under listKeys
+// are patched one by one, and so are their object fields (e.g. config), so
+// unchanged nested values such as viz buffers are not sent back.
+// null if the lists have changed their length
+export function diffPatches(
+    prev: any,
+    next: any,
+    listKeys: Array<string>
+): Array<Patch> | null {
+    const patches: Array<Patch> = [];
+    const fields: { [key: string]: any } = {};
+    for (const key of Object.keys(next)) {
+        if (listKeys.includes(key)) {
+            const prevList = prev[key] || [];
+            const nextList = next[key] || [];
+            if (prevList.length !== nextList.length) {
+                return null;
+            }
+            nextList.forEach((item: any, idx: number) => {
+                const prevItem = prevList[idx];
+                const itemFields: { [key: string]: any } = {};
+                for (const field of Object.keys(item)) {
+                    if (isEqual(prevItem[field], item[field])) {
+                        continue;
+                    }
+                    const nested =
+                        isPlainObject(prevItem[field]) &&
+                        isPlainObject(item[field])
+                            ? changedFields(prevItem[field], item[field])
+                            : null;
+                    if (nested !== null) {
+                        patches.push({ path: [key, idx, field], fields: nested });
+                    } else {
+                        itemFields[field] = item[field];
+                    }
+                }
+                if (Object.keys(itemFields).length > 0) {
+                    patches.push({ path: [key, idx], fields: itemFields });
+                }
+            });
+        } else if (!isEqual(prev[key], next[key])) {
+            fields[key] = next[key];
+        }
+    }
+    if (Object.keys(fields).length > 0) {
+        patches.unshift({ path: [], fields: fields });
+    }
+    return patches;
+}
+
 export function WidgetWritable<T>(
     name_: string,
     value_: T,
-    model: DOMWidgetModel
+    model: DOMWidgetModel,
+    patchable?: Array<string>
 ): Writable<T> {
     const name: string = name_;
     const internalWritable: Writable<any> = writable(
@@ -19,21 +169,63 @@ export function WidgetWritable<T>(
         null
     );
 
+    // with patchable, the backend and the store exchange patches of the value
+    // instead of the whole value, patchable lists the keys of per-item patched lists
+    if (patchable !== undefined) {
+        model.on(
+            'msg:custom',
+            (msg: any, buffers: Array<DataView>) => {
+                if (msg.type !== 'patch' || msg.name !== name) {
+                    return;
+                }
+                // binary viz payloads arrive as separate buffers
+                put_buffers(msg, msg.buffer_paths || [], buffers || []);
+                const output = applyPatches(model.get(name), msg.patches);
+                // set_state does not send the value back to the backend
+                model.set_state({ [name]: output });
+            },
+            null
+        );
+    }
+
+    const save = (prev: any, v: any) => {
+        const patches =
+            patchable !== undefined && prev
+                ? diffPatches(prev, v, patchable)
+                : null;
+        if (patches === null) {
+            model.set(name, v);
+            model.save_changes();
+            return;
+        }
+        if (patches.length > 0) {
+            model.set_state({ [name]: v });
+            const { state, buffer_paths, buffers } = remove_buffers({
+                patches: patches
+            });
+            model.send(
+                { type: 'patch', name: name, buffer_paths, ...state },
+                {},
+                buffers
+            );
+        }
+    };
+
     return {
         set: (v: any) => {
+            const prev = get(internalWritable);
             internalWritable.set(v);
             if (model) {
-                model.set(name, v);
-                model.save_changes();
+                save(prev, v);
             }
         },
         subscribe: internalWritable.subscribe,
         update: (func: any) => {
+            const prev = get(internalWritable);
             internalWritable.update((v: any) => {
                 const output = func(v);
                 if (model) {
-                    model.set(name, output);
-                    model.save_changes();
+                    save(prev, output);
                 }
                 return output;
             });
@@ -42,5 +234,5 @@ export function WidgetWritable<T>(
 }
 
 export const selectingStep: Writable<number> = writable(-1);
-export const activeTab: Writable<number> = writable(0);    
-export const isBlocked: Writable<boolean> = writable(false);
\ No newline at end of file
+export const activeTab: Writable<number> = writable(0);
+export const isBlocked: Writable<boolean> = writable(false);
@@ -1,3 +1,19 @@
-export function deepCopy(obj: any) {
-    return JSON.parse(JSON.stringify(obj));
+export function deepCopy(obj: any): any {
+    // binary viz buffers are never modified, they are shared instead of copied
+    if (ArrayBuffer.isView(obj)) {
+        return obj;
+    }
+    if (Array.isArray(obj)) {
+        return obj.map(deepCopy);
+    }
+    if (obj !== null && typeof obj === 'object') {
+        const output: any = {};
+        for (const key of Object.keys(obj)) {
+            if (obj[key] !== undefined) {
+                output[key] = deepCopy(obj[key]);
+            }
+        }
+        return output;
+    }
+    return obj;
 }